@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Compare ``result_from_each`` with ``result_from_each_batched`` for tiny work items.
+
+Each item's work (``abs``) takes far less time than a future does,
+so this mostly measures the per-future overhead, with and without chunking.
+"""
+import argparse
+import time
+
+from jgt_common import futures
+
+
+def items_per_second(results, items):
+    """Consume ``results``, checking there are ``items`` of them; return the rate."""
+    start = time.perf_counter()
+    assert sum(1 for _ in results) == items
+    return items / (time.perf_counter() - start)
+
+
+def main():
+    """Run the benchmark with cli args."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, description=__doc__
+    )
+    parser.add_argument("--items", type=int, default=200000, help="items per measure")
+    parser.add_argument("--workers", type=int, default=4, help="size of each pool")
+    parser.add_argument(
+        "--chunk-size", type=int, help="fixed chunk size (default: adaptive)"
+    )
+    args = parser.parse_args()
+
+    futures.set_thread_pool_size(args.workers)
+    futures.set_process_pool_size(args.workers)
+    try:
+        for pool in (futures.THREADS, futures.PROCESSES):
+            each = items_per_second(
+                futures.result_from_each(range(args.items), abs, pool=pool),
+                args.items,
+            )
+            batched = items_per_second(
+                futures.result_from_each_batched(
+                    range(args.items), abs, chunk_size=args.chunk_size, pool=pool
+                ),
+                args.items,
+            )
+            print(
+                "{}: {:,.0f} items/s each, {:,.0f} items/s batched ({:.0f}x)".format(
+                    pool, each, batched, batched / each
+                )
+            )
+    finally:
+        futures.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
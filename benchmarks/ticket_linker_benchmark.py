@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Measure the throughput of the ``ticket-linker`` on a synthetic CI log.
+
+Exits with a non-zero status if the throughput is below the given minimum.
+"""
+import argparse
+import io
+import time
+
+from jgt_common import register_ticketing_system
+from jgt_common.ticket_linker import ticket_link
+
+LOG_LINES = [
+    "2020-01-01 12:00:00,123 INFO [worker-3] request completed in 123ms status=200\n",
+    "2020-01-01 12:00:00,456 DEBUG [worker-1] retrying call to /api/v2/things/42\n",
+    "2020-01-01 12:00:01,789 WARNING [worker-2] flaky test, see XYZZY-1234\n",
+    "    at com.example.Thing.doStuff(Thing.java:123) caused by CHG0012345\n",
+]
+
+
+def build_log(size_mb):
+    """Return a synthetic log of roughly ``size_mb`` megabytes."""
+    block = "".join(LOG_LINES)
+    return block * (size_mb * 1000 * 1000 // len(block))
+
+
+def benchmark(size_mb):
+    """Return the ``ticket_link`` throughput, in MB/s, on a ``size_mb`` MB log."""
+    register_ticketing_system("JIRA", url_template="https://jira.example.com/{}")
+    log = build_log(size_mb)
+    start = time.perf_counter()
+    ticket_link(io.StringIO(log), io.StringIO())
+    return len(log) / (time.perf_counter() - start) / 1000 / 1000
+
+
+def main():
+    """Run the benchmark with cli args."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, description=__doc__
+    )
+    parser.add_argument("--size", type=int, default=50, help="log size in MB")
+    parser.add_argument(
+        "--minimum", type=float, default=20.0, help="minimum acceptable MB/s"
+    )
+    args = parser.parse_args()
+
+    throughput = benchmark(args.size)
+    print("ticket-linker: {:.1f} MB/s".format(throughput))
+    if throughput < args.minimum:
+        raise SystemExit(
+            "Throughput below the minimum of {} MB/s".format(args.minimum)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Measure the per-record overhead of scrubbing UUIDs from log records.
+
+Records are logged through a handler that formats them and throws them away,
+with no scrubbing, with ``UUIDScrubbingFilter`` and with ``UUIDScrubbingFormatter``,
+for messages without any UUID and with one (of a small set of) UUIDs.
+"""
+import argparse
+import logging
+import time
+from uuid import uuid4
+
+from jgt_common.uuid_replacer import UUIDScrubbingFilter, UUIDScrubbingFormatter
+
+FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+
+
+class FormattingNullHandler(logging.Handler):
+    """Handler that formats records, like a real one would, then drops them."""
+
+    def emit(self, record):  # noqa: D102
+        self.format(record)
+
+
+def microseconds_per_record(logger, records, message, uuids):
+    """Return the average microseconds ``logger`` takes to log a record."""
+    start = time.perf_counter()
+    for index in range(records):
+        logger.info(message, index, uuids[index % len(uuids)])
+    return (time.perf_counter() - start) / records * 1000 * 1000
+
+
+def logger_for(name, formatter, log_filter=None):
+    """Return a logger logging to a ``FormattingNullHandler``."""
+    handler = FormattingNullHandler()
+    handler.setFormatter(formatter)
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    if log_filter is not None:
+        logger.addFilter(log_filter)
+    return logger
+
+
+def main():
+    """Run the benchmark with cli args."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, description=__doc__
+    )
+    parser.add_argument(
+        "--records", type=int, default=100000, help="records logged per measure"
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="measures to take the best of"
+    )
+    args = parser.parse_args()
+
+    loggers = {
+        "plain": logger_for("plain", logging.Formatter(FORMAT)),
+        "filter": logger_for(
+            "filter", logging.Formatter(FORMAT), log_filter=UUIDScrubbingFilter()
+        ),
+        "formatter": logger_for("formatter", UUIDScrubbingFormatter(FORMAT)),
+    }
+    uuids = [str(uuid4()) for _ in range(100)]
+    messages = {
+        "no UUID": "request %d completed for user %.0s, status=200",
+        "one UUID": "request %d completed for user %s, status=200",
+    }
+    for message_name, message in messages.items():
+        # Interleave the measures, so they are all affected alike by noise.
+        best = dict.fromkeys(loggers, float("inf"))
+        for _ in range(args.rounds):
+            for name, logger in loggers.items():
+                best[name] = min(
+                    best[name],
+                    microseconds_per_record(logger, args.records, message, uuids),
+                )
+        plain = best["plain"]
+        print("{}, plain: {:.2f} us/record".format(message_name, plain))
+        for name in ("filter", "formatter"):
+            scrubbed = best[name]
+            print(
+                "{}, {}: {:.2f} us/record ({:+.2f})".format(
+                    message_name, name, scrubbed, scrubbed - plain
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare ``UUIDLineReplacer`` throughput with its original implementation.
+
+The input is ``tests/uuid-only-lines.input`` repeated (with fresh UUIDs each time),
+mixed with lines without UUIDs and lines with many UUIDs.
+"""
+import argparse
+from itertools import count
+import os
+import time
+from uuid import uuid4
+
+from jgt_common.uuid_replacer import (
+    UUID_ISOLATED_MATCHER,
+    UUID_REPLACEMENT_TEMPLATE,
+    UUIDLineReplacer,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INPUT_FILE = os.path.join(HERE, os.pardir, "tests", "uuid-only-lines.input")
+
+NO_UUID_LINE = "2020-01-01 12:00:00,123 INFO [worker-3] request completed status=200\n"
+
+
+class OriginalUUIDLineReplacer(object):
+    """The ``findall`` / ``set`` / ``str.replace`` implementation, for comparison."""
+
+    def __init__(self, template=UUID_REPLACEMENT_TEMPLATE):
+        self.count = count(start=1)
+        self.uuid_map = {}
+        self.template = template
+
+    def _add_uuid(self, uuid):
+        if uuid in self.uuid_map:
+            return
+        self.uuid_map[uuid] = self.template.format(next(self.count))
+
+    def __call__(self, line):  # noqa: D102
+        uuids_found = set(UUID_ISOLATED_MATCHER.findall(line))
+        for uuid in uuids_found:
+            self._add_uuid(uuid)
+        for uuid in uuids_found:
+            line = line.replace(uuid, self.uuid_map[uuid])
+        return line
+
+
+def build_lines(repeat):
+    """Return the benchmark input lines."""
+    with open(INPUT_FILE, "r") as input_file:
+        sample_lines = input_file.readlines()
+    lines = []
+    for _ in range(repeat):
+        lines.extend(sample_lines)
+        lines.extend([NO_UUID_LINE] * len(sample_lines))
+        lines.append(" ".join(str(uuid4()) for _ in range(50)) + "\n")
+    return lines
+
+
+def throughput(replacer_class, lines):
+    """Return the MB/s ``replacer_class`` processes ``lines`` at."""
+    replacer = replacer_class()
+    start = time.perf_counter()
+    for line in lines:
+        replacer(line)
+    return sum(map(len, lines)) / (time.perf_counter() - start) / 1000 / 1000
+
+
+def main():
+    """Run the benchmark with cli args."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, description=__doc__
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=500, help="times to repeat the sample input"
+    )
+    args = parser.parse_args()
+
+    lines = build_lines(args.repeat)
+    original = throughput(OriginalUUIDLineReplacer, lines)
+    current = throughput(UUIDLineReplacer, lines)
+    print("original: {:.1f} MB/s".format(original))
+    print("current:  {:.1f} MB/s ({:.2f}x)".format(current, current / original))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,22 +11,19 @@ general categories:
 """
 
 from __future__ import print_function
-import ast
 from collections import defaultdict
+import functools as _functools
 import itertools as _itertools
 import logging
 import os as _os
+import re as _re
+from importlib import import_module as _import_module
 from math import nan
 
-import pkg_resources
-import random
-import shutil as _shutil
 import string as _string
-import subprocess as _subprocess
 import sys as _sys
 import time as _time
-
-import wrapt as _wrapt
+import types as _types
 
 
 _logger = logging.getLogger(__name__)
@@ -80,15 +77,425 @@ CHECK_UNTIL_TIMEOUT = 300
 CHECK_UNTIL_CYCLE_SECS = 5
 
 
-_TICKET_INFO = defaultdict(dict)
-for data in pkg_resources.iter_entry_points("tag_to_url"):
-    _TICKET_INFO[data.name].update(data.load())
+TAG_TO_URL_CACHE_ENV_VAR = "JGT_COMMON_TAG_TO_URL_CACHE"
+"""
+Environment variable naming a file in which to cache ``tag_to_url`` entry points.
+
+Finding the ``tag_to_url`` entry points means scanning every installed distribution.
+If this variable is set, the entry points found are saved to the named file
+and re-used until the set of installed distributions changes.
+"""
+
+_TICKET_INFO = None
+"""Ticketing system registry, loaded on first use by ``_ticket_info``."""
+
+
+def _scan_tag_to_url_entry_points():
+    """Return a list of ``[name, value]`` pairs for all ``tag_to_url`` entry points."""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # Python < 3.8
+        import pkg_resources
+
+        return [
+            [ep.name, "{}:{}".format(ep.module_name, ".".join(ep.attrs))]
+            for ep in pkg_resources.iter_entry_points("tag_to_url")
+        ]
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, "select"):
+        group = all_entry_points.select(group="tag_to_url")
+    else:
+        # Python < 3.10 returns a dict of group name to entry points.
+        group = all_entry_points.get("tag_to_url", [])
+    return [[ep.name, ep.value] for ep in group]
+
+
+def _distributions_fingerprint():
+    """
+    Fingerprint the installed distributions.
+
+    Installing or removing a distribution changes the modification time
+    of the ``sys.path`` directory it is installed into,
+    so the modification times of those directories stand in for a full scan.
+    """
+    fingerprint = []
+    for path_entry in _sys.path:
+        try:
+            fingerprint.append([path_entry, _os.stat(path_entry or ".").st_mtime_ns])
+        except OSError:
+            continue
+    return fingerprint
+
+
+def _tag_to_url_entry_points():
+    """Return the ``tag_to_url`` entry points, from the cache file if it is current."""
+    cache_file = _os.environ.get(TAG_TO_URL_CACHE_ENV_VAR)
+    if not cache_file:
+        return _scan_tag_to_url_entry_points()
+
+    import json
+
+    fingerprint = _distributions_fingerprint()
+    try:
+        with open(cache_file, "r") as cache_fo:
+            cached = json.load(cache_fo)
+        if cached["fingerprint"] == fingerprint:
+            return cached["entry_points"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    entry_points = _scan_tag_to_url_entry_points()
+    temp_file = "{}.{}.tmp".format(cache_file, _os.getpid())
+    try:
+        with open(temp_file, "w") as cache_fo:
+            json.dump(
+                {"fingerprint": fingerprint, "entry_points": entry_points}, cache_fo
+            )
+        _os.replace(temp_file, cache_file)
+    except OSError as e:
+        _debug('Unable to write tag_to_url cache file "{}": {}'.format(cache_file, e))
+    return entry_points
+
+
+def _load_entry_point_value(value):
+    """Load the object named by an entry point value of the form ``module:attr``."""
+    module_name, _, attrs = value.partition(":")
+    target = _import_module(module_name.strip())
+    for attr in filter(None, attrs.split("[")[0].strip().split(".")):
+        target = getattr(target, attr)
+    return target
+
+
+def _ticket_info():
+    """Return the ticketing system registry, loading it on first use."""
+    global _TICKET_INFO
+    if _TICKET_INFO is None:
+        ticket_info = defaultdict(dict)
+        for name, value in _tag_to_url_entry_points():
+            ticket_info[name].update(_load_entry_point_value(value))
+        _TICKET_INFO = ticket_info
+    return _TICKET_INFO
+
+
+TICKET_CACHE_SIZE = 4096
+"""How many ticket strings ``ticketing_system_for`` remembers the answer for."""
+
+_TICKET_MATCHER = (None, None)
+"""The registry ``_ticket_matcher`` was built from, and the matcher built."""
+
+_TICKET_FINDERS = (None, None)
+"""The registry ``_ticket_finders`` was built from, and the finders built."""
+
+MAX_TICKET_LENGTH = 256
+"""Longest ticket ``find_tickets`` is guaranteed to find across chunk boundaries."""
+
+# Flags that can be scoped to one alternative of a fused regular expression.
+_INLINE_FLAGS = ((_re.IGNORECASE, "i"), (_re.MULTILINE, "m"), (_re.DOTALL, "s"))
+
+# Numbered or named back references change meaning when the group numbering changes.
+_BACK_REFERENCE_MATCHER = _re.compile(r"\\[1-9]|\(\?P=")
+
+# Global (not scoped) inline flags apply to the whole of a fused regular expression,
+# and are an error anywhere but at its start from Python 3.11 on.
+_GLOBAL_FLAGS_MATCHER = _re.compile(r"(?<!\\)\(\?[aiLmsux]+\)")
+
+
+def _fusable_pattern_source(pattern):
+    """Return ``pattern`` as source that can be one alternative of a regex, or None."""
+    source = getattr(pattern, "pattern", None)
+    if (
+        not isinstance(source, str)
+        or _BACK_REFERENCE_MATCHER.search(source)
+        or _GLOBAL_FLAGS_MATCHER.search(source)
+    ):
+        return None
+    flags = pattern.flags & ~_re.UNICODE
+    inline_flags = ""
+    for flag, letter in _INLINE_FLAGS:
+        if flags & flag:
+            inline_flags += letter
+            flags &= ~flag
+    if flags:
+        return None
+    return "(?{}:{})".format(inline_flags, source)
+
+
+def _build_ticket_matcher(ticket_info):
+    """
+    Build a function that returns the Ticketing System for a ticket, or "".
+
+    All the systems' patterns are fused into one regular expression,
+    with a named group per system, so only one match attempt is needed.
+    If any pattern can't be safely fused, each pattern is tried in turn instead.
+    Either way, the first system (in registry order) whose pattern matches wins.
+    """
+    systems = [
+        (name, info["pattern"])
+        for name, info in ticket_info.items()
+        if "pattern" in info
+    ]
+    sources = [_fusable_pattern_source(pattern) for _, pattern in systems]
+    if systems and all(sources):
+        group_names = {
+            "_{}".format(index): name for index, (name, _) in enumerate(systems)
+        }
+        try:
+            fused = _re.compile(
+                "|".join(
+                    "(?P<{}>{})".format(group_name, source)
+                    for group_name, source in zip(group_names, sources)
+                )
+            )
+        except _re.error as e:
+            _debug("Unable to fuse ticketing system patterns: {}".format(e))
+        else:
+
+            def fused_matcher(ticket):
+                match = fused.match(ticket)
+                return group_names[match.lastgroup] if match else ""
+
+            return fused_matcher
+
+    def each_pattern_matcher(ticket):
+        for name, pattern in systems:
+            if pattern.match(ticket):
+                return name
+        return ""
+
+    return each_pattern_matcher
+
+
+def _ticket_matcher():
+    """Return the (memoizing) ticket matcher for the current registry."""
+    global _TICKET_MATCHER
+    ticket_info = _ticket_info()
+    matcher_for, matcher = _TICKET_MATCHER
+    if matcher_for is not ticket_info:
+        matcher = _functools.lru_cache(maxsize=TICKET_CACHE_SIZE)(
+            _build_ticket_matcher(ticket_info)
+        )
+        _TICKET_MATCHER = ticket_info, matcher
+    return matcher
+
+
+# Tickets found in text must not be part of a larger "word".
+_IN_TEXT_TICKET_TEMPLATE = r"(?<!\w)(?:{})(?!\w)"
+
+
+def _anchorless_source(source):
+    r"""
+    Turn a regex source matching a whole ticket into one finding tickets in text.
+
+    Each ``^``, ``$``, ``\A`` or ``\Z`` anchor outside a character class is removed;
+    ``_IN_TEXT_TICKET_TEMPLATE`` is used in their place, once for all the systems,
+    which is much faster than a check at the start of each system's pattern.
+    """
+    result = []
+    index = 0
+    while index < len(source):
+        char = source[index]
+        if char == "\\":
+            escaped = source[index : index + 2]
+            result.append("" if escaped in ("\\A", "\\Z") else escaped)
+            index += 2
+            continue
+        if char == "[":
+            # A "]" right after the "[" or "[^" is literal, not the end of the class.
+            end = index + 1
+            end += source.startswith("^", end)
+            end += source.startswith("]", end)
+            while end < len(source) and source[end] != "]":
+                end += 2 if source[end] == "\\" else 1
+            result.append(source[index : end + 1])
+            index = end + 1
+            continue
+        result.append("" if char in "^$" else char)
+        index += 1
+    return "".join(result)
+
+
+_CATEGORY_SOURCES = {
+    "DIGIT": r"\d",
+    "NOT_DIGIT": r"\D",
+    "SPACE": r"\s",
+    "NOT_SPACE": r"\S",
+    "WORD": r"\w",
+    "NOT_WORD": r"\W",
+}
+
+
+def _first_chars(parser, items):
+    """Return the pieces of a character class matching what ``items`` start with."""
+    if not items:
+        return None
+    op, av = items[0]
+    if op is parser.LITERAL:
+        return [_re.escape(chr(av))]
+    if op is parser.IN:
+        categories = {
+            getattr(parser, "CATEGORY_" + name): source
+            for name, source in _CATEGORY_SOURCES.items()
+        }
+        pieces = []
+        for in_op, in_av in av:
+            if in_op is parser.LITERAL:
+                pieces.append(_re.escape(chr(in_av)))
+            elif in_op is parser.RANGE:
+                pieces.append("-".join(_re.escape(chr(char)) for char in in_av))
+            elif in_op is parser.CATEGORY and in_av in categories:
+                pieces.append(categories[in_av])
+            else:
+                return None
+        return pieces
+    if op is parser.SUBPATTERN:
+        add_flags, pattern = av[1], av[-1]
+        return None if add_flags & _re.IGNORECASE else _first_chars(parser, pattern)
+    if op is parser.BRANCH:
+        pieces = []
+        for branch in av[1]:
+            branch_pieces = _first_chars(parser, branch)
+            if branch_pieces is None:
+                return None
+            pieces.extend(branch_pieces)
+        return pieces
+    if op in (parser.MAX_REPEAT, parser.MIN_REPEAT) and av[0]:
+        return _first_chars(parser, av[2])
+    return None
+
+
+def _first_char_lookahead(source, flags=0):
+    """
+    Return a lookahead for the characters a match of ``source`` can start with.
+
+    A pattern starting with a look-behind, as the ones finding tickets in text do,
+    has it tried at every position of the text; a lookahead for a character class
+    in front of it rules out most positions much faster, which about doubles
+    the scanning speed. Returns "" when the characters can't be worked out.
+    """
+    # The regular expression parser is internal to ``re``, so be careful with it.
+    parser = getattr(_re, "_parser", None) or getattr(_re, "sre_parse", None)
+    try:
+        if parser is None or _re.compile(source, flags).flags & _re.IGNORECASE:
+            return ""
+        pieces = _first_chars(parser, parser.parse(source, flags).data)
+    except Exception as e:
+        _debug("Unable to find the first characters of {!r}: {}".format(source, e))
+        return ""
+    return "(?=[{}])".format("".join(pieces)) if pieces else ""
 
 
-OBSOLETE_TICKETING_SYSTEMS = [
-    key for key, meta_data in _TICKET_INFO.items() if not meta_data.get("url_template")
-]
-"""Systems for which we still support identifying Tickets, but no longer can access."""
+def _in_text_ticket_regex(source, flags=0):
+    """Compile a regex finding the tickets matching ``source`` in text."""
+    return _re.compile(
+        _first_char_lookahead(source, flags) + _IN_TEXT_TICKET_TEMPLATE.format(source),
+        flags,
+    )
+
+
+def _build_ticket_finders(ticket_info):
+    """
+    Build a list of ``(regex, system_for_match)`` finding tickets in text.
+
+    As with ``_build_ticket_matcher``, the patterns are fused into one
+    regular expression when possible, so text is scanned in a single pass.
+    Patterns that can't be fused get a regular expression of their own.
+    """
+    fusable, finders = [], []
+    for name, info in ticket_info.items():
+        if "pattern" not in info:
+            continue
+        pattern = info["pattern"]
+        source = _fusable_pattern_source(pattern)
+        if source:
+            fusable.append((name, _anchorless_source(source)))
+            continue
+        try:
+            # The global inline flags are in ``pattern.flags`` already.
+            source = _GLOBAL_FLAGS_MATCHER.sub("", pattern.pattern)
+            regex = _in_text_ticket_regex(_anchorless_source(source), pattern.flags)
+        except (AttributeError, TypeError, _re.error) as e:
+            _debug('Unable to find "{}" tickets in text: {}'.format(name, e))
+            continue
+        finders.append((regex, lambda match, name=name: name))
+    if not fusable:
+        return finders
+
+    group_names = {"_{}".format(index): name for index, (name, _) in enumerate(fusable)}
+    try:
+        fused = _in_text_ticket_regex(
+            "|".join(
+                "(?P<{}>{})".format(group_name, source)
+                for group_name, (_, source) in zip(group_names, fusable)
+            )
+        )
+    except _re.error as e:
+        _debug("Unable to fuse ticketing system patterns: {}".format(e))
+        return [
+            (_in_text_ticket_regex(source), lambda match, name=name: name)
+            for name, source in fusable
+        ] + finders
+    return [(fused, lambda match: group_names[match.lastgroup])] + finders
+
+
+def _ticket_finders():
+    """Return the ticket finders for the current registry."""
+    global _TICKET_FINDERS
+    ticket_info = _ticket_info()
+    finders_for, finders = _TICKET_FINDERS
+    if finders_for is not ticket_info:
+        finders = _build_ticket_finders(ticket_info)
+        _TICKET_FINDERS = ticket_info, finders
+    return finders
+
+
+def _obsolete_ticketing_systems():
+    return [
+        key
+        for key, meta_data in _ticket_info().items()
+        if not meta_data.get("url_template")
+    ]
+
+
+_LAZY_ATTRIBUTES = {"OBSOLETE_TICKETING_SYSTEMS": _obsolete_ticketing_systems}
+
+# Submodules, and modules that used to be imported here, are only imported
+# when first accessed, so that ``import jgt_common`` stays cheap.
+_LAZY_MODULES = {
+    "assert_": ".assert_",
+    "check": ".check",
+    "async_futures": ".async_futures",
+    "futures": ".futures",
+    "http_helpers": ".http_helpers",
+    "tag_to_url": ".tag_to_url",
+    "ticket_linker": ".ticket_linker",
+    "uuid_index": ".uuid_index",
+    "uuid_map_store": ".uuid_map_store",
+    "uuid_replacer": ".uuid_replacer",
+    "ast": "ast",
+    "random": "random",
+    "_shutil": "shutil",
+    "_subprocess": "subprocess",
+    "_wrapt": "wrapt",
+}
+
+
+def __getattr__(name):
+    """
+    Compute expensive module attributes, and import modules, only when first used.
+
+    ``OBSOLETE_TICKETING_SYSTEMS`` - Systems for which we still support identifying
+    Tickets, but no longer can access.
+    """
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    if name in _LAZY_MODULES:
+        return _import_module(_LAZY_MODULES[name], __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()).union(_LAZY_ATTRIBUTES, _LAZY_MODULES))
 
 
 # Don't require user/embedder of this to use re.IGNORECASE
@@ -327,7 +734,9 @@ def cleanup_and_exit(dir_name=None, status=0, message=None):
 
     """
     if dir_name:
-        _shutil.rmtree(dir_name)
+        import shutil
+
+        shutil.rmtree(dir_name)
     exit(status=status, message=message)
 
 
@@ -340,8 +749,10 @@ def safe_run(commands, cwd=None):
     error messages are printed to stdout and ``sys.exit()`` will be called.
     """
 
+    import subprocess
+
     try:
-        status = _subprocess.call(commands, cwd=cwd)
+        status = subprocess.call(commands, cwd=cwd)
     except OSError as e:
         print("")
         print('Error when trying to execute: "{}"'.format(" ".join(commands)))
@@ -476,10 +887,26 @@ def dict_from(iterable, key_transform=identity, value_transform=identity):
 @classify("misc", "ticketing system")
 def ticketing_system_for(ticket):
     """Return the Ticketing System/Type for the given ticket, or the empty string."""
-    for ticket_system, info in _TICKET_INFO.items():
-        if info["pattern"].match(ticket):
-            return ticket_system
-    return ""
+    return _ticket_matcher()(ticket)
+
+
+@classify("misc", "ticketing system")
+def register_ticketing_system(name, **meta_data):
+    """
+    Add a Ticketing System, or update the meta-data of an existing one.
+
+    This is the run-time equivalent of a ``tag_to_url`` entry point.
+
+    Args:
+        name (str): The name of the Ticketing System.
+        meta_data: The meta-data to set, such as ``pattern``
+            (a compiled regular expression matching a whole ticket)
+            and ``url_template`` (a ``.format`` template taking the ticket).
+
+    """
+    global _TICKET_MATCHER, _TICKET_FINDERS
+    _ticket_info()[name].update(meta_data)
+    _TICKET_MATCHER = _TICKET_FINDERS = (None, None)
 
 
 @classify("misc", "ticketing system")
@@ -491,7 +918,7 @@ def url_for_ticket(ticketing_system, ticket):
 
     Raises if ticketing_system is not a supported system.
     """
-    system_dict = must_get_key(_TICKET_INFO, ticketing_system)
+    system_dict = must_get_key(_ticket_info(), ticketing_system)
     return system_dict.get("url_template", "").format(ticket)
 
 
@@ -514,6 +941,149 @@ def url_if_ticket(ticket):
     return ""
 
 
+_WHITESPACE_MATCHER = _re.compile(r"\s")
+
+
+def _tickets_in(text, start, end_limit, finders):
+    """
+    Yield ``(start, end, system)`` for the tickets in ``text`` from ``start`` on.
+
+    Only tickets ending before ``end_limit`` are yielded,
+    in order of position, skipping any overlapping an earlier ticket.
+    """
+    if len(finders) == 1:
+        regex, system_for = finders[0]
+        for match in regex.finditer(text, start):
+            if match.end() >= end_limit:
+                return
+            yield match.start(), match.end(), system_for(match)
+        return
+
+    found = sorted(
+        (match.start(), order, match.end(), system_for(match))
+        for order, (regex, system_for) in enumerate(finders)
+        for match in regex.finditer(text, start)
+        if match.end() < end_limit
+    )
+    last_end = start
+    for match_start, _, match_end, system in found:
+        if match_start >= last_end:
+            yield match_start, match_end, system
+            last_end = match_end
+
+
+@classify("ticketing system", "string")
+def find_tickets(text_or_lines):
+    """
+    Yield each ticket, of any registered Ticketing System, found in the given text.
+
+    The text is scanned for all Ticketing Systems at once, one chunk at a time,
+    so arbitrarily large inputs can be processed in bounded memory,
+    as long as they come in reasonably sized chunks.
+    A ticket must not be part of a larger "word", and must not contain whitespace.
+
+    Example:
+        Find the tickets in a file of any size, even one without newlines::
+
+            with open(report_path) as report:
+                chunks = iter(functools.partial(report.read, 1024 * 1024), "")
+                for system, ticket, url, offset in find_tickets(chunks):
+                    ...
+
+    Args:
+        text_or_lines (Union[str, Iterable[str]]): Either the text to scan,
+            or an iterable (such as an open file) of lines or chunks of the text.
+
+    Yields:
+        tuple: ``(system, ticket, url, offset)``; ``url`` is the empty string if
+        the system has no ``url_template``, and ``offset`` is the ticket's character
+        offset from the start of the text.
+
+    """
+    if isinstance(text_or_lines, _python_2_or_3_base_str_type()):
+        text_or_lines = [text_or_lines]
+    finders = _ticket_finders()
+    if not finders:
+        return
+
+    for text, offset, _, _, tickets in _ticket_pieces(text_or_lines, finders):
+        for start, end, system in tickets:
+            ticket = text[start:end]
+            yield system, ticket, url_for_ticket(system, ticket), offset + start
+
+
+def _ticket_pieces(text_or_lines, finders):
+    """
+    Yield ``(text, offset, start, end, tickets)`` for each piece of the text, in order.
+
+    ``text[start:end]`` is the piece, ``text`` being at character ``offset``
+    of the whole text, and ``tickets`` lists ``(start, end, system)``
+    for the tickets in the piece, by their position in ``text``.
+    No ticket spans two pieces, and the pieces make up the whole text.
+    """
+    # ``pending`` is the text not yet fully scanned, starting at ``offset``,
+    # with the text before ``scan_from`` kept only as context for look-behinds.
+    pending, offset, scan_from = "", 0, 0
+    for chunk in _itertools.chain(text_or_lines, [None]):
+        if chunk is None:
+            end_limit = len(pending) + 1
+        else:
+            pending += chunk
+            end_limit = len(pending)
+        tickets = list(_tickets_in(pending, scan_from, end_limit, finders))
+        if chunk is None:
+            yield pending, offset, scan_from, len(pending), tickets
+            return
+
+        # A ticket not yet found could only be in the text after the last
+        # whitespace, and can't be longer than MAX_TICKET_LENGTH.
+        carry_from = tickets[-1][1] if tickets else scan_from
+        last_whitespace = None
+        for last_whitespace in _WHITESPACE_MATCHER.finditer(
+            pending, max(carry_from, len(pending) - MAX_TICKET_LENGTH)
+        ):
+            pass
+        if last_whitespace:
+            carry_from = max(carry_from, last_whitespace.end())
+        carry_from = max(carry_from, len(pending) - MAX_TICKET_LENGTH)
+        yield pending, offset, scan_from, carry_from, tickets
+        keep_from = max(0, carry_from - MAX_TICKET_LENGTH)
+        pending, offset = pending[keep_from:], offset + keep_from
+        scan_from = carry_from - keep_from
+
+
+@classify("ticketing system", "string")
+def replace_tickets(replacement_for, text):
+    """
+    Return ``text`` with each ticket found in it replaced.
+
+    Tickets are found the same way as :py:func:`find_tickets` finds them.
+
+    Args:
+        replacement_for (callable): Called with the ticketing system and the ticket,
+            returns the string to replace the ticket with.
+        text (str): The text to process.
+
+    Returns:
+        str: The text with its tickets replaced.
+
+    """
+    finders = _ticket_finders()
+    if len(finders) == 1:
+        regex, system_for = finders[0]
+        return regex.sub(
+            lambda match: replacement_for(system_for(match), match.group()), text
+        )
+
+    pieces = []
+    last_end = 0
+    for start, end, system in _tickets_in(text, 0, len(text) + 1, finders):
+        pieces.extend([text[last_end:start], replacement_for(system, text[start:end])])
+        last_end = end
+    pieces.append(text[last_end:])
+    return "".join(pieces)
+
+
 @classify("random", "string")
 def generate_random_string(prefix="", suffix="", size=8, choose_from=None):
     """
@@ -547,6 +1117,8 @@ def generate_random_string(prefix="", suffix="", size=8, choose_from=None):
         'uiiaueea'
 
     """
+    import random
+
     choose_from = default_if_none(choose_from, _string.ascii_lowercase + _string.digits)
     rand_string_length = size - len(prefix) - len(suffix)
     message = '"size" of {} too short with prefix {} and suffix {}!'
@@ -687,6 +1259,8 @@ def get_file_docstring(file_path):
         str: The python file's docstring.
 
     """
+    import ast
+
     tree = ast.parse(get_file_contents(file_path))
     return ast.get_docstring(tree)
 
@@ -726,6 +1300,128 @@ def filter_lines(line_filter, lines, return_type=None):
     return filtered_lines if return_type is list else "\n".join(filtered_lines)
 
 
+FOLLOW_MIN_POLL_INTERVAL = 0.05
+"""Seconds ``follow_file`` waits before looking for more data, when it just had some."""
+
+FOLLOW_MAX_POLL_INTERVAL = 1.0
+"""Most seconds ``follow_file`` waits before looking for more data."""
+
+_FOLLOW_READ_SIZE = 1024 * 1024
+
+
+def _file_identity(file_stat):
+    return file_stat.st_dev, file_stat.st_ino
+
+
+@classify("files", "looping")
+def follow_file(
+    path,
+    line_filter=None,
+    from_end=False,
+    encoding="utf-8",
+    errors="replace",
+    stop=None,
+    min_poll_interval=FOLLOW_MIN_POLL_INTERVAL,
+    max_poll_interval=FOLLOW_MAX_POLL_INTERVAL,
+):
+    """
+    Yield the lines of a (log) file as they are written, like ``tail -F``.
+
+    Only the data appended since the last look is read. Lines are yielded
+    when complete (ending with a newline), as ``str`` including the newline.
+
+    If the file is rotated (``path`` becomes another file), the rest of the
+    old file is read before moving on to the new one, from its start.
+    If the file is truncated, it is read again from its start.
+    If the file doesn't exist (yet, or for a moment while rotated),
+    it is waited for.
+
+    When no data has come in, the wait before looking again grows,
+    Fibonacci style (see ``fib_or_max``), from ``min_poll_interval``
+    to ``max_poll_interval`` seconds, so an idle file costs very little CPU,
+    while a busy one is read with little latency.
+
+    Args:
+        path (str): The file to follow.
+        line_filter (Callable): Only yield the lines it returns true for, like
+            ``filter_lines``; for instance a ``UUIDLineReplacer``'s result
+            can be filtered, or a replacer applied with ``map``.
+        from_end (bool): Start at the end of the file, rather than its start,
+            if it exists when following begins.
+        encoding (str): The encoding of the file.
+        errors (str): How to handle decoding errors, see ``bytes.decode``.
+        stop (threading.Event): Stop following (and waiting) once this is set.
+            Without it, the file is followed until the generator is closed.
+        min_poll_interval (float): see above.
+        max_poll_interval (float): see above.
+
+    Yields:
+        str: each line written to the file.
+
+    """
+    if stop is None:
+        import threading
+
+        stop = threading.Event()
+    max_steps = max(1, int(max_poll_interval / min_poll_interval))
+    idle_polls = 0
+    followed = identity = None
+    pending = b""
+    try:
+        while not stop.is_set():
+            if followed is None:
+                try:
+                    followed = open(path, "rb")
+                except FileNotFoundError:
+                    pass
+                else:
+                    identity = _file_identity(_os.fstat(followed.fileno()))
+                    if from_end:
+                        followed.seek(0, _os.SEEK_END)
+                # Like ``tail -F``, a file that appears later is read from its start.
+                from_end = False
+
+            data = b""
+            if followed is not None:
+                if _os.fstat(followed.fileno()).st_size < followed.tell():
+                    _debug("%s was truncated, reading it from the start", path)
+                    followed.seek(0)
+                    pending = b""
+                data = followed.read(_FOLLOW_READ_SIZE)
+                if not data:
+                    try:
+                        rotated = _file_identity(_os.stat(path)) != identity
+                    except FileNotFoundError:
+                        rotated = True
+                    if rotated:
+                        # Anything written to the old file before it was rotated
+                        # has been read by now, as reading found nothing more.
+                        _debug("%s was rotated, following the new file", path)
+                        followed.close()
+                        followed = None
+                        if pending:
+                            data, pending = pending + b"\n", b""
+
+            if not data:
+                idle_polls += 1
+                stop.wait(
+                    min_poll_interval
+                    * max(1, fib_or_max(idle_polls, max_number=max_steps))
+                )
+                continue
+            idle_polls = 0
+
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                line = (line + b"\n").decode(encoding, errors)
+                if line_filter is None or line_filter(line):
+                    yield line
+    finally:
+        if followed is not None:
+            followed.close()
+
+
 @classify("misc")
 def fib_or_max(fib_number_index, max_number=None):
     """
@@ -768,7 +1464,9 @@ def retry_on_exceptions(
     assert exceptions, "No exception(s) given"
     assert max_retry_count > 0, "max_retry_count must be greater than 0"
 
-    @_wrapt.decorator
+    import wrapt
+
+    @wrapt.decorator
     def wrapper(wrapped, instance, args, kwargs):
         error_count = 0
         while error_count <= max_retry_count:
@@ -916,7 +1614,9 @@ def assert_if_values(format_if_format, error_fun=lambda x: "\n".join(truths_from
 
     """
 
-    @_wrapt.decorator
+    import wrapt
+
+    @wrapt.decorator
     def helper(wrapped, instance, args, kwargs):
         err_msg = format_if(format_if_format, error_fun(wrapped(*args, **kwargs)))
         assert not err_msg, err_msg
@@ -1340,6 +2040,68 @@ def build_classification_rst_string(from_dict, for_module, category_name_mapping
     return result
 
 
+class _ClassifiedDocModule(_types.ModuleType):
+    """Module type whose doc string gets its classification rST on first access."""
+
+    @property
+    def __doc__(self):
+        module_dict = vars(self)
+        doc_string = module_dict["__doc__"]
+        if doc_string is None:
+            return doc_string
+        if "_classification_rst" not in module_dict:
+            module_dict["_classification_rst"] = build_classification_rst_string(
+                module_dict, self.__name__, module_dict["_classification_categories"]
+            )
+        return doc_string + module_dict["_classification_rst"]
+
+    @__doc__.setter
+    def __doc__(self, value):
+        vars(self).update(__doc__=value, _classification_rst="")
+
+    # A module's own ``__getattr__`` and ``__dir__`` functions (PEP 562)
+    # are only used by Python 3.7 and later, so they are also called from here.
+    def __getattr__(self, name):
+        module_getattr = vars(self).get("__getattr__")
+        if module_getattr is None:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(self.__name__, name)
+            )
+        return module_getattr(name)
+
+    def __dir__(self):
+        module_dir = vars(self).get("__dir__")
+        return module_dir() if module_dir is not None else super().__dir__()
+
+
+@classify("doc")
+def defer_classification_rst_string(module_name, category_name_mappings):
+    """
+    Append classification rST to a module's doc string only when it is requested.
+
+    Only documentation tools read the classification rST,
+    so this saves every import of ``module_name`` the cost of building it.
+    The result is identical to::
+
+        __doc__ += build_classification_rst_string(globals(), __name__, <category
+                   mappings dict>)
+
+    Example:
+        At the end of the module to be documented::
+
+            defer_classification_rst_string(__name__, <category mappings dict>)
+
+    Args:
+        module_name (str): The module whose doc string is to be extended.
+        category_name_mappings (str): Map from the short hand names used in the
+            :py:func:`classify` decorator to the desired category table label.
+
+    """
+    module = _sys.modules[module_name]
+    vars(module)["_classification_categories"] = category_name_mappings
+    module.__class__ = _ClassifiedDocModule
+
+
 @classify("misc")
 def percent_diff(a, b, precision=2):
     """Get percentage difference, out to ``precision`` places."""
@@ -1361,13 +2123,15 @@ def execute_command_list(commands_to_run, verbose=True):
 
     If any command fails, print a helpful message and exit with that status.
     """
+    import subprocess
+
     for command in commands_to_run:
         readable_command = " ".join(command)
         try:
             if verbose:
                 print(readable_command)
-            _subprocess.check_call(command)
-        except _subprocess.CalledProcessError as e:
+            subprocess.check_call(command)
+        except subprocess.CalledProcessError as e:
             print(
                 '"{}" - returned status code "{}"'.format(
                     readable_command, e.returncode
@@ -1381,8 +2145,7 @@ def execute_command_list(commands_to_run, verbose=True):
             exit(2)
 
 
-__doc__ += build_classification_rst_string(
-    globals(),
+defer_classification_rst_string(
     __name__,
     {
         "class": "Classes Defined in this Module",
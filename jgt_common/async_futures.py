@@ -0,0 +1,189 @@
+"""
+Asyncio counterparts of the ``jgt_common.futures`` helpers.
+
+Terminology:
+
+  * tdict - tasks dictionary - like an fdict in ``jgt_common.futures``,
+    a dictionary whose keys are asyncio tasks and whose values
+    are the items the tasks are working on.
+
+Purpose:
+
+   The same "spot" parallelism as ``jgt_common.futures``, for code running in
+   an asyncio event loop, and calling coroutine functions (``async def``) on
+   each item. Since a task is much cheaper than a thread, this can fan out to
+   many thousands of concurrent I/O calls.
+
+Architecture:
+
+   Rather than a shared pool of threads, concurrency is bounded by a semaphore
+   that each task holds while it is running ``func``, so all the tasks can be
+   created up front, but only so many of them run ``func`` at once.
+   As with the thread pool size in ``jgt_common.futures``, the bound is
+   configured once, by calling ``set_max_concurrency``, and can be overridden
+   per call with ``max_concurrency``.
+
+   Except for ``run_each``, these functions are coroutines, or async generators,
+   so need to be awaited, or iterated over with ``async for``::
+
+        async for item, result in as_completed_item_result(
+            run_each(urls, fetch, max_concurrency=500)
+        ):
+            ...
+
+"""
+
+import asyncio
+
+_MAX_CONCURRENCY = None
+
+
+def set_max_concurrency(max_concurrency):
+    """
+    Set the default number of tasks that may run ``func`` at once.
+
+    ``None``, the initial setting, means there is no limit.
+    """
+
+    global _MAX_CONCURRENCY
+    _MAX_CONCURRENCY = max_concurrency
+
+
+def _bounded(func, semaphore):
+    if semaphore is None:
+        return func
+
+    async def bounded_func(item):
+        async with semaphore:
+            return await func(item)
+
+    return bounded_func
+
+
+def run_each(iterable, func, max_concurrency=None):
+    """
+    Call the coroutine function ``func`` on each item in ``iterable``, as a task.
+
+    Must be called from within a running event loop. The tasks are created,
+    but not yet run, by the time this function returns. It is up to the caller
+    to decide how to harvest the results from the tasks.
+
+    Can be used directly, but is mostly used under the covers
+    by the other functions in this module.
+
+    Args:
+        iterable (any): Any iterable.
+        func (callable): coroutine function that will be called with
+            one item from iterable.
+        max_concurrency (int): the most tasks to run ``func`` at once
+            (default: as set by ``set_max_concurrency``).
+
+    Returns:
+        tdict: Mapping from a task to the item from iterable used to make it.
+
+    """
+
+    if max_concurrency is None:
+        max_concurrency = _MAX_CONCURRENCY
+    semaphore = None if max_concurrency is None else asyncio.Semaphore(max_concurrency)
+    func = _bounded(func, semaphore)
+    return {asyncio.ensure_future(func(item)): item for item in iterable}
+
+
+async def _as_completed(tdict):
+    """
+    Yield the tasks of ``tdict`` as they complete.
+
+    Unlike ``asyncio.as_completed``, this yields the tasks themselves,
+    so they can be used to look up their items. Each task puts itself
+    in a queue when done, so this takes constant time per task.
+    """
+    done = asyncio.Queue()
+    tasks = list(tdict)
+    for task in tasks:
+        task.add_done_callback(done.put_nowait)
+    for _ in tasks:
+        yield await done.get()
+
+
+async def set_response_when_completed(tdict):
+    """Set ``.response`` on each value from ``tdict`` to its task's result."""
+
+    async for task in _as_completed(tdict):
+        tdict[task].response = task.result()
+
+
+async def set_response_on_each(iterable, func, max_concurrency=None):
+    """
+    Set ``.response`` on each item in ``iterable`` to ``await func(item)``.
+
+    Like ``jgt_common.futures.set_response_on_each``,
+    with ``max_concurrency`` passed on to ``run_each``.
+    """
+
+    await set_response_when_completed(
+        run_each(iterable, func, max_concurrency=max_concurrency)
+    )
+
+
+async def set_when_completed(field, tdict):
+    """Set ``field`` on each value from ``tdict`` to its task's result."""
+
+    async for task in _as_completed(tdict):
+        setattr(tdict[task], field, task.result())
+
+
+async def set_each(iterable, field, func, max_concurrency=None):
+    """
+    Set ``field`` on each item in ``iterable`` to ``await func(item)``.
+
+    A more general form of ``set_response_on_each``.
+    ``max_concurrency`` is passed on to ``run_each``.
+    """
+
+    await set_when_completed(
+        field, run_each(iterable, func, max_concurrency=max_concurrency)
+    )
+
+
+async def as_completed_result(tasks):
+    """
+    Yield the result from each of ``tasks`` as it completes.
+
+    ``tasks`` can be a tdict, or any other iterable of tasks.
+    """
+
+    async for task in _as_completed(tasks):
+        yield task.result()
+
+
+async def result_from_each(iterable, func, max_concurrency=None):
+    """
+    Shorthand for ``as_completed_result(run_each(iterable, func))``.
+
+    When you want all the results from calling ``func`` on the items from ``iterable``,
+    but you don't need to know which result came from which item or in which order.
+    ``max_concurrency`` is passed on to ``run_each``.
+    """
+
+    async for result in as_completed_result(
+        run_each(iterable, func, max_concurrency=max_concurrency)
+    ):
+        yield result
+
+
+async def as_completed_item_result(tdict):
+    """
+    Yield ``(item, result)`` pairs from ``tdict`` as each task completes.
+
+    Example:
+        The results can be collected into a dictionary with::
+
+            tasks = run_each(iterable, func)
+            results_map = {
+                item: result async for item, result in as_completed_item_result(tasks)
+            }
+    """
+
+    async for task in _as_completed(tdict):
+        yield tdict[task], task.result()
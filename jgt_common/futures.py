@@ -7,6 +7,8 @@ Terminology:
     module documentation, a dictionary whose keys are futures and whose values
     are related to the work being done. See each function for details on what
     the values will be.
+  * window - a ``FutureWindow``, which stands in for an fdict when the work
+    is submitted ``max_in_flight`` items at a time (see ``run_each``).
 
 Purpose:
 
@@ -29,21 +31,169 @@ Archicture:
    functions defined here, but users of this module are free to use it themselves
    directly as needed.
 
+   The size of a pool can be changed at any time, say from configuration being
+   reloaded, an autoscaling policy (see ``pool_stats``), or the phases of a load
+   test. The functions here don't hand all their work to the executor at once:
+   it waits in a queue of the pool's own, and only as many items as the pool's
+   size are running at any time, so a new size takes effect as soon as
+   enough of the running work is done, for growing and shrinking alike.
+   Once started, an executor can not change its size, so it is replaced:
+   the work already running on it still completes, while new work goes to
+   a new executor of the new size. (A thread that is done with an item goes on
+   with the next queued one, if it is its turn, so queued work can also
+   finish on the threads of the old executor.) Likewise, after
+   ``shutdown_executor``, the next use of a pool starts a new executor.
+   So users of the executors should get them from ``get_executor`` when needed,
+   rather than keeping them. Work submitted to an executor directly doesn't
+   wait in the queue, so doesn't count against the pool's size.
+
+   For CPU bound work, which would only serialize on the GIL in threads,
+   there is also a shared process pool, sized with ``set_process_pool_size``.
+   The functions that start work take a ``pool`` argument to pick which of the
+   named pools, ``THREADS`` (the default) or ``PROCESSES``, to use.
+   Work sent to the process pool has to be picklable: ``func`` has to be
+   a module level function (or a ``functools.partial`` of one), not a lambda.
+
+   When there are very many items, each taking very little time, the cost of
+   a future per item can exceed the cost of the work itself (especially with
+   processes, where each one costs a round trip between processes).
+   The ``_batched`` functions call ``func`` on chunks of items per future
+   instead, while still giving results per item.
+
+Errors and timeouts:
+
+   By default, the functions harvesting results raise the first exception
+   raised by ``func``, leaving the other futures to run on.
+   They all take these options to do otherwise:
+
+   * ``on_error`` - ``RAISE`` (the default), ``FAIL_FAST`` to also cancel
+     the futures that have not started yet (and stop submitting any more,
+     for a window), or ``COLLECT`` to harvest all the other results first,
+     then raise a ``FailedItemsException`` listing each failed item.
+   * ``timeout`` - the most seconds to wait for all the results. If there are
+     still futures pending then, those not yet started are cancelled
+     and ``TimeoutError`` is raised.
+
+   Work that has already started can not be stopped, so there is no timeout
+   per future: the futures cancelled are those still waiting for a worker.
+
+   Likewise, when the consumer of one of the generators stops early (with
+   ``break``, or by closing it), the futures not yet started are cancelled,
+   and no more items are submitted.
+
 """
 
+from concurrent.futures import FIRST_COMPLETED as _FIRST_COMPLETED
+from concurrent.futures import CancelledError as _CancelledError
+from concurrent.futures import Future as _Future
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
 from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from concurrent.futures import TimeoutError as _TimeoutError
 from concurrent.futures import as_completed  # imported for pass-through use.
 from concurrent.futures import wait  # noqa - imported for pass-through use.
+from collections import deque as _deque
+from collections import namedtuple as _namedtuple
+from functools import partial as _partial
+from itertools import islice as _islice
+import threading as _threading
+import time as _time
+
+THREADS = "threads"
+PROCESSES = "processes"
 
 _THREADPOOL_EXECUTOR = None
 _MAX_WORKERS = None
+_PROCESSPOOL_EXECUTOR = None
+_MAX_PROCESSES = None
+# Held while starting, replacing or shutting down the executors.
+_EXECUTOR_LOCK = _threading.Lock()
+
+# How much the latest item counts in the average latencies of ``pool_stats``.
+LATENCY_SMOOTHING = 0.1
+
+PoolStats = _namedtuple("PoolStats", "size running queued wait_seconds run_seconds")
+PoolStats.__doc__ = """
+The state of a pool, as returned by ``pool_stats``.
+
+Attributes:
+    size (int): the size set for the pool.
+    running (int): the number of items running.
+    queued (int): the number of items waiting for their turn to run.
+    wait_seconds (float): the average time items waited for their turn.
+    run_seconds (float): the average time items took to run.
+"""
+
+# What to do when ``func`` raises (see "Errors and timeouts" above).
+RAISE = "raise"
+FAIL_FAST = "fail_fast"
+COLLECT = "collect"
+
+# How long an adaptively sized chunk should take to work on,
+# and the most items to put in one.
+ADAPTIVE_CHUNK_SECONDS = 0.01
+MAX_ADAPTIVE_CHUNK_SIZE = 10000
+
+
+class FailedItemsException(Exception):
+    """
+    Exception for the items whose futures raised, when collecting all errors.
+
+    Args:
+        msg (str): Human readable string describing the exception.
+        errors (list): ``(item, exception)`` for each item that failed.
+
+    Attributes:
+        errors (list): ``(item, exception)`` for each item that failed.
+
+    """
+
+    def __init__(self, msg, errors=()):
+        self.errors = list(errors)
+        super(FailedItemsException, self).__init__(msg)
 
 
 def set_thread_pool_size(max_workers):
-    """Set the size for the shared ThreadPoolExecutor."""
+    """
+    Set the size for the shared ThreadPoolExecutor.
 
-    global _MAX_WORKERS
-    _MAX_WORKERS = max_workers
+    If it has been started with a different size, it is replaced
+    (see "Architecture" above).
+    """
+
+    global _MAX_WORKERS, _THREADPOOL_EXECUTOR
+    with _EXECUTOR_LOCK:
+        if max_workers != _MAX_WORKERS and _THREADPOOL_EXECUTOR is not None:
+            _THREADPOOL_EXECUTOR.shutdown(wait=False)
+            _THREADPOOL_EXECUTOR = None
+        _MAX_WORKERS = max_workers
+    _DISPATCHERS[THREADS].dispatch()
+
+
+def set_process_pool_size(max_workers):
+    """
+    Set the size for the shared ProcessPoolExecutor.
+
+    If it has been started with a different size, it is replaced
+    (see "Architecture" above).
+    """
+
+    global _MAX_PROCESSES, _PROCESSPOOL_EXECUTOR
+    with _EXECUTOR_LOCK:
+        if max_workers != _MAX_PROCESSES and _PROCESSPOOL_EXECUTOR is not None:
+            _PROCESSPOOL_EXECUTOR.shutdown(wait=False)
+            _PROCESSPOOL_EXECUTOR = None
+        _MAX_PROCESSES = max_workers
+    _DISPATCHERS[PROCESSES].dispatch()
+
+
+def get_pool_size(pool=THREADS):
+    """Return the size set for ``pool``, or ``None`` if it has not been set."""
+
+    if pool == THREADS:
+        return _MAX_WORKERS
+    if pool == PROCESSES:
+        return _MAX_PROCESSES
+    raise ValueError("No such pool: {!r}".format(pool))
 
 
 # Implemenation note:
@@ -51,35 +201,382 @@ def set_thread_pool_size(max_workers):
 # If no executor is ever created, the shutdown function doesn't need to do anything.
 # If the only way to get at the executor was via this function,
 # then shutdown might create an executor just to shut it down.
-def get_executor():
+def get_executor(pool=THREADS):
     """
-    Get the shared ThreadPoolExecutor.
+    Get the shared ThreadPoolExecutor, or the shared ProcessPoolExecutor.
+
+    Args:
+        pool (str): ``THREADS`` or ``PROCESSES``.
 
     Returns:
-        ThreadPoolExecutor: the shared thread pool executor.
+        Executor: the shared executor for ``pool``.
 
     Raises:
-        TypeError: if ``set_thread_pool_size()`` was not called first.
+        TypeError: if ``set_thread_pool_size()``,
+            or ``set_process_pool_size()``, was not called first.
+        ValueError: if ``pool`` is not the name of a pool.
+
+    """
+
+    global _THREADPOOL_EXECUTOR, _PROCESSPOOL_EXECUTOR
+    if pool == THREADS:
+        executor = _THREADPOOL_EXECUTOR
+        if executor is None:
+            with _EXECUTOR_LOCK:
+                if _THREADPOOL_EXECUTOR is None:
+                    if _MAX_WORKERS is None:
+                        raise TypeError(
+                            "set_thread_pool_size() has to be called first."
+                        )
+                    _THREADPOOL_EXECUTOR = _ThreadPoolExecutor(
+                        max_workers=_MAX_WORKERS
+                    )
+                executor = _THREADPOOL_EXECUTOR
+        return executor
+    if pool == PROCESSES:
+        executor = _PROCESSPOOL_EXECUTOR
+        if executor is None:
+            with _EXECUTOR_LOCK:
+                if _PROCESSPOOL_EXECUTOR is None:
+                    if _MAX_PROCESSES is None:
+                        raise TypeError(
+                            "set_process_pool_size() has to be called first."
+                        )
+                    _PROCESSPOOL_EXECUTOR = _ProcessPoolExecutor(
+                        max_workers=_MAX_PROCESSES
+                    )
+                executor = _PROCESSPOOL_EXECUTOR
+        return executor
+    raise ValueError("No such pool: {!r}".format(pool))
+
+
+def shutdown_executor(wait=True):
+    """
+    If a ThreadPoolExecutor, or a ProcessPoolExecutor, was started, shut it down.
+
+    With ``wait``, this first waits for the work queued for the pools to be done.
+    The pools can still be used afterwards, with new executors
+    (of the sizes last set) started as needed.
+    """
+
+    global _THREADPOOL_EXECUTOR, _PROCESSPOOL_EXECUTOR
+    if wait:
+        for dispatcher in _DISPATCHERS.values():
+            dispatcher.wait_until_idle()
+    with _EXECUTOR_LOCK:
+        executors = (_THREADPOOL_EXECUTOR, _PROCESSPOOL_EXECUTOR)
+        _THREADPOOL_EXECUTOR = _PROCESSPOOL_EXECUTOR = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _current_executor(pool):
+    return _THREADPOOL_EXECUTOR if pool == THREADS else _PROCESSPOOL_EXECUTOR
+
+
+class _Dispatcher(object):
+    """
+    Queue of the work for a pool, started no more at a time than the pool's size.
+
+    Each item gets a future of its own when it is queued, which is given the
+    outcome of the executor's future once the item has had its turn to run.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._queue = _deque()
+        self._running = 0
+        self._wait_seconds = self._run_seconds = 0.0
+        self._lock = _threading.Lock()
+        self._idle = _threading.Condition(self._lock)
+        self._local = _threading.local()
+
+    def submit(self, func, item):
+        future = _Future()
+        with self._lock:
+            self._queue.append((future, func, item, _time.perf_counter()))
+            # Otherwise, it is started by a worker when it is its turn.
+            start = self._running < (get_pool_size(self.pool) or 0)
+        if start:
+            self.dispatch()
+        return future
+
+    def _next(self, finished=None):
+        """
+        Return the next item to start, if there is one and it is its turn.
+
+        ``finished`` is when the item a worker has just run started, if any.
+        """
+        with self._lock:
+            if finished is not None:
+                self._count_finished(finished)
+            size = get_pool_size(self.pool) or 0
+            while self._queue and self._running < size:
+                future, func, item, queued = self._queue.popleft()
+                if future.set_running_or_notify_cancel():
+                    self._running += 1
+                    self._wait_seconds += LATENCY_SMOOTHING * (
+                        _time.perf_counter() - queued - self._wait_seconds
+                    )
+                    return future, func, item
+            if not self._running and not self._queue:
+                self._idle.notify_all()
+            return None
+
+    def dispatch(self):
+        """Start as many of the queued items as it is the turn of."""
+        # The executor can call ``_finished`` (so this) before ``_start`` returns.
+        if getattr(self._local, "dispatching", False):
+            return
+        self._local.dispatching = True
+        try:
+            for future, func, item in iter(self._next, None):
+                self._start(future, func, item)
+        finally:
+            self._local.dispatching = False
+
+    def _start(self, future, func, item):
+        started = _time.perf_counter()
+        while True:
+            try:
+                executor = get_executor(self.pool)
+                if self.pool == THREADS:
+                    # Cheaper than chaining the executor's future to ``future``.
+                    executor.submit(self._run, future, func, item, started)
+                    return
+                work = executor.submit(func, item)
+                break
+            except RuntimeError as error:
+                # Retry if the executor was replaced, or shut down, meanwhile.
+                if executor is _current_executor(self.pool):
+                    work = _Future()
+                    work.set_exception(error)
+                    break
+            except Exception as error:
+                work = _Future()
+                work.set_exception(error)
+                break
+        work.add_done_callback(_partial(self._finished, future, started))
+
+    def _run(self, future, func, item, started):
+        # Go on with the queued items in this worker while it is their turn,
+        # rather than submitting each of them to the executor.
+        while True:
+            try:
+                result = func(item)
+            except BaseException as error:
+                next_item = self._next(started)
+                future.set_exception(error)
+            else:
+                next_item = self._next(started)
+                future.set_result(result)
+            if next_item is None:
+                return
+            future, func, item = next_item
+            started = _time.perf_counter()
+
+    def _count_finished(self, started):
+        """Count an item that started at ``started`` as done, holding the lock."""
+        self._running -= 1
+        self._run_seconds += LATENCY_SMOOTHING * (
+            _time.perf_counter() - started - self._run_seconds
+        )
+
+    def _finished(self, future, started, work):
+        with self._lock:
+            self._count_finished(started)
+        if work.cancelled():
+            future.set_exception(_CancelledError())
+        elif work.exception() is not None:
+            future.set_exception(work.exception())
+        else:
+            future.set_result(work.result())
+        self.dispatch()
+
+    def stats(self):
+        with self._lock:
+            return PoolStats(
+                get_pool_size(self.pool),
+                self._running,
+                len(self._queue),
+                self._wait_seconds,
+                self._run_seconds,
+            )
+
+    def wait_until_idle(self):
+        self.dispatch()
+        with self._idle:
+            self._idle.wait_for(lambda: not self._running and not self._queue)
+
+
+_DISPATCHERS = {pool: _Dispatcher(pool) for pool in (THREADS, PROCESSES)}
+
+
+def pool_stats(pool=THREADS):
+    """
+    Return the ``PoolStats`` of ``pool``: its queue depth, latencies and so on.
+
+    To base its size on, for example, with an autoscaling policy
+    that a service runs every so often::
+
+        stats = pool_stats()
+        if stats.queued > stats.size and stats.wait_seconds > 1:
+            set_thread_pool_size(min(2 * stats.size, MOST_THREADS))
+        elif not stats.queued and stats.running < stats.size // 2:
+            set_thread_pool_size(max(stats.size // 2, FEWEST_THREADS))
 
     """
 
-    global _THREADPOOL_EXECUTOR
-    if _THREADPOOL_EXECUTOR is None:
-        if _MAX_WORKERS is None:
-            raise TypeError("set_thread_pool_size() has to be called first.")
-        _THREADPOOL_EXECUTOR = _ThreadPoolExecutor(max_workers=_MAX_WORKERS)
-    return _THREADPOOL_EXECUTOR
+    if pool not in _DISPATCHERS:
+        raise ValueError("No such pool: {!r}".format(pool))
+    return _DISPATCHERS[pool].stats()
+
 
+def _submit(pool, func, item):
+    """Queue ``func(item)`` for ``pool``, returning its future."""
+    return _DISPATCHERS[pool].submit(func, item)
 
-def shutdown_executor():
-    """If a ThreadPoolExecutor was started, shut it down."""
 
-    if _THREADPOOL_EXECUTOR is None:
+class FutureWindow(object):
+    """
+    Call ``func`` on the items of ``iterable``, with at most ``max_in_flight`` futures.
+
+    Items are only taken from ``iterable`` as earlier futures complete,
+    so a window over a generator of any length uses a bounded amount of memory.
+
+    A window stands in for an fdict with the functions of this module that take
+    one: iterating over it yields its futures as they complete (see
+    ``as_completed``), and indexing it with one of those futures gives its item.
+    Once a future has been yielded, and the next one asked for,
+    it is dropped from the window and replaced with a new one.
+    Like an iterator, a window can only be gone through once.
+    """
+
+    def __init__(self, iterable, func, max_in_flight, pool=THREADS):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        get_executor(pool)
+        self._pool = pool
+        self._items = iter(iterable)
+        self._func = func
+        self.max_in_flight = max_in_flight
+        self._in_flight = {}
+        self._submit(max_in_flight)
+
+    def _submit(self, count):
+        for item in self._items:
+            self._in_flight[_submit(self._pool, self._func, item)] = item
+            count -= 1
+            if not count:
+                return
+
+    def __getitem__(self, future):  # noqa: D105
+        return self._in_flight[future]
+
+    def __len__(self):
+        """Return the number of futures in flight."""
+        return len(self._in_flight)
+
+    def __iter__(self):  # noqa: D105
+        return self.as_completed()
+
+    def as_completed(self, timeout=None):
+        """
+        Yield the futures of the window as they complete.
+
+        Like ``as_completed``, raises ``TimeoutError`` if they have not all
+        completed ``timeout`` seconds after the first future is asked for.
+        """
+        end_time = None if timeout is None else _time.monotonic() + timeout
+        while self._in_flight:
+            if end_time is not None:
+                timeout = max(0, end_time - _time.monotonic())
+            done, _ = wait(self._in_flight, timeout, return_when=_FIRST_COMPLETED)
+            if not done:
+                raise _TimeoutError(
+                    "{} futures unfinished".format(len(self._in_flight))
+                )
+            for future in done:
+                yield future
+                del self._in_flight[future]
+                self._submit(1)
+
+    def cancel(self):
+        """Take no more items, and cancel the futures that have not started."""
+        self._items = iter(())
+        for future in self._in_flight:
+            future.cancel()
+
+
+def _default_window(pool):
+    """Return twice the size of ``pool``, enough to keep all its workers busy."""
+    get_executor(pool)
+    return 2 * (_MAX_PROCESSES if pool == PROCESSES else _MAX_WORKERS)
+
+
+def _as_completed(fdict, timeout=None):
+    """Like ``as_completed``, but also for a ``FutureWindow``."""
+    if isinstance(fdict, FutureWindow):
+        return fdict.as_completed(timeout)
+    return as_completed(fdict, timeout)
+
+
+def _cancel(fdict):
+    if isinstance(fdict, FutureWindow):
+        fdict.cancel()
         return
-    _THREADPOOL_EXECUTOR.shutdown(wait=True)
+    for future in fdict:
+        future.cancel()
+
 
+def _failed_items(errors):
+    return FailedItemsException(
+        "{} items failed, the first with: {!r}".format(len(errors), errors[0][1]),
+        errors=errors,
+    )
 
-def run_each(iterable, func):
+
+def _completed(fdict, on_error=RAISE, timeout=None):
+    """
+    Yield the futures of ``fdict`` that complete without an exception.
+
+    Handles the futures that do raise as per ``on_error``, and ``timeout``,
+    as described in "Errors and timeouts" above.
+    ``fdict`` can be any iterable of futures, but if it is not an fdict
+    or a window, the errors collected are for the futures, not their items.
+    """
+    if on_error not in (RAISE, FAIL_FAST, COLLECT):
+        raise ValueError("No such on_error: {!r}".format(on_error))
+    has_items = isinstance(fdict, (dict, FutureWindow))
+    errors = []
+    completed = _as_completed(fdict, timeout)
+    while True:
+        try:
+            future = next(completed)
+        except StopIteration:
+            break
+        except _TimeoutError:
+            _cancel(fdict)
+            raise
+        error = future.exception()
+        if error is None:
+            try:
+                yield future
+            except GeneratorExit:
+                _cancel(fdict)
+                raise
+        elif on_error == COLLECT:
+            errors.append((fdict[future] if has_items else future, error))
+        else:
+            if on_error == FAIL_FAST:
+                _cancel(fdict)
+            raise error
+    if errors:
+        raise _failed_items(errors)
+
+
+def run_each(iterable, func, max_in_flight=None, pool=THREADS):
     """
     Call ``func`` on each item in ``iterable``, using a future.
 
@@ -87,30 +584,46 @@ def run_each(iterable, func):
     by the time this function returns. It is up to the caller to decide how to harvest
     the results from the futures.
 
+    With ``max_in_flight``, the items are instead submitted as earlier ones complete
+    (see ``FutureWindow``), rather than all of them up front. This keeps memory use
+    bounded for large or endless iterables, as long as the results are harvested
+    as they come in, which all the functions in this module do.
+
     Can be used directly, but is mostly used under the covers
     by the other functions in this module.
 
     Args:
         iterable (any): Any iterable.
         func (callable): will be called with one item from iterable.
+        max_in_flight (int): the most futures to have at any time (default: all).
+        pool (str): the name of the shared pool to use (see ``get_executor``).
 
     Returns:
         fdict: Mapping from a future to the item from iterable used to make it.
+        A ``FutureWindow`` if ``max_in_flight`` is given.
 
     """
 
-    executor = get_executor()
-    return {executor.submit(func, item): item for item in iterable}
+    if max_in_flight is not None:
+        return FutureWindow(iterable, func, max_in_flight, pool=pool)
+    get_executor(pool)
+    return {_submit(pool, func, item): item for item in iterable}
 
 
-def set_response_when_completed(fdict):
-    """Set ``.response`` on each value from ``fdict`` to its future's result."""
+def set_response_when_completed(fdict, on_error=RAISE, timeout=None):
+    """
+    Set ``.response`` on each value from ``fdict`` to its future's result.
 
-    for future in as_completed(fdict):
+    For ``on_error`` and ``timeout`` see "Errors and timeouts" above.
+    """
+
+    for future in _completed(fdict, on_error=on_error, timeout=timeout):
         fdict[future].response = future.result()
 
 
-def set_response_on_each(iterable, func):
+def set_response_on_each(
+    iterable, func, max_in_flight=None, pool=THREADS, on_error=RAISE, timeout=None
+):
     """
     Shorthand for ``set_response_when_completed(run_each(iterable, func))``.
 
@@ -127,55 +640,90 @@ def set_response_on_each(iterable, func):
 
             set_response_on_each(work_list, lambda item: client.do_work(item.input))
 
+    ``max_in_flight`` and ``pool`` are passed on to ``run_each``,
+    ``on_error`` and ``timeout`` to ``set_response_when_completed``.
     """
 
-    set_response_when_completed(run_each(iterable, func))
+    set_response_when_completed(
+        run_each(iterable, func, max_in_flight=max_in_flight, pool=pool),
+        on_error=on_error,
+        timeout=timeout,
+    )
 
 
-def set_when_completed(field, fdict):
-    """Set the given ``field`` on each value from ``fdict`` to its future's result."""
+def set_when_completed(field, fdict, on_error=RAISE, timeout=None):
+    """
+    Set the given ``field`` on each value from ``fdict`` to its future's result.
 
-    for future in as_completed(fdict):
+    For ``on_error`` and ``timeout`` see "Errors and timeouts" above.
+    """
+
+    for future in _completed(fdict, on_error=on_error, timeout=timeout):
         setattr(fdict[future], field, future.result())
 
 
-def set_each(iterable, field, func):
+def set_each(
+    iterable,
+    field,
+    func,
+    max_in_flight=None,
+    pool=THREADS,
+    on_error=RAISE,
+    timeout=None,
+):
     """
     Set ``field`` on each item from ``iterable`` to the value of ``func(item)``.
 
     Shorthand for ``set_when_completed(field, run_each(iterable, func))``.
 
     A more general form of ``set_response_on_each``.
+    ``max_in_flight`` and ``pool`` are passed on to ``run_each``,
+    ``on_error`` and ``timeout`` to ``set_when_completed``.
     """
 
-    set_when_completed(field, run_each(iterable, func))
+    set_when_completed(
+        field,
+        run_each(iterable, func, max_in_flight=max_in_flight, pool=pool),
+        on_error=on_error,
+        timeout=timeout,
+    )
 
 
-def as_completed_result(futures):
+def as_completed_result(futures, on_error=RAISE, timeout=None):
     """
     Yield each futures ``.result()`` as each future in ``futures`` completes.
 
     Because iterating over a dictionary iterates over it's keys,
-    ``futures`` can be an fdict, or a list of futures, ... any other
+    ``futures`` can be an fdict, a window, or a list of futures, ... any other
     iterable of futures.
+
+    For ``on_error`` and ``timeout`` see "Errors and timeouts" above.
     """
 
-    for future in as_completed(futures):
+    for future in _completed(futures, on_error=on_error, timeout=timeout):
         yield future.result()
 
 
-def result_from_each(iterable, func):
+def result_from_each(
+    iterable, func, max_in_flight=None, pool=THREADS, on_error=RAISE, timeout=None
+):
     """
     Shorthand for ``as_completed_result(run_each(iterable, func))``.
 
     When you want all the results from calling ``func`` on the items from ``iterable``,
     but you don't need to know which result came from which item or in which order.
+    ``max_in_flight`` and ``pool`` are passed on to ``run_each``,
+    ``on_error`` and ``timeout`` to ``as_completed_result``.
     """
 
-    yield from as_completed_result(run_each(iterable, func))
+    yield from as_completed_result(
+        run_each(iterable, func, max_in_flight=max_in_flight, pool=pool),
+        on_error=on_error,
+        timeout=timeout,
+    )
 
 
-def as_completed_item_result(fdict):
+def as_completed_item_result(fdict, on_error=RAISE, timeout=None):
     """
     Yield ``(item, future.result())`` from ``fdict``, as each future completes.
 
@@ -184,7 +732,222 @@ def as_completed_item_result(fdict):
 
         futures = run_each(iterable, func)
         results_map = dict(as_completed_item_result(futures))
+
+    ``fdict`` can also be a window, to process the items in constant memory::
+
+        for item, result in as_completed_item_result(
+            run_each(iterable, func, max_in_flight=100)
+        ):
+            ...
+
+    For ``on_error`` and ``timeout`` see "Errors and timeouts" above.
     """
 
-    for future in as_completed(fdict):
+    for future in _completed(fdict, on_error=on_error, timeout=timeout):
         yield fdict[future], future.result()
+
+
+class _ChunkResults(list):
+    """The results for a chunk of items, and the seconds it took to get them."""
+
+    elapsed = 0.0
+
+
+def _call_on_chunk(func, chunk):
+    start = _time.perf_counter()
+    results = _ChunkResults([func(item) for item in chunk])
+    results.elapsed = _time.perf_counter() - start
+    return results
+
+
+def _chunks(iterable, size_of):
+    """Yield lists of items from ``iterable``, of ``size_of()`` items each."""
+    items = iter(iterable)
+    while True:
+        chunk = list(_islice(items, size_of()))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _AdaptiveChunkWindow(FutureWindow):
+    """
+    A ``FutureWindow`` of chunks, sized from the time taken by earlier chunks.
+
+    Starting with one item, the chunk size at most doubles with each chunk
+    completed, up to the size that should take ``ADAPTIVE_CHUNK_SECONDS``.
+    """
+
+    def __init__(self, iterable, func, max_in_flight, pool=THREADS):
+        self.chunk_size = 1
+        super().__init__(
+            _chunks(iterable, lambda: self.chunk_size),
+            _partial(_call_on_chunk, func),
+            max_in_flight,
+            pool=pool,
+        )
+
+    def _update_chunk_size(self, results):
+        if not results:
+            return
+        per_item = results.elapsed / len(results)
+        best_size = ADAPTIVE_CHUNK_SECONDS / per_item if per_item else float("inf")
+        self.chunk_size = int(
+            max(1, min(2 * self.chunk_size, best_size, MAX_ADAPTIVE_CHUNK_SIZE))
+        )
+
+    def as_completed(self, timeout=None):  # noqa: D102
+        for future in super().as_completed(timeout):
+            if not future.cancelled() and future.exception() is None:
+                self._update_chunk_size(future.result())
+            yield future
+
+
+def run_each_batched(iterable, func, chunk_size=None, max_in_flight=None, pool=THREADS):
+    """
+    Call ``func`` on each item in ``iterable``, a chunk of items per future.
+
+    Like ``run_each``, but each future calls ``func`` on each item of a list of
+    (up to) ``chunk_size`` items, and its result is the list of their results.
+
+    Without a ``chunk_size``, the chunk size adapts to how long the items take,
+    so that each chunk takes about ``ADAPTIVE_CHUNK_SECONDS``.
+    For that, the chunks have to be submitted as earlier ones complete, so
+    ``max_in_flight`` defaults to twice the size of the pool.
+
+    Args:
+        iterable (any): Any iterable.
+        func (callable): will be called with one item from iterable.
+        chunk_size (int): the most items per future (default: adaptive).
+        max_in_flight (int): the most futures to have at any time
+            (see ``run_each``).
+        pool (str): the name of the shared pool to use (see ``get_executor``).
+
+    Returns:
+        fdict: Mapping from a future to the list of items used to make it.
+        A ``FutureWindow`` if ``max_in_flight`` is given, or adapting.
+
+    """
+
+    if chunk_size is not None:
+        return run_each(
+            _chunks(iterable, lambda: chunk_size),
+            _partial(_call_on_chunk, func),
+            max_in_flight=max_in_flight,
+            pool=pool,
+        )
+    if max_in_flight is None:
+        max_in_flight = _default_window(pool)
+    return _AdaptiveChunkWindow(iterable, func, max_in_flight, pool=pool)
+
+
+def as_completed_item_result_batched(fdict, on_error=RAISE, timeout=None):
+    """
+    Yield ``(item, result)`` from ``fdict`` of chunks, as each future completes.
+
+    The batched counterpart of ``as_completed_item_result``,
+    for the fdict (or window) returned by ``run_each_batched``.
+    The first exception from ``func`` fails the whole of its chunk,
+    so with ``COLLECT``, the errors are for chunks (lists of items).
+    """
+
+    for future in _completed(fdict, on_error=on_error, timeout=timeout):
+        yield from zip(fdict[future], future.result())
+
+
+def result_from_each_batched(
+    iterable, func, on_error=RAISE, timeout=None, **batch_args
+):
+    """
+    Shorthand for ``result_from_each``, a chunk of items per future.
+
+    ``batch_args`` are passed on to ``run_each_batched``.
+    For ``on_error`` and ``timeout`` see ``as_completed_item_result_batched``.
+    """
+
+    fdict = run_each_batched(iterable, func, **batch_args)
+    for future in _completed(fdict, on_error=on_error, timeout=timeout):
+        yield from future.result()
+
+
+def set_each_batched(
+    iterable, field, func, on_error=RAISE, timeout=None, **batch_args
+):
+    """
+    Shorthand for ``set_each``, a chunk of items per future.
+
+    ``batch_args`` are passed on to ``run_each_batched``.
+    For ``on_error`` and ``timeout`` see ``as_completed_item_result_batched``.
+    """
+
+    fdict = run_each_batched(iterable, func, **batch_args)
+    for item, result in as_completed_item_result_batched(
+        fdict, on_error=on_error, timeout=timeout
+    ):
+        setattr(item, field, result)
+
+
+def map_each(iterable, func, window=None, pool=THREADS, on_error=RAISE, timeout=None):
+    """
+    Yield ``func(item)`` for each item in ``iterable``, in the order of the items.
+
+    Like the builtin ``map``, but with ``func`` called in the shared pool,
+    on up to ``window`` items ahead of the result being yielded.
+    At most ``window`` items are in flight, or done but waiting for an earlier
+    one to be, so ``iterable`` can be of any length.
+    Unlike ``Executor.map``, items are only taken from ``iterable``
+    as the results are taken, so this streams in bounded memory.
+
+    For ``on_error`` and ``timeout`` see "Errors and timeouts" above.
+    With ``COLLECT``, the results of the items that failed are left out.
+
+    Args:
+        iterable (any): Any iterable.
+        func (callable): will be called with one item from iterable.
+        window (int): the most items to have submitted and not yet yielded
+            (default: twice the size of the pool).
+        pool (str): the name of the shared pool to use (see ``get_executor``).
+        on_error (str): ``RAISE``, ``FAIL_FAST`` or ``COLLECT``.
+        timeout (int,float): the most seconds to wait for all the results.
+
+    """
+
+    if window is None:
+        window = _default_window(pool)
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if on_error not in (RAISE, FAIL_FAST, COLLECT):
+        raise ValueError("No such on_error: {!r}".format(on_error))
+    get_executor(pool)
+    end_time = None if timeout is None else _time.monotonic() + timeout
+    items = iter(iterable)
+    in_flight = _deque(
+        (item, _submit(pool, func, item)) for item in _islice(items, window)
+    )
+    errors = []
+    while in_flight:
+        item, future = in_flight.popleft()
+        if end_time is not None:
+            timeout = max(0, end_time - _time.monotonic())
+        try:
+            error = future.exception(timeout)
+        except _TimeoutError:
+            _cancel([future] + [pending for _, pending in in_flight])
+            raise
+        if error is None or on_error == COLLECT:
+            for next_item in _islice(items, 1):
+                in_flight.append((next_item, _submit(pool, func, next_item)))
+        if error is None:
+            try:
+                yield future.result()
+            except GeneratorExit:
+                _cancel([pending for _, pending in in_flight])
+                raise
+        elif on_error == COLLECT:
+            errors.append((item, error))
+        else:
+            if on_error == FAIL_FAST:
+                _cancel([pending for _, pending in in_flight])
+            raise error
+    if errors:
+        raise _failed_items(errors)
@@ -2,11 +2,8 @@
 
 from contextlib import contextmanager
 from itertools import chain
-import json
 
-import requests
-
-from . import build_classification_rst_string, classify, no_op
+from . import classify, defer_classification_rst_string, no_op
 
 
 MAX_CALL_FAILURES = 5
@@ -45,6 +42,8 @@ def safe_json_from(response, description=""):
         AssertionError: if the JSON data cannot be decoded properly.
 
     """
+    import json
+
     # the json module in py2 doesn't contain the specific error,
     # and instead throws a generic ValueError
     try:
@@ -188,6 +187,9 @@ def format_items_as_string_tree(*items):
 def _status_code_from(status_description):
     if isinstance(status_description, int):
         return status_description
+
+    import requests
+
     return requests.codes.get(status_description.replace(" ", "_").upper())
 
 
@@ -295,6 +297,9 @@ def check_response_status_code(
     """
     if is_status_code(expected_status_description, response.status_code):
         return ""
+
+    import json
+
     try:
         response_content = json.dumps(safe_json_from(response), indent=4)
     except AssertionError:
@@ -445,8 +450,7 @@ def call_with_custom_logger(call, curl_logger):
         curl_logger.done()
 
 
-__doc__ += build_classification_rst_string(
-    globals(),
+defer_classification_rst_string(
     __name__,
     {
         "json": "JSON related functions",
@@ -0,0 +1,217 @@
+"""Link tickets helper."""
+import argparse
+from functools import partial
+import os
+import sys
+
+from . import (
+    _ticket_finders,
+    _ticket_pieces,
+    register_ticketing_system,
+    replace_tickets,
+    url_for_ticket,
+)
+
+
+TICKET_LINK_TEMPLATES = {
+    "html": '<a href="{url}">{ticket}</a>',
+    "markdown": "[{ticket}]({url})",
+    "rst": "`{ticket} <{url}>`__",
+}
+"""
+Templates used to generate a link for a ticket, by markup language.
+
+A template is formatted with the ``ticket``, its ``url`` and its ticketing ``system``.
+"""
+
+DEFAULT_LINK_FORMAT = "markdown"
+
+FILE_BUFFER_SIZE = 1024 * 1024
+"""Buffer size used for the files given to the command-line interface."""
+
+FILE_ERRORS = "surrogateescape"
+"""
+How the command-line interface decodes and encodes its files.
+
+Bytes that aren't valid in the encoding are passed through unchanged,
+so that a stray invalid byte in a log doesn't stop it from being processed.
+"""
+
+CHUNK_SIZE = 1024 * 1024
+"""
+How many characters ``ticket_link`` reads at once.
+
+The input is processed in chunks, not lines, so memory use stays bounded
+even for input without newlines; see ``find_tickets``.
+"""
+
+RECENT_LINKS_SIZE = 4096
+"""
+How many links a ``TicketLineLinker`` remembers.
+
+The same tickets tend to come up again and again, so their links are reused.
+"""
+
+
+class TicketLineLinker(object):
+    """
+    Turn tickets into links on a line-by-line basis.
+
+    Instances should be called with a line to process
+    and will return the line with its tickets linked.
+
+    Tickets from Ticketing Systems without a ``url_template`` are left as is.
+    """
+
+    def __init__(self, template=None):
+        """
+        Create a new ticket linker.
+
+        Args:
+            template (str): A ``.format`` template to use for generating the links.
+                See ``TICKET_LINK_TEMPLATES`` for the fields available to it.
+        """
+
+        self.template = template or TICKET_LINK_TEMPLATES[DEFAULT_LINK_FORMAT]
+        self.links_made = 0
+        self._recent_links = {}
+
+    def _link_for(self, system, ticket):
+        recent = self._recent_links.get((system, ticket))
+        if recent is None:
+            url = url_for_ticket(system, ticket)
+            if url:
+                recent = self.template.format(ticket=ticket, url=url, system=system), 1
+            else:
+                recent = ticket, 0
+            if len(self._recent_links) >= RECENT_LINKS_SIZE:
+                self._recent_links.clear()
+            self._recent_links[system, ticket] = recent
+        link, links = recent
+        self.links_made += links
+        return link
+
+    def __call__(self, line):
+        """Replace all found tickets with links."""
+        return replace_tickets(self._link_for, line)
+
+
+def ticket_link(src, dest, template=None, chunk_size=CHUNK_SIZE):
+    """
+    Turn the tickets in ``src`` into links and write to ``dest``.
+
+    ``src`` is read ``chunk_size`` characters at a time, and only the text not yet
+    written (a chunk or two) is kept in memory, however long its lines are.
+
+    Args:
+        src (file): a file opened for read
+        dest (file): a file opened for write.
+        template (str): the link template to use, see ``TicketLineLinker``.
+        chunk_size (int): how many characters to read at a time.
+
+    Returns:
+        int: the number of links made.
+
+    """
+
+    linker = TicketLineLinker(template=template)
+    for text, _, start, end, tickets in _ticket_pieces(
+        iter(partial(src.read, chunk_size), ""), _ticket_finders()
+    ):
+        for ticket_start, ticket_end, system in tickets:
+            dest.write(text[start:ticket_start])
+            dest.write(linker._link_for(system, text[ticket_start:ticket_end]))
+            start = ticket_end
+        dest.write(text[start:end])
+    return linker.links_made
+
+
+def _with_file_errors(stream):
+    """
+    Return ``stream``, reopened with ``FILE_ERRORS`` if it is stdin or stdout.
+
+    ``argparse.FileType`` gives those as they are for "-".
+    """
+    if stream is sys.stdin:
+        mode = "r"
+    elif stream is sys.stdout:
+        mode = "w"
+    else:
+        return stream
+    return open(
+        stream.fileno(),
+        mode,
+        buffering=FILE_BUFFER_SIZE,
+        encoding=stream.encoding,
+        errors=FILE_ERRORS,
+        closefd=False,
+    )
+
+
+def _url_template_setting(setting):
+    system, separator, url_template = setting.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(
+            '"{}" is not of the form SYSTEM=URL_TEMPLATE'.format(setting)
+        )
+    return system, url_template
+
+
+def main():
+    """Command-line interace for turning tickets into links."""
+    description = (
+        "Utility for turning the tickets found in files into links. "
+        "Only tickets whose ticketing system has a URL template are linked; "
+        "use `--url-template` to provide (or override) one. "
+        "The link template is chosen by `--format`, "
+        "unless the environment variable TICKET_LINK_TEMPLATE is set, "
+        "and the `-t`/`--template` parameter can be used to override both. "
+        "Link templates can use the {ticket}, {url} and {system} fields."
+    )
+    parser = argparse.ArgumentParser(
+        description=description, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r", bufsize=FILE_BUFFER_SIZE, errors=FILE_ERRORS),
+        default="-",
+    )
+    parser.add_argument(
+        "output",
+        nargs="?",
+        type=argparse.FileType("w", bufsize=FILE_BUFFER_SIZE, errors=FILE_ERRORS),
+        default="-",
+    )
+    parser.add_argument(
+        "--format",
+        "-f",
+        choices=sorted(TICKET_LINK_TEMPLATES),
+        default=DEFAULT_LINK_FORMAT,
+        help="markup to use for the links",
+    )
+    parser.add_argument(
+        "--template",
+        "-t",
+        type=str,
+        help="link template",
+        default=os.environ.get("TICKET_LINK_TEMPLATE"),
+    )
+    parser.add_argument(
+        "--url-template",
+        "-u",
+        type=_url_template_setting,
+        action="append",
+        default=[],
+        metavar="SYSTEM=URL_TEMPLATE",
+        help="URL template for a ticketing system, may be given more than once",
+    )
+
+    args = parser.parse_args()
+
+    for system, url_template in args.url_template:
+        register_ticketing_system(system, url_template=url_template)
+    with _with_file_errors(args.input) as src, _with_file_errors(args.output) as dest:
+        ticket_link(
+            src, dest, template=args.template or TICKET_LINK_TEMPLATES[args.format]
+        )
@@ -0,0 +1,387 @@
+"""
+Index of where UUIDs occur in (large) files, to find them without rescanning.
+
+An index file is memory-mapped rather than parsed, so opening even a very large
+index is instantaneous, and each lookup only touches a few pages of the file.
+
+File format (integers are little-endian, UUIDs are 16 big-endian bytes):
+
+  * header: magic bytes, format version, length of the file list,
+    UUID count, occurrence count.
+  * file list: JSON list of the indexed files, with their size and
+    modification time when indexed.
+  * UUIDs: the distinct UUIDs, sorted.
+  * starts: for each UUID, the number of its first occurrence,
+    followed by the total occurrence count.
+  * occurrences: file number and byte offset of each occurrence,
+    grouped by UUID, and sorted by file then offset.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+from .uuid_map_store import UUID_BYTES, int_to_uuid, uuid_to_int
+from .uuid_replacer import UUID_ISOLATED_BYTES_MATCHER, _files_for
+
+MAGIC = b"JGTUUIDX"
+VERSION = 1
+
+RANGE_SIZE = 256 * 1024 * 1024
+"""Size of the file ranges scanned by each job when building an index."""
+
+MAX_RUNS_MERGED = 128
+"""Maximum number of sorted runs merged at once when building an index."""
+
+_HEADER = struct.Struct("<8sIQQQ")
+_START = struct.Struct("<Q")
+_OCCURRENCE = struct.Struct("<IQ")
+# Records of the sorted runs: UUID, file number, offset, all big-endian,
+# so that sorting the records as bytes sorts them by UUID, file then offset.
+_RUN_RECORD = struct.Struct(">16sIQ")
+_RUN_BUFFER_SIZE = 1024 * 1024
+
+
+def _index_range(path, file_number, start, end, run_path):
+    """
+    Write a sorted run of the UUIDs starting in ``[start, end)`` of ``path``.
+
+    See the implementation note above ``_uuids_first_seen_in_range`` in
+    :py:mod:`jgt_common.uuid_replacer` on scanning ranges of a file independently.
+
+    Returns:
+        int: the number of UUIDs found.
+    """
+    with open(path, "rb") as src, mmap.mmap(
+        src.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        records = []
+        for match in UUID_ISOLATED_BYTES_MATCHER.finditer(data, start):
+            if match.start() >= end:
+                break
+            records.append(
+                _RUN_RECORD.pack(
+                    uuid_to_int(match.group()).to_bytes(UUID_BYTES, "big"),
+                    file_number,
+                    match.start(),
+                )
+            )
+    records.sort()
+    with open(run_path, "wb") as run:
+        run.writelines(records)
+    return len(records)
+
+
+def _run_records(run_path):
+    """Yield the records of a sorted run file."""
+    with open(run_path, "rb") as run:
+        while True:
+            buffer = run.read(_RUN_BUFFER_SIZE // _RUN_RECORD.size * _RUN_RECORD.size)
+            if not buffer:
+                return
+            for offset in range(0, len(buffer), _RUN_RECORD.size):
+                yield buffer[offset : offset + _RUN_RECORD.size]
+
+
+def _merge_runs(run_paths, merged_path):
+    """Merge sorted run files into one sorted run file, removing them."""
+    with open(merged_path, "wb", buffering=_RUN_BUFFER_SIZE) as merged:
+        merged.writelines(heapq.merge(*map(_run_records, run_paths)))
+    for run_path in run_paths:
+        os.remove(run_path)
+
+
+def build_uuid_index(paths, index_path, jobs=1, range_size=RANGE_SIZE):
+    """
+    Scan files for UUIDs, and write an index of where they occur.
+
+    The files are scanned once, in ranges of ``range_size`` bytes, by a pool
+    of ``jobs`` processes, each writing the UUIDs it finds in a range
+    to a sorted run file; the runs are then merged into the index.
+    The index is written to a temporary file that then replaces ``index_path``.
+
+    Args:
+        paths (iterable): the files, directories (recursively) or globs to index.
+        index_path (str): the index file.
+        jobs (int): the number of processes to use.
+        range_size (int): the size of the file ranges to scan in each job.
+
+    Returns:
+        int: the number of UUID occurrences found.
+    """
+    files = [os.path.abspath(file_path) for file_path in _files_for(paths)]
+    file_list = []
+    for file_path in files:
+        file_stat = os.stat(file_path)
+        file_list.append(
+            {
+                "path": file_path,
+                "size": file_stat.st_size,
+                "mtime_ns": file_stat.st_mtime_ns,
+            }
+        )
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    with tempfile.TemporaryDirectory(dir=index_dir) as work_dir:
+        range_args = [
+            (
+                file_info["path"],
+                file_number,
+                start,
+                min(start + range_size, file_info["size"]),
+            )
+            for file_number, file_info in enumerate(file_list)
+            for start in range(0, file_info["size"], range_size)
+        ]
+        range_args = [
+            args + (os.path.join(work_dir, "{}.run".format(run_number)),)
+            for run_number, args in enumerate(range_args)
+        ]
+        if jobs > 1 and range_args:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(_index_range, *zip(*range_args)))
+        else:
+            for args in range_args:
+                _index_range(*args)
+
+        run_paths = [args[-1] for args in range_args]
+        while len(run_paths) > MAX_RUNS_MERGED:
+            merged_paths = []
+            for group_start in range(0, len(run_paths), MAX_RUNS_MERGED):
+                merged_path = "{}.merged".format(run_paths[group_start])
+                _merge_runs(
+                    run_paths[group_start : group_start + MAX_RUNS_MERGED],
+                    merged_path,
+                )
+                merged_paths.append(merged_path)
+            run_paths = merged_paths
+
+        return _write_index(run_paths, file_list, index_path, work_dir)
+
+
+def _write_index(run_paths, file_list, index_path, work_dir):
+    """Write the index from the sorted runs, returning the occurrence count."""
+    section_paths = [
+        os.path.join(work_dir, section) for section in ("uuids", "starts", "found")
+    ]
+    uuid_count = occurrence_count = 0
+    with open(section_paths[0], "wb", buffering=_RUN_BUFFER_SIZE) as uuids, open(
+        section_paths[1], "wb", buffering=_RUN_BUFFER_SIZE
+    ) as starts, open(section_paths[2], "wb", buffering=_RUN_BUFFER_SIZE) as found:
+        last_uuid = None
+        for record in heapq.merge(*map(_run_records, run_paths)):
+            uuid_bytes, file_number, offset = _RUN_RECORD.unpack(record)
+            if uuid_bytes != last_uuid:
+                uuids.write(uuid_bytes)
+                starts.write(_START.pack(occurrence_count))
+                uuid_count += 1
+                last_uuid = uuid_bytes
+            found.write(_OCCURRENCE.pack(file_number, offset))
+            occurrence_count += 1
+        starts.write(_START.pack(occurrence_count))
+
+    files_json = json.dumps(file_list).encode()
+    temp_path = "{}.{}.tmp".format(index_path, os.getpid())
+    with open(temp_path, "wb") as index:
+        index.write(
+            _HEADER.pack(MAGIC, VERSION, len(files_json), uuid_count, occurrence_count)
+        )
+        index.write(files_json)
+        for section_path in section_paths:
+            with open(section_path, "rb") as section:
+                shutil.copyfileobj(section, index, _RUN_BUFFER_SIZE)
+    os.replace(temp_path, index_path)
+    return occurrence_count
+
+
+class UUIDIndex(object):
+    """
+    Where UUIDs occur in a set of files, as written by ``build_uuid_index``.
+
+    Can be used as a context manager, which closes the index when done.
+
+    Args:
+        path (str): The index file.
+
+    Raises:
+        ValueError: if ``path`` is not a UUID index file.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            files_length,
+            self._uuid_count,
+            self._occurrence_count,
+        ) = _HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('"{}" is not a UUID index file'.format(path))
+        self.files = json.loads(
+            self._data[_HEADER.size : _HEADER.size + files_length].decode()
+        )
+        self._uuids_offset = _HEADER.size + files_length
+        self._starts_offset = self._uuids_offset + UUID_BYTES * self._uuid_count
+        self._occurrences_offset = self._starts_offset + _START.size * (
+            self._uuid_count + 1
+        )
+
+    def close(self):
+        """Release the index file."""
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+        self._file = self._data = None
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):  # noqa: D105
+        self.close()
+
+    def __len__(self):  # noqa: D105
+        return self._uuid_count
+
+    def _uuid_bytes_at(self, position):
+        offset = self._uuids_offset + UUID_BYTES * position
+        return self._data[offset : offset + UUID_BYTES]
+
+    def _position_of(self, uuid):
+        """Return the position of ``uuid`` in the sorted UUIDs, or None."""
+        if not isinstance(uuid, int):
+            uuid = uuid_to_int(uuid)
+        uuid_bytes = uuid.to_bytes(UUID_BYTES, "big")
+        low, high = 0, self._uuid_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._uuid_bytes_at(middle) < uuid_bytes:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._uuid_count and self._uuid_bytes_at(low) == uuid_bytes:
+            return low
+        return None
+
+    def __contains__(self, uuid):  # noqa: D105
+        return self._position_of(uuid) is not None
+
+    def __iter__(self):
+        """Yield the UUIDs (as integers) in the index, in order."""
+        for position in range(self._uuid_count):
+            yield int.from_bytes(self._uuid_bytes_at(position), "big")
+
+    def occurrences(self, uuid):
+        """
+        Return where ``uuid`` (a string, bytes or integer) occurs.
+
+        Returns:
+            list: ``(file path, byte offset)`` tuples, by file then offset.
+        """
+        position = self._position_of(uuid)
+        if position is None:
+            return []
+        first, end = struct.unpack_from(
+            "<QQ", self._data, self._starts_offset + _START.size * position
+        )
+        return [
+            (self.files[file_number]["path"], offset)
+            for file_number, offset in _OCCURRENCE.iter_unpack(
+                self._data[
+                    self._occurrences_offset
+                    + _OCCURRENCE.size * first : self._occurrences_offset
+                    + _OCCURRENCE.size * end
+                ]
+            )
+        ]
+
+    def stale_files(self):
+        """Return the paths of the files changed (or gone) since they were indexed."""
+        stale = []
+        for file_info in self.files:
+            try:
+                file_stat = os.stat(file_info["path"])
+            except OSError:
+                stale.append(file_info["path"])
+                continue
+            if (file_stat.st_size, file_stat.st_mtime_ns) != (
+                file_info["size"],
+                file_info["mtime_ns"],
+            ):
+                stale.append(file_info["path"])
+        return stale
+
+
+def line_at(path, offset):
+    """Return the line of the file at ``path`` holding the byte at ``offset``."""
+    with open(path, "rb") as src, mmap.mmap(
+        src.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        start = data.rfind(b"\n", 0, offset) + 1
+        end = data.find(b"\n", offset)
+        return data[start : len(data) if end < 0 else end]
+
+
+def main():
+    """Command-line interace for indexing and finding UUIDs in files."""
+    description = (
+        "Utility for finding where UUIDs occur in files, without rescanning them. "
+        "`build` scans the files (and directories and globs) given for UUIDs, "
+        "and writes an index of where each one occurs. "
+        "`query` then prints the file and byte offset of each occurrence "
+        "of the UUIDs given, optionally with the line they are on."
+    )
+    parser = argparse.ArgumentParser(
+        description=description, formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    build_parser = subparsers.add_parser("build", help="build an index")
+    build_parser.add_argument("index", help="index file to write")
+    build_parser.add_argument("paths", nargs="+", metavar="PATH")
+    build_parser.add_argument(
+        "--jobs", "-j", type=int, default=1, help="number of processes to use"
+    )
+
+    query_parser = subparsers.add_parser("query", help="find UUIDs in an index")
+    query_parser.add_argument("index", help="index file to read")
+    query_parser.add_argument("uuids", nargs="+", metavar="UUID")
+    query_parser.add_argument(
+        "--lines", "-l", action="store_true", help="print the lines found too"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        occurrence_count = build_uuid_index(args.paths, args.index, jobs=args.jobs)
+        print("{} UUID occurrences indexed".format(occurrence_count), file=sys.stderr)
+        return
+
+    for uuid in args.uuids:
+        if not UUID_ISOLATED_BYTES_MATCHER.fullmatch(uuid.encode()):
+            parser.error('"{}" is not a UUID'.format(uuid))
+    with UUIDIndex(args.index) as index:
+        for stale_path in index.stale_files():
+            print(
+                "{} has changed since it was indexed".format(stale_path),
+                file=sys.stderr,
+            )
+        for uuid in args.uuids:
+            for path, offset in index.occurrences(uuid):
+                location = "{}:{}: {}".format(
+                    path, offset, int_to_uuid(uuid_to_int(uuid))
+                )
+                if args.lines:
+                    location += ": " + line_at(path, offset).decode(errors="replace")
+                print(location)
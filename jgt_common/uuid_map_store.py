@@ -0,0 +1,362 @@
+"""
+Persistent mapping of UUIDs to sequence numbers, for stable UUID placeholders.
+
+A map file is memory-mapped rather than parsed, so opening even a very large map
+is instantaneous, and each lookup only touches a few pages of the file.
+
+File format (integers are little-endian, UUIDs are 16 big-endian bytes):
+
+  * header: magic bytes, format version, UUID count, hash table slot count.
+  * UUIDs: one per sequence number, in order, the first being number 1.
+  * hash table: open addressing with linear probing, each slot holding
+    the sequence number of a UUID, or 0 for an empty slot.
+
+A map file is used by one ``UUIDMapStore`` at a time: each one holds a lock
+(on a ``.lock`` file next to the map) from loading the map until it is closed,
+so that two runs can't both give out the same new numbers.
+"""
+
+from array import array
+from itertools import chain
+import mmap
+import os
+import struct
+import sys
+from uuid import UUID
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows.
+    fcntl = None
+
+MAGIC = b"JGTUUIDM"
+VERSION = 1
+
+UUID_BYTES = 16
+
+_HEADER = struct.Struct("<8sIQQ")
+_SLOT = struct.Struct("<I")
+_MASK_64 = (1 << 64) - 1
+
+
+def uuid_to_int(uuid):
+    """Return the 128-bit integer value of a UUID string (or bytes)."""
+    dash = b"-" if isinstance(uuid, bytes) else "-"
+    return int(uuid.replace(dash, dash[:0]), 16)
+
+
+def int_to_uuid(uuid_int):
+    """Return the (lowercase) string form of a UUID given as a 128-bit integer."""
+    return str(UUID(int=uuid_int))
+
+
+def _slot_hash(uuid_int):
+    """Hash a UUID for the hash table, mixing all of its bits."""
+    folded = (uuid_int ^ (uuid_int >> 64)) & _MASK_64
+    return ((folded * 0x9E3779B97F4A7C15) & _MASK_64) >> 32
+
+
+def _table_size_for(count):
+    """Return the number of hash table slots to use for ``count`` UUIDs."""
+    size = 1
+    while size < 2 * count:
+        size *= 2
+    return size
+
+
+class UUIDTable(object):
+    """
+    A compact, in-memory, growing sequence of distinct UUIDs (as 128-bit integers).
+
+    The UUIDs are packed into a ``bytearray``, 16 bytes each, in the order they
+    were added, and found with a hash table of their positions (an ``array``),
+    much like the map file's, so each UUID takes about 24 bytes,
+    rather than the 100 or so of a dict entry with an ``int`` key and value.
+
+    Positions start at 1, as sequence numbers do.
+    Adding is not thread safe, but looking up while adding is.
+    """
+
+    def __init__(self):
+        self._uuids = bytearray()
+        self._slots = array("I", bytes(_SLOT.size * 8))
+
+    def __len__(self):  # noqa: D105
+        return len(self._uuids) // UUID_BYTES
+
+    def __iter__(self):  # noqa: D105
+        uuids = self._uuids
+        for offset in range(0, len(self) * UUID_BYTES, UUID_BYTES):
+            yield int.from_bytes(uuids[offset : offset + UUID_BYTES], "big")
+
+    def position_of(self, uuid_int):
+        """Return the position of the UUID, or None if it isn't in the table."""
+        slots = self._slots
+        mask = len(slots) - 1
+        slot = hash(uuid_int) & mask
+        position = slots[slot]
+        if not position:
+            return None
+        uuid_bytes = uuid_int.to_bytes(UUID_BYTES, "big")
+        uuids = self._uuids
+        while position:
+            offset = UUID_BYTES * (position - 1)
+            if uuids[offset : offset + UUID_BYTES] == uuid_bytes:
+                return position
+            slot = (slot + 1) & mask
+            position = slots[slot]
+        return None
+
+    def position_for(self, uuid_int):
+        """Return the position of the UUID, adding it to the table if needed."""
+        slots = self._slots
+        mask = len(slots) - 1
+        slot = hash(uuid_int) & mask
+        uuid_bytes = uuid_int.to_bytes(UUID_BYTES, "big")
+        uuids = self._uuids
+        position = slots[slot]
+        while position:
+            offset = UUID_BYTES * (position - 1)
+            if uuids[offset : offset + UUID_BYTES] == uuid_bytes:
+                return position
+            slot = (slot + 1) & mask
+            position = slots[slot]
+
+        uuids += uuid_bytes
+        position = len(uuids) // UUID_BYTES
+        if 2 * position <= len(slots):
+            slots[slot] = position
+            return position
+        # Readers keep using the old hash table until the new one is complete.
+        slots = array("I", bytes(_SLOT.size * _table_size_for(position)))
+        mask = len(slots) - 1
+        for old_position, offset in enumerate(range(0, len(uuids), UUID_BYTES), 1):
+            slot = hash(int.from_bytes(uuids[offset : offset + UUID_BYTES], "big"))
+            slot &= mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = old_position
+        self._slots = slots
+        return position
+
+    def uuid_at(self, position):
+        """Return the UUID (as an integer) at the given position."""
+        if not 0 < position <= len(self):
+            raise IndexError("No UUID at position {}".format(position))
+        offset = UUID_BYTES * (position - 1)
+        return int.from_bytes(self._uuids[offset : offset + UUID_BYTES], "big")
+
+
+def _locked(path):
+    """Return the lock file of the map file at ``path``, once it is locked."""
+    if fcntl is None:
+        return None
+    lock_file = open(path + ".lock", "ab")
+    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    return lock_file
+
+
+def _identity_of(path):
+    """Return what tells whether the file at ``path`` was changed, or None."""
+    try:
+        path_stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return path_stat.st_dev, path_stat.st_ino, path_stat.st_size, path_stat.st_mtime_ns
+
+
+class UUIDMapStore(object):
+    """
+    A mapping from UUIDs (as 128-bit integers) to sequence numbers: 1, 2, 3, ...
+
+    UUIDs added since the map file was opened are kept in memory
+    until ``save`` is called, or the context is exited.
+    Can be used as a context manager, which saves the map when done
+    (unless it has no ``path``, and so is only kept in memory).
+
+    The map file is locked until ``close`` is called (see above),
+    so opening a map file waits for any other store using it to close.
+
+    Args:
+        path (str): The map file. If it doesn't exist (or is empty),
+            the map starts out empty.
+
+    Raises:
+        ValueError: if ``path`` is not a UUID map file.
+
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = self._data = self._lock_file = None
+        self._identity = None
+        self._stored_count = self._table_size = self._table_offset = 0
+        self._new_uuids = {}
+        self._added_uuids = []
+        if not path:
+            return
+        self._lock_file = _locked(path)
+        try:
+            self._open(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _open(self, path):
+        self._identity = _identity_of(path)
+        if not self._identity or not self._identity[2]:
+            return
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._data) >= _HEADER.size:
+            magic, version, count, table_size = _HEADER.unpack_from(self._data)
+        if len(self._data) < _HEADER.size or magic != MAGIC or version != VERSION:
+            self._close_map()
+            raise ValueError('"{}" is not a UUID map file'.format(path))
+        self._stored_count, self._table_size = count, table_size
+        self._table_offset = _HEADER.size + UUID_BYTES * self._stored_count
+
+    def _close_map(self):
+        if self._data is not None:
+            self._data.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = self._data = None
+        self._stored_count = self._table_size = self._table_offset = 0
+        self._new_uuids = {}
+        self._added_uuids = []
+
+    def close(self):
+        """Release the map file, and its lock, discarding any UUIDs not yet saved."""
+        self._close_map()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):  # noqa: D105
+        if self.path:
+            self.save()
+        self.close()
+
+    def __len__(self):  # noqa: D105
+        return self._stored_count + len(self._new_uuids)
+
+    def _stored_uuid_bytes(self, index):
+        offset = _HEADER.size + UUID_BYTES * (index - 1)
+        return self._data[offset : offset + UUID_BYTES]
+
+    def _stored_index_of(self, uuid_int):
+        if not self._table_size:
+            return None
+        uuid_bytes = uuid_int.to_bytes(UUID_BYTES, "big")
+        mask = self._table_size - 1
+        slot = _slot_hash(uuid_int) & mask
+        while True:
+            (index,) = _SLOT.unpack_from(
+                self._data, self._table_offset + _SLOT.size * slot
+            )
+            if not index:
+                return None
+            if self._stored_uuid_bytes(index) == uuid_bytes:
+                return index
+            slot = (slot + 1) & mask
+
+    def index_of(self, uuid_int):
+        """Return the sequence number of the UUID, or None if it isn't in the map."""
+        index = self._new_uuids.get(uuid_int)
+        if index is None:
+            index = self._stored_index_of(uuid_int)
+        return index
+
+    def index_for(self, uuid_int):
+        """Return the sequence number of the UUID, adding it to the map if needed."""
+        index = self.index_of(uuid_int)
+        if index is None:
+            index = self._new_uuids[uuid_int] = len(self) + 1
+            self._added_uuids.append(uuid_int)
+        return index
+
+    def uuid_at(self, index):
+        """Return the UUID (as an integer) with the given sequence number."""
+        if not 0 < index <= len(self):
+            raise IndexError("No UUID number {} in the map".format(index))
+        if index <= self._stored_count:
+            return int.from_bytes(self._stored_uuid_bytes(index), "big")
+        return self._added_uuids[index - self._stored_count - 1]
+
+    def _table_with_added_uuids(self, table_size):
+        """Return the hash table of ``table_size`` slots, with all the UUIDs."""
+        if table_size == self._table_size:
+            # Only the added UUIDs need to go into a copy of the stored table.
+            table = array("I")
+            with memoryview(self._data) as view:
+                table.frombytes(view[self._table_offset :])
+            if sys.byteorder != "little":
+                table.byteswap()
+            uuids = enumerate(self._added_uuids, start=self._stored_count + 1)
+        else:
+            table = array("I", bytes(_SLOT.size * table_size))
+            stored_uuids = (
+                int.from_bytes(self._stored_uuid_bytes(index), "big")
+                for index in range(1, self._stored_count + 1)
+            )
+            uuids = enumerate(chain(stored_uuids, self._added_uuids), start=1)
+        mask = table_size - 1
+        for index, uuid_int in uuids:
+            slot = _slot_hash(uuid_int) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = index
+        return table
+
+    def save(self, path=None):
+        """
+        Write the map to ``path`` (default: the path it was opened with).
+
+        The file is written to a temporary file that then replaces ``path``,
+        so other readers of the map never see a partially written file.
+        The hash table is only rebuilt when it has to grow; otherwise the new
+        UUIDs are added to a copy of it.
+
+        Raises:
+            ValueError: if there is no ``path`` to write to.
+            RuntimeError: if the map file was changed since it was loaded,
+                which only a writer not using ``UUIDMapStore`` could have done.
+                The map file is left as it is.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path to save the UUID map to")
+        if path == self.path and not self._new_uuids and self._data is not None:
+            return
+        if path != self.path:
+            lock_file = _locked(path)
+        elif _identity_of(path) != self._identity:
+            raise RuntimeError(
+                '"{}" was changed since it was loaded, not overwriting it'.format(path)
+            )
+        count = len(self)
+        table_size = _table_size_for(count)
+        table = self._table_with_added_uuids(table_size)
+
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as map_file:
+            map_file.write(_HEADER.pack(MAGIC, VERSION, count, table_size))
+            if self._stored_count:
+                with memoryview(self._data) as view:
+                    map_file.write(view[_HEADER.size : self._table_offset])
+            map_file.writelines(
+                uuid_int.to_bytes(UUID_BYTES, "big") for uuid_int in self._added_uuids
+            )
+            if sys.byteorder != "little":
+                table.byteswap()
+            table.tofile(map_file)
+        self._close_map()
+        os.replace(temp_path, path)
+        if path != self.path:
+            self.close()
+            self.path, self._lock_file = path, lock_file
+        self._open(path)
@@ -1,15 +1,80 @@
 """Replace UUIDs helper."""
 import argparse
-from itertools import count
+from array import array
+import bz2
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
+import glob
+import gzip
+import io
+from itertools import count, repeat
+import logging
+import lzma
+import mmap
 import os
+import queue
 import re
+import shutil
+import signal
+import stat
+from string import Formatter
 import sys
+import tempfile
+import threading
+import time
 
-from . import UUID_ISOLATED_RE
+from . import UUID_BASIC_RE, UUID_ISOLATED_RE, follow_file, re_for_hex_digits
+from .uuid_map_store import UUIDMapStore, UUIDTable, int_to_uuid, uuid_to_int
 
 
 UUID_ISOLATED_MATCHER = re.compile(UUID_ISOLATED_RE)
 
+_BYTES_WORD_RE = r"[0-9A-Za-z_\x80-\xff]"
+_WORD_BOUNDARY_MATCHER = re.compile(r"(?<!\\)((?:\\\\)*)\\b")
+
+
+def _bytes_pattern(pattern):
+    """
+    Return the ``bytes`` version of the regular expression ``pattern``.
+
+    Word boundaries in ``pattern`` would only count ASCII characters as "word"
+    characters in ``bytes``, so they become lookarounds that also count any
+    non-ASCII byte: the letters that are "word" characters in text are encoded as
+    such bytes in UTF-8, so what is next to one isn't isolated in ``bytes`` either.
+    """
+    boundary = "(?:(?<={0})(?!{0})|(?<!{0})(?={0}))".format(_BYTES_WORD_RE)
+    return _WORD_BOUNDARY_MATCHER.sub(
+        lambda match: match.group(1) + boundary, pattern
+    ).encode("ascii")
+
+
+UUID_ISOLATED_BYTES_MATCHER = re.compile(
+    "(?<!{0}){1}(?!{0})".format(_BYTES_WORD_RE, UUID_BASIC_RE).encode("ascii")
+)
+"""
+``UUID_ISOLATED_MATCHER`` for ``bytes``.
+
+Any non-ASCII byte counts as a "word" character when deciding if a UUID is isolated,
+so UTF-8 text gets the same replacements as with ``UUID_ISOLATED_MATCHER``.
+"""
+
+UUID_LENGTH = len("12345678-1234-1234-1234-123456789012")
+
+CHUNK_SIZE = 8 * 1024 * 1024
+"""Size of the chunks read from inputs that can't be memory-mapped."""
+
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+"""Buffer size of the output file opened by the command-line interface."""
+
+COMPRESSIONS = {
+    "gz": (b"\x1f\x8b", partial(gzip.open, compresslevel=6)),
+    "bz2": (b"BZh", bz2.open),
+    "xz": (b"\xfd7zXZ\x00", lzma.open),
+}
+"""The compressed formats handled, by file extension: magic bytes and ``open``."""
+
 UUID_REPLACEMENT_TEMPLATE = ",,UUID-{:03d},,"
 """
 Template used to generate shorter version for a UUID.
@@ -17,6 +82,43 @@ Template used to generate shorter version for a UUID.
 Is expected to hold exaclty one numeric parameter substitution.
 """
 
+RECENT_REPLACEMENTS_SIZE = 4096
+"""
+Number of recent UUID replacements ``UUIDLineReplacer`` keeps ready to use.
+
+UUIDs are usually repeated close together, so this saves converting them
+and formatting their replacements again, at a small and bounded memory cost.
+"""
+
+IdentifierClass = namedtuple("IdentifierClass", "pattern template")
+"""A kind of identifier to replace: its regular expression and replacement template."""
+
+_IP_V4_OCTET_RE = r"(?:25[0-5]|2[0-4]\d|1?\d?\d)"
+
+IDENTIFIER_CLASSES = {
+    "bearer": IdentifierClass(r"(?<=[Bb]earer )[\w\-.~+/]+=*", ",,TOKEN-{:03d},,"),
+    "uuid": IdentifierClass(UUID_ISOLATED_RE, UUID_REPLACEMENT_TEMPLATE),
+    "ulid": IdentifierClass(
+        r"\b[0-7][0-9A-HJKMNP-TV-Za-hjkmnp-tv-z]{25}\b", ",,ULID-{:03d},,"
+    ),
+    "hex32": IdentifierClass(r"\b{}\b".format(re_for_hex_digits(32)), ",,HEX-{:03d},,"),
+    "ip": IdentifierClass(
+        r"(?<!\d\.)\b(?:{0}\.){{3}}{0}\b(?!\.\d)".format(_IP_V4_OCTET_RE),
+        ",,IP-{:03d},,",
+    ),
+}
+"""
+The identifier classes ``UUIDLineReplacer`` can replace, by name.
+
+When several are replaced, their patterns are tried in this order.
+"""
+
+DEFAULT_IDENTIFIERS = ("uuid",)
+"""The identifier classes replaced by default: only UUIDs."""
+
+GLOSSARY_SEPARATOR = "\n##########\n"
+"""What separates the output from the glossary of UUID replacements after it."""
+
 
 class UUIDLineReplacer(object):
     """
@@ -27,9 +129,25 @@ class UUIDLineReplacer(object):
 
     When you are all done, if you want, you can call ``uuid_mappings``
     to get a list of the substitutions that were made.
+
+    UUIDs are kept packed in a :py:class:`jgt_common.uuid_map_store.UUIDTable`,
+    ``uuids``, in the order they were first seen, and their replacements are
+    generated from their numbers as needed, to keep memory use down when there
+    are millions of them.
+    UUIDs are case insensitive; the glossary uses the lowercase form.
+
+    To keep replacements the same across files and runs, share a
+    :py:class:`jgt_common.uuid_map_store.UUIDMapStore` between replacers.
+
+    Other kinds of identifiers (see ``IDENTIFIER_CLASSES``) can be replaced
+    along with UUIDs, each with its own template and numbering,
+    all in a single pass with one combined regular expression.
+
+    A replacer can be shared between threads: numbering a new identifier
+    is done under a lock, so it gets exactly one number.
     """
 
-    def __init__(self, template=None):
+    def __init__(self, template=None, store=None, identifiers=None):
         """
         Create a new UUID replacer.
 
@@ -37,52 +155,1002 @@ class UUIDLineReplacer(object):
             template (str): A ``.format`` template to use for generating
                 the UUID replacement values. It is expected to have a placeholder
                 to format one numeric parameter.
+            store (UUIDMapStore): Where to get (and add) the numbers for UUIDs,
+                instead of numbering them from 1 for this replacer only.
+            identifiers (iterable or dict): The names of the identifier classes
+                to replace (default: ``DEFAULT_IDENTIFIERS``), or a dict of
+                ``IdentifierClass`` by name, to use other patterns or templates.
+                The ``uuid`` class uses ``template`` (if given) and ``store``.
         """
 
-        self.count = count(start=1)
-        self.uuid_map = {}
+        self.uuids = UUIDTable()
+        # With a store, the number the store has for each UUID in ``uuids``;
+        # otherwise a UUID's number is its position in ``uuids``.
+        self._store_numbers = array("I")
         self.template = template or UUID_REPLACEMENT_TEMPLATE
+        self.store = store
+        self.identifiers = _identifier_classes_for(identifiers, self.template)
+        self.uuid_only = tuple(self.identifiers) == DEFAULT_IDENTIFIERS
+        if self.uuid_only:
+            self.matcher = UUID_ISOLATED_MATCHER
+            self.bytes_matcher = UUID_ISOLATED_BYTES_MATCHER
+        else:
+            patterns = tuple(
+                (name, identifier.pattern)
+                for name, identifier in self.identifiers.items()
+            )
+            self.matcher = _identifiers_matcher(patterns, str)
+            self.bytes_matcher = _identifiers_matcher(patterns, bytes)
+            self._replacement_for = self._identifier_replacement_for
+        self.identifier_counts = {name: count(start=1) for name in self.identifiers}
+        self.identifier_numbers = {name: {} for name in self.identifiers}
+        self._lock = threading.Lock()
+        self._recent_replacements = {}
 
-    def _add_uuid(self, uuid):
-        if uuid in self.uuid_map:
-            return
-        self.uuid_map[uuid] = self.template.format(next(self.count))
+    def _number_at(self, position):
+        if self.store is None:
+            return position
+        return self._store_numbers[position - 1]
+
+    def _number_for(self, uuid_int):
+        position = self.uuids.position_of(uuid_int)
+        if position is None:
+            with self._lock:
+                return self._new_number_for(uuid_int)
+        return self._number_at(position)
+
+    def _new_number_for(self, uuid_int):
+        # Another thread may have numbered the UUID while this one waited,
+        # which ``position_for`` takes care of.
+        if self.store is None:
+            return self.uuids.position_for(uuid_int)
+        position = self.uuids.position_of(uuid_int)
+        if position is None:
+            # Before adding the UUID, so other threads can find its number.
+            self._store_numbers.append(self.store.index_for(uuid_int))
+            position = self.uuids.position_for(uuid_int)
+        return self._store_numbers[position - 1]
+
+    def replacement_for(self, uuid):
+        """Return the replacement for a UUID (string, bytes or integer)."""
+        if not isinstance(uuid, int):
+            uuid = uuid_to_int(uuid)
+        return self.template.format(self._number_for(uuid))
+
+    def _replacement_for(self, match):
+        uuid = match.group()
+        replacement = self._recent_replacements.get(uuid)
+        if replacement is None:
+            # Mostly a new UUID, so go straight to numbering it.
+            with self._lock:
+                number = self._new_number_for(uuid_to_int(uuid))
+            replacement = self.template.format(number)
+            if len(self._recent_replacements) >= RECENT_REPLACEMENTS_SIZE:
+                self._recent_replacements.clear()
+            self._recent_replacements[uuid] = replacement
+        return replacement
+
+    def _identifier_replacement_for(self, match):
+        name = match.lastgroup
+        if name == "uuid":
+            return self.template.format(self._number_for(uuid_to_int(match.group())))
+        value = match.group()
+        if isinstance(value, bytes):
+            value = value.decode("ascii")
+        numbers = self.identifier_numbers[name]
+        number = numbers.get(value)
+        if number is None:
+            with self._lock:
+                number = numbers.get(value)
+                if number is None:
+                    number = numbers[value] = next(self.identifier_counts[name])
+        return self.identifiers[name].template.format(number)
+
+    def _bytes_replacement_for(self, match):
+        return self._replacement_for(match).encode()
 
     def __call__(self, line):
-        """Replace all found UUIDs with markers."""
-        uuids_found = set(UUID_ISOLATED_MATCHER.findall(line))
-        for uuid in uuids_found:
-            self._add_uuid(uuid)
-        for uuid in uuids_found:
-            line = line.replace(uuid, self.uuid_map[uuid])
-        return line
+        """Replace all found UUIDs (and other identifiers) with markers."""
+        # A UUID has four dashes in it, so don't bother searching lines with fewer.
+        if self.uuid_only and line.count("-") < 4:
+            return line
+        return self.matcher.sub(self._replacement_for, line)
+
+    @property
+    def uuid_map(self):
+        """Property - A new dict mapping each UUID seen to its replacement."""
+        return {
+            int_to_uuid(uuid_int): self.replacement_for(uuid_int)
+            for uuid_int in self.uuids
+        }
+
+    def iter_uuid_mappings(self):
+        """Yield a line for each substitution done, in the order first done."""
+        template = "# {} -> {{}}\n".format(self.template)
+        for position, uuid_int in enumerate(self.uuids, start=1):
+            yield template.format(self._number_at(position), int_to_uuid(uuid_int))
+        for name, numbers in self.identifier_numbers.items():
+            if name == "uuid":
+                continue
+            template = "# {} -> {{}}\n".format(self.identifiers[name].template)
+            for value, number in numbers.items():
+                yield template.format(number, value)
 
     def uuid_mappings(self):
         """Return a list of lines of all the substitutions done."""
-        return [
-            "# {} -> {}\n".format(replacement, uuid)
-            for uuid, replacement in sorted(
-                self.uuid_map.items(), key=lambda item: item[1]
+        return list(self.iter_uuid_mappings())
+
+
+def iter_replace(lines, replacer=None, **replacer_args):
+    """
+    Lazily replace the UUIDs in ``lines``.
+
+    Args:
+        lines (iterable): the lines (``str``) to replace UUIDs in.
+        replacer (UUIDLineReplacer): the replacer to use, so its replacements
+            can be shared, or looked at afterwards.
+        replacer_args: the arguments to create a ``UUIDLineReplacer`` with,
+            if ``replacer`` is not given.
+
+    Yields:
+        str: each line, with its UUIDs replaced.
+    """
+    if replacer is None:
+        replacer = UUIDLineReplacer(**replacer_args)
+    yield from map(replacer, lines)
+
+
+class UUIDScrubbingFilter(logging.Filter):
+    """
+    Logging filter replacing the UUIDs in the message of each log record.
+
+    The message is formatted (with its arguments) and scrubbed once,
+    so every handler of the record sees the scrubbed message.
+    Exception tracebacks are not part of the message: to scrub them as well,
+    use a ``UUIDScrubbingFormatter`` instead.
+
+    Args:
+        name (str): see :py:class:`logging.Filter`.
+        replacer (UUIDLineReplacer): the replacer to use; share one between
+            filters to get the same replacements across loggers and handlers.
+    """
+
+    def __init__(self, name="", replacer=None):
+        super().__init__(name)
+        self.replacer = replacer or UUIDLineReplacer()
+
+    def filter(self, record):  # noqa: A003
+        """
+        Scrub the record's message, and let the record through.
+
+        A message that can't be formatted is left as it is,
+        for the handlers to report, as they would without this filter.
+        """
+        if super().filter(record):
+            try:
+                message = record.getMessage()
+            except Exception:
+                return True
+            record.msg = self.replacer(message)
+            record.args = None
+        return True
+
+
+class UUIDScrubbingFormatter(logging.Formatter):
+    """
+    Logging formatter replacing the UUIDs in all of the formatted record.
+
+    Takes the arguments of :py:class:`logging.Formatter`, plus:
+
+    Args:
+        replacer (UUIDLineReplacer): the replacer to use; share one between
+            formatters to get the same replacements across handlers.
+    """
+
+    def __init__(self, *args, replacer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replacer = replacer or UUIDLineReplacer()
+
+    def format(self, record):  # noqa: A003
+        """Format the record, then scrub it."""
+        return self.replacer(super().format(record))
+
+
+def _identifier_classes_for(identifiers, uuid_template):
+    """Return the dict of ``IdentifierClass`` by name for ``UUIDLineReplacer``."""
+    if identifiers is None:
+        identifiers = DEFAULT_IDENTIFIERS
+    if not isinstance(identifiers, dict):
+        unknown = set(identifiers) - set(IDENTIFIER_CLASSES)
+        if unknown:
+            raise ValueError(
+                "Unknown identifier class(es): {}".format(", ".join(sorted(unknown)))
             )
-        ]
+        identifiers = {name: IDENTIFIER_CLASSES[name] for name in identifiers}
+    if "uuid" in identifiers:
+        identifiers = dict(
+            identifiers,
+            uuid=identifiers["uuid"]._replace(template=uuid_template),
+        )
+    order = list(IDENTIFIER_CLASSES)
+    return {
+        name: identifiers[name]
+        for name in sorted(
+            identifiers,
+            key=lambda name: order.index(name) if name in order else len(order),
+        )
+    }
+
+
+@lru_cache(maxsize=None)
+def _identifiers_matcher(patterns, text_type):
+    """
+    Compile the combined regex for identifier ``patterns``: ``(name, pattern)`` pairs.
+
+    Each pattern is a named group, so the class of a match is its ``lastgroup``.
+    """
+    combined = "|".join(
+        "(?P<{}>{})".format(name, pattern) for name, pattern in patterns
+    )
+    return re.compile(combined if text_type is str else _bytes_pattern(combined))
+
+
+class _ReadAheadReader(io.RawIOBase):
+    """
+    Read a file in a separate thread, up to ``chunks_ahead`` chunks ahead.
+
+    (De)compression releases the GIL, so reading a compressed file this way
+    overlaps decompressing it with the work done on what was read.
+    """
+
+    def __init__(self, src, chunk_size=CHUNK_SIZE, chunks_ahead=2):
+        super().__init__()
+        self._chunks = queue.Queue(maxsize=chunks_ahead)
+        self._pending = memoryview(b"")
+        self._at_end = False
+        # The reader thread is done once it has had an error.
+        self._error = None
+        self._closing = threading.Event()
+        self._thread = threading.Thread(
+            target=self._read_ahead, args=(src, chunk_size), daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._closing.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _read_ahead(self, src, chunk_size):
+        try:
+            while not self._closing.is_set():
+                chunk = src.read(chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def readable(self):  # noqa: D102
+        return True
+
+    def readinto(self, buffer):  # noqa: D102
+        if not self._pending:
+            if self._error is not None:
+                raise self._error
+            if self._at_end:
+                return 0
+            chunk = self._chunks.get()
+            if isinstance(chunk, Exception):
+                self._error = chunk
+                raise chunk
+            if not chunk:
+                self._at_end = True
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):  # noqa: D102
+        self._closing.set()
+        self._thread.join()
+        super().close()
 
 
-def uuid_replace(src, dest, template=UUID_REPLACEMENT_TEMPLATE):
+def compression_of(src):
+    """
+    Return the compressed format (see ``COMPRESSIONS``) of ``src``, or None.
+
+    The format is detected from the first bytes of ``src``, without consuming them,
+    so ``src`` must be a binary file that can peek (like ``sys.stdin.buffer``)
+    or seek.
+    """
+    if hasattr(src, "peek"):
+        head = src.peek(6)
+    elif src.seekable():
+        position = src.tell()
+        head = src.read(6)
+        src.seek(position)
+    else:
+        return None
+    for compression, (magic, _) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def decompressing_reader(src):
+    """
+    Return a reader of the decompressed contents of ``src``, if it is compressed.
+
+    Decompression happens in a separate thread, ahead of reading.
+    Otherwise, ``src`` itself is returned.
+    """
+    compression = compression_of(src)
+    if compression is None:
+        return src
+    _, open_compressed = COMPRESSIONS[compression]
+    return io.BufferedReader(
+        _ReadAheadReader(open_compressed(src, "rb")), buffer_size=CHUNK_SIZE
+    )
+
+
+def compressing_writer(dest, compression):
+    """
+    Return a writer compressing to ``dest`` in the ``compression`` format.
+
+    Closing the writer does not close ``dest``.
+    """
+    _, open_compressed = COMPRESSIONS[compression]
+    return open_compressed(dest, "wb")
+
+
+def uuid_replace(
+    src,
+    dest,
+    template=UUID_REPLACEMENT_TEMPLATE,
+    store=None,
+    glossary=True,
+    identifiers=None,
+):
     """
     Replace UUIDs in all the lines in ``src`` and write to ``dest``.
 
     Args:
         src (file): a file opened for read
         dest (file): a file opened for write.
+        template (str): the UUID replacement template, see ``UUIDLineReplacer``.
+        store (UUIDMapStore): the UUID numbers to use, see ``UUIDLineReplacer``.
+        glossary (bool): whether to write the glossary.
+        identifiers (iterable or dict): the identifier classes to replace,
+            see ``UUIDLineReplacer``.
 
     After processing the contents of ``src`` into ``dest``, a glossary is then written
     to ``dest.``
+
+    If ``src`` is a compressed file (see ``COMPRESSIONS``) opened in text mode,
+    its decompressed contents are read.
     """
 
-    replacer = UUIDLineReplacer(template=template)
+    replacer = UUIDLineReplacer(template=template, store=store, identifiers=identifiers)
+    buffer = getattr(src, "buffer", None)
+    if buffer is not None and compression_of(buffer) is not None:
+        src = io.TextIOWrapper(
+            decompressing_reader(buffer), encoding=src.encoding, errors=src.errors
+        )
     dest.writelines(map(replacer, src))
-    dest.write("\n##########\n")
-    dest.writelines(replacer.uuid_mappings())
+    if glossary:
+        dest.write(GLOSSARY_SEPARATOR)
+        dest.writelines(replacer.iter_uuid_mappings())
+
+
+def _mmap_for(src):
+    """Return a read-only memory map of ``src`` if it is a non-empty regular file."""
+    try:
+        file_stat = os.fstat(src.fileno())
+        if not stat.S_ISREG(file_stat.st_mode) or not file_stat.st_size:
+            return None
+        return mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _memory_map_of(src):
+    """
+    Memory-map ``src``, copying it to a temporary file first if it isn't a file.
+
+    Yields:
+        tuple: the read-only memory map (None if ``src`` is empty),
+        and the position to start reading it from.
+    """
+    data = _mmap_for(src)
+    if data is not None:
+        with data:
+            yield data, src.tell()
+        return
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(src, spool, CHUNK_SIZE)
+        spool.seek(0)
+        data = _mmap_for(spool)
+        if data is None:
+            yield None, 0
+            return
+        with data:
+            yield data, 0
+
+
+def _replace_in_memory_map(
+    data, start, dest, replacement_for, matcher=UUID_ISOLATED_BYTES_MATCHER, end=None
+):
+    """Write ``data[start:end]`` to ``dest``, with the ``matcher`` matches replaced."""
+    end = len(data) if end is None else end
+    with memoryview(data) as view:
+        last_end = start
+        for match in matcher.finditer(data, start, end):
+            dest.write(view[last_end : match.start()])
+            dest.write(replacement_for(match))
+            last_end = match.end()
+        dest.write(view[last_end:end])
+
+
+def _replace_in_chunks(src, dest, replacement_for, chunk_size):
+    """
+    Write ``src``, read ``chunk_size`` bytes at a time, to ``dest``, UUIDs replaced.
+
+    A UUID may straddle two chunks, so the tail end of each chunk that might
+    hold the start of a UUID is carried over to be scanned with the next chunk.
+    One more byte is kept before that, for deciding if the UUID is isolated.
+    """
+    pending, scan_from = b"", 0
+    while True:
+        chunk = src.read(chunk_size)
+        pending += chunk
+        # Until the end of the input, a UUID must be followed by another byte
+        # to be known to be isolated.
+        end_limit = len(pending) + (0 if chunk else 1)
+        with memoryview(pending) as view:
+            last_end = scan_from
+            for match in UUID_ISOLATED_BYTES_MATCHER.finditer(pending, scan_from):
+                if match.end() >= end_limit:
+                    break
+                dest.write(view[last_end : match.start()])
+                dest.write(replacement_for(match))
+                last_end = match.end()
+            if not chunk:
+                dest.write(view[last_end:])
+                return
+            carry_from = max(last_end, len(pending) - UUID_LENGTH)
+            dest.write(view[last_end:carry_from])
+        keep_from = max(0, carry_from - 1)
+        pending, scan_from = pending[keep_from:], carry_from - keep_from
+
+
+# Implementation note for the parallel functions below:
+# Isolated UUIDs can never overlap (a UUID starts with 8 hex digits followed by a
+# dash, which no later part of a UUID has), so every UUID in a file is found
+# no matter where scanning starts. Each byte range of a file can thus be scanned
+# independently, each UUID belonging to the range it starts in.
+
+
+def _uuids_first_seen_in_range(path, start, end):
+    """Return the distinct UUIDs starting in ``[start, end)`` of ``path``, in order."""
+    with open(path, "rb") as src, mmap.mmap(
+        src.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        first_seen = {}
+        for match in UUID_ISOLATED_BYTES_MATCHER.finditer(data, start):
+            if match.start() >= end:
+                break
+            first_seen.setdefault(match.group(), None)
+        return list(first_seen)
+
+
+def _replaced_range(path, start, end, replacements):
+    """
+    Return ``[start, end)`` of ``path`` with its UUIDs replaced using ``replacements``.
+
+    A UUID straddling ``start`` belongs to, and was replaced with, the previous range;
+    a UUID straddling ``end`` belongs to this range.
+    """
+    with open(path, "rb") as src, mmap.mmap(
+        src.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        pieces = []
+        last_end = start
+        for match in UUID_ISOLATED_BYTES_MATCHER.finditer(
+            data, max(0, start - UUID_LENGTH + 1)
+        ):
+            if match.start() >= end:
+                break
+            if match.start() >= start:
+                replacement = replacements[match.group()]
+                pieces.extend([data[last_end : match.start()], replacement])
+            last_end = max(last_end, match.end())
+        pieces.append(data[last_end : max(last_end, end)])
+        return b"".join(pieces)
+
+
+def _replace_in_parallel(path, start, end, dest, replacer, jobs, range_size):
+    """
+    Write ``[start, end)`` of ``path`` to ``dest``, UUIDs replaced, using ``jobs``.
+
+    The ranges are scanned in parallel for the UUIDs first seen in each,
+    and as each range's scan comes in, in order, its UUIDs are numbered
+    (in the same order a serial scan would number them) and its rewrite
+    is submitted, so rewriting overlaps with scanning the ranges after it.
+    The rewritten ranges are written out in order.
+    """
+    starts = range(start, end, range_size)
+    ends = [min(range_start + range_size, end) for range_start in starts]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        range_uuids = executor.map(
+            _uuids_first_seen_in_range, repeat(path), starts, ends
+        )
+        # Keep a bounded number of rewritten ranges in memory.
+        in_flight = deque()
+        for range_start, range_end, uuids in zip(starts, ends, range_uuids):
+            replacements = {
+                uuid: replacer.replacement_for(uuid).encode() for uuid in uuids
+            }
+            if len(in_flight) >= 2 * jobs:
+                dest.write(in_flight.popleft().result())
+            in_flight.append(
+                executor.submit(
+                    _replaced_range, path, range_start, range_end, replacements
+                )
+            )
+        while in_flight:
+            dest.write(in_flight.popleft().result())
+
+
+def uuid_replace_bytes(
+    src,
+    dest,
+    template=UUID_REPLACEMENT_TEMPLATE,
+    chunk_size=CHUNK_SIZE,
+    jobs=1,
+    store=None,
+    glossary=True,
+    identifiers=None,
+):
+    """
+    Replace UUIDs in ``src`` and write to ``dest``, working on bytes instead of lines.
+
+    This avoids decoding and encoding, and keeps memory use bounded no matter how
+    long the lines are: regular files are memory-mapped,
+    anything else (like a pipe) is read ``chunk_size`` bytes at a time.
+    The input must use an ASCII compatible encoding, such as UTF-8.
+
+    With more than one job, a regular file ``src`` is split into ranges of
+    ``chunk_size`` bytes that are processed by a pool of ``jobs`` processes.
+    The output is identical to that of a single job.
+
+    Other identifiers than UUIDs can't be found reliably in arbitrary chunks
+    or ranges of a file (bearer tokens, for instance, have no maximum length),
+    so when replacing them, ``src`` is always memory-mapped
+    (if it isn't a regular file, it is copied to a temporary file first),
+    and processed by a single job.
+
+    Args:
+        src (file): a file opened for binary read
+        dest (file): a file opened for binary write, preferably with a large buffer.
+        template (str): the UUID replacement template, see ``UUIDLineReplacer``.
+        chunk_size (int): the size of the chunks to read ``src`` in, if it can't
+            be memory-mapped, or of the ranges processed by each job.
+        jobs (int): the number of processes to use.
+        store (UUIDMapStore): the UUID numbers to use, see ``UUIDLineReplacer``.
+        glossary (bool): whether to write the glossary.
+        identifiers (iterable or dict): the identifier classes to replace,
+            see ``UUIDLineReplacer``.
+
+    After processing the contents of ``src`` into ``dest``, a glossary is then written
+    to ``dest.``
+    """
+
+    replacer = UUIDLineReplacer(template=template, store=store, identifiers=identifiers)
+    data = _mmap_for(src) if replacer.uuid_only else None
+    if not replacer.uuid_only:
+        with _memory_map_of(src) as (data, start):
+            if data is not None:
+                _replace_in_memory_map(
+                    data,
+                    start,
+                    dest,
+                    replacer._bytes_replacement_for,
+                    matcher=replacer.bytes_matcher,
+                )
+    elif data is None:
+        _replace_in_chunks(src, dest, replacer._bytes_replacement_for, chunk_size)
+    elif jobs > 1 and isinstance(getattr(src, "name", None), str):
+        with data:
+            start, end = src.tell(), len(data)
+        _replace_in_parallel(src.name, start, end, dest, replacer, jobs, chunk_size)
+    else:
+        with data:
+            _replace_in_memory_map(
+                data, src.tell(), dest, replacer._bytes_replacement_for
+            )
+    if glossary:
+        dest.write(GLOSSARY_SEPARATOR.encode())
+        dest.writelines(line.encode() for line in replacer.iter_uuid_mappings())
+
+
+def _compression_of_file(path):
+    with open(path, "rb") as src:
+        return compression_of(src)
+
+
+def _uuids_in_file(path, spool_path=None):
+    """
+    Return the distinct UUIDs in the file at ``path``, in order.
+
+    With ``spool_path``, the file is compressed: it is decompressed there first,
+    to be memory mapped for scanning now and for replacing later.
+    """
+    if spool_path is not None:
+        with open(path, "rb") as src, open(spool_path, "wb") as spool:
+            with decompressing_reader(src) as reader:
+                shutil.copyfileobj(reader, spool, CHUNK_SIZE)
+        path = spool_path
+    size = os.path.getsize(path)
+    return _uuids_first_seen_in_range(path, 0, size) if size else []
+
+
+def _replace_file(src_path, dest_path, replacements, glossary_lines, compression=None):
+    """
+    Write the file at ``src_path`` to ``dest_path``, UUIDs replaced.
+
+    With ``compression``, the output is compressed in that format.
+
+    Returns:
+        int: the number of bytes read.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    with open(src_path, "rb") as src, open(
+        dest_path, "wb", buffering=WRITE_BUFFER_SIZE
+    ) as file_dest:
+        dest = compressing_writer(file_dest, compression) if compression else file_dest
+        try:
+            data = _mmap_for(src)
+            if data is not None:
+                with data:
+                    _replace_in_memory_map(
+                        data, 0, dest, lambda match: replacements[match.group()]
+                    )
+            if glossary_lines is not None:
+                dest.write(GLOSSARY_SEPARATOR.encode())
+                dest.writelines(glossary_lines)
+        finally:
+            if dest is not file_dest:
+                dest.close()
+        return os.fstat(src.fileno()).st_size
+
+
+def _file_identity(path):
+    path_stat = os.stat(path)
+    return path_stat.st_dev, path_stat.st_ino
+
+
+def _check_not_overwriting(file_pairs):
+    """Raise ValueError if any output path of ``file_pairs`` is an input file."""
+    inputs = {_file_identity(src_path): src_path for src_path, _ in file_pairs}
+    for _, dest_path in file_pairs:
+        if not os.path.exists(dest_path):
+            continue
+        src_path = inputs.get(_file_identity(dest_path))
+        if src_path is not None:
+            raise ValueError(
+                "Output {} would overwrite the input file {}".format(
+                    dest_path, src_path
+                )
+            )
+
+
+def uuid_replace_files(
+    file_pairs, template=UUID_REPLACEMENT_TEMPLATE, jobs=1, store=None, glossary=True
+):
+    """
+    Replace UUIDs in many files, sharing the UUID replacements between them all.
+
+    Files are processed by a pool of ``jobs`` processes, in two overlapping passes:
+    a file is scanned for its UUIDs, those are numbered (in the order of the
+    files, so the numbering doesn't depend on ``jobs``), then the file is
+    rewritten. Each output file gets a glossary of the UUIDs in it.
+
+    Compressed input files (see ``COMPRESSIONS``) are decompressed to temporary
+    files to be processed, and their output files are compressed the same way.
+
+    Args:
+        file_pairs (list): ``(input path, output path)`` pairs.
+        template (str): the UUID replacement template, see ``UUIDLineReplacer``.
+        jobs (int): the number of processes to use.
+        store (UUIDMapStore): the UUID numbers to use, see ``UUIDLineReplacer``.
+        glossary (bool): whether to write glossaries.
+
+    Returns:
+        tuple: the number of (decompressed) bytes read, and the
+        ``UUIDLineReplacer`` used, which holds all the UUIDs replaced.
+
+    Raises:
+        ValueError: if an output path is (a link to) one of the input files;
+            checked before any file is written.
+    """
+    _check_not_overwriting(file_pairs)
+    replacer = UUIDLineReplacer(template=template, store=store)
+    src_paths = [src_path for src_path, _ in file_pairs]
+    dest_paths = [dest_path for _, dest_path in file_pairs]
+    compressions = [_compression_of_file(src_path) for src_path in src_paths]
+    spool_dir = tempfile.TemporaryDirectory() if any(compressions) else None
+    spool_paths = [
+        os.path.join(spool_dir.name, str(index)) if compression else None
+        for index, compression in enumerate(compressions)
+    ]
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        scan = executor.map if executor else map
+        replaced = []
+        for dest_path, src_path, spool_path, compression, uuids in zip(
+            dest_paths,
+            src_paths,
+            spool_paths,
+            compressions,
+            scan(_uuids_in_file, src_paths, spool_paths),
+        ):
+            numbers = [replacer._number_for(uuid_to_int(uuid)) for uuid in uuids]
+            replacements = {
+                uuid: template.format(number).encode()
+                for uuid, number in zip(uuids, numbers)
+            }
+            glossary_lines = None
+            if glossary:
+                glossary_lines = [
+                    "# {} -> {}\n".format(
+                        template.format(number), int_to_uuid(uuid_to_int(uuid))
+                    ).encode()
+                    for number, uuid in sorted(zip(numbers, uuids))
+                ]
+            replace_args = (
+                spool_path or src_path,
+                dest_path,
+                replacements,
+                glossary_lines,
+                compression,
+            )
+            if executor:
+                replaced.append(executor.submit(_replace_file, *replace_args))
+            else:
+                replaced.append(_replace_file(*replace_args))
+        size = sum([future.result() for future in replaced] if executor else replaced)
+    finally:
+        if executor:
+            executor.shutdown()
+        if spool_dir is not None:
+            spool_dir.cleanup()
+    return size, replacer
+
+
+def _files_for(paths, skip_suffix=None):
+    """
+    Return the files given by ``paths``: files, directories (recursively) or globs.
+
+    Files ending with ``skip_suffix`` are left out of directories and globs.
+    """
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        if os.path.isdir(path):
+            found = [
+                os.path.join(dir_path, file_name)
+                for dir_path, _, file_names in os.walk(path)
+                for file_name in file_names
+            ]
+        else:
+            found = [
+                found_path
+                for found_path in glob.glob(path, recursive=True)
+                if os.path.isfile(found_path)
+            ]
+        files.extend(
+            sorted(
+                file_path
+                for file_path in found
+                if not (skip_suffix and file_path.endswith(skip_suffix))
+            )
+        )
+    return list(dict.fromkeys(os.path.normpath(file_path) for file_path in files))
+
+
+def _input_dirs_for(paths):
+    """Return the directories searched for the files given by ``paths``."""
+    input_dirs = []
+    for path in paths:
+        if os.path.isdir(path):
+            input_dirs.append(path)
+        elif glob.has_magic(path):
+            parts = []
+            for part in path.split(os.sep):
+                if glob.has_magic(part):
+                    break
+                parts.append(part)
+            input_dirs.append(os.sep.join(parts) or os.curdir)
+    return input_dirs
+
+
+def _is_within(path, directory):
+    """Return whether ``path`` is ``directory``, or anywhere under it."""
+    path, directory = os.path.realpath(path), os.path.realpath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+
+def _output_paths_for(files, output_dir=None, suffix=""):
+    """
+    Return the output paths for ``files``.
+
+    They are next to the input files, or with ``output_dir``, in a tree under it
+    that mirrors the tree under the directory common to all the input files.
+    """
+    if not output_dir:
+        return [file_path + suffix for file_path in files]
+    files = [os.path.abspath(file_path) for file_path in files]
+    root = os.path.commonpath(files)
+    if len(files) == 1:
+        root = os.path.dirname(root)
+    return [
+        os.path.join(output_dir, os.path.relpath(file_path, root)) + suffix
+        for file_path in files
+    ]
+
+
+def _placeholder_bytes_matcher(template):
+    """
+    Return a compiled ``bytes`` regex matching the replacements made with ``template``.
+
+    The number in a replacement is captured as the first group.
+    """
+    fields = [field for field in Formatter().parse(template) if field[1] is not None]
+    if len(fields) != 1:
+        raise ValueError(
+            'UUID replacement template "{}" '
+            "does not have exactly one replacement field".format(template)
+        )
+    literals = [literal for literal, _, _, _ in Formatter().parse(template)]
+    prefix, suffix = literals[0], "".join(literals[1:])
+    pattern = r"{}\s*(\d+){}".format(re.escape(prefix), re.escape(suffix))
+    return re.compile(pattern.encode())
+
+
+class UUIDRestorer(object):
+    """
+    Restore the UUIDs replaced by a :py:class:`UUIDLineReplacer`.
+
+    UUIDs are looked up in the glossary of replacements first,
+    then by number in the UUID map store, if there is one.
+    Anything looking like a replacement that isn't found in either is left as is.
+
+    Instances are called with the ``bytes`` regex match of a replacement
+    (made with ``matcher``), and return the ``bytes`` of its UUID.
+    """
+
+    def __init__(self, template=None, glossary=None, store=None):
+        """
+        Create a new UUID restorer.
+
+        Args:
+            template (str): The template the UUID replacements were made with.
+            glossary (dict): The UUIDs (``bytes``) by replacement (``bytes``).
+            store (UUIDMapStore): The UUIDs by number.
+        """
+        self.template = template or UUID_REPLACEMENT_TEMPLATE
+        self.matcher = _placeholder_bytes_matcher(self.template)
+        self.restorations = dict(glossary or {})
+        self.store = store
+
+    def _stored_uuid_for(self, match):
+        replacement = match.group()
+        if self.store is not None:
+            number = int(match.group(1))
+            if (
+                0 < number <= len(self.store)
+                and self.template.format(number).encode() == replacement
+            ):
+                return int_to_uuid(self.store.uuid_at(number)).encode()
+        return replacement
+
+    def __call__(self, match):
+        """Return the UUID for the replacement matched."""
+        uuid = self.restorations.get(match.group())
+        if uuid is None:
+            uuid = self.restorations[match.group()] = self._stored_uuid_for(match)
+        return uuid
+
+
+def parse_glossary(lines):
+    """
+    Return the UUIDs by replacement from glossary lines, as written by ``uuid_replace``.
+
+    Args:
+        lines (iterable): the glossary lines (``bytes``).
+
+    Returns:
+        dict: the UUIDs (``bytes``) keyed by their replacements (``bytes``).
+    """
+    glossary = {}
+    for line in lines:
+        replacement, arrow, uuid = line[2:].rstrip().rpartition(b" -> ")
+        if line.startswith(b"# ") and arrow:
+            glossary[replacement] = uuid
+    return glossary
+
+
+def _restore_memory_map(data, start, dest, template, store):
+    """Write ``data`` from ``start`` on to ``dest``, with its UUIDs restored."""
+    separator = GLOSSARY_SEPARATOR.encode()
+    end, glossary = data.rfind(separator, start), {}
+    if end >= 0:
+        # Without a glossary, the separator may just be a line of the text.
+        lines = data[end + len(separator) :].splitlines()
+        if lines and all(line.startswith(b"# ") and b" -> " in line for line in lines):
+            glossary = parse_glossary(lines)
+        else:
+            end = -1
+    if end < 0:
+        end = len(data)
+    if not glossary and store is None:
+        raise ValueError("No UUID glossary found in the input, and no UUID map given")
+    restorer = UUIDRestorer(template=template, glossary=glossary, store=store)
+    _replace_in_memory_map(
+        data, start, dest, restorer, matcher=restorer.matcher, end=end
+    )
+
+
+def uuid_restore_bytes(src, dest, template=UUID_REPLACEMENT_TEMPLATE, store=None):
+    """
+    Undo ``uuid_replace_bytes``: restore the UUIDs in ``src`` and write to ``dest``.
+
+    The UUIDs are taken from the glossary at the end of ``src``, which is not
+    written to ``dest``, and from ``store`` for any replacements not in it.
+    What follows the last separator line is only taken to be the glossary
+    if all its lines are glossary entries; otherwise it is restored too.
+    All replacements are found with a single regex built from ``template``.
+
+    Regular files are memory-mapped; anything else (like a pipe) is first copied
+    to a temporary file, as the glossary is only found at its end.
+    UUIDs are restored in lowercase.
+
+    Args:
+        src (file): a file opened for binary read
+        dest (file): a file opened for binary write, preferably with a large buffer.
+        template (str): the UUID replacement template the replacements were made with.
+        store (UUIDMapStore): the UUID numbers the replacements were made with.
+
+    Raises:
+        ValueError: if ``src`` has no glossary and there is no ``store``.
+    """
+    with _memory_map_of(src) as (data, start):
+        if data is not None:
+            _restore_memory_map(data, start, dest, template, store)
+
+
+def _identifier_setting(setting):
+    name, separator, template = setting.partition("=")
+    if name not in IDENTIFIER_CLASSES:
+        raise argparse.ArgumentTypeError(
+            '"{}" is not one of: {}'.format(name, ", ".join(IDENTIFIER_CLASSES))
+        )
+    identifier = IDENTIFIER_CLASSES[name]
+    if separator:
+        identifier = identifier._replace(template=template)
+    return name, identifier
 
 
 def main():
@@ -95,16 +1163,46 @@ def main():
         "which will be given a single numeric value. "
         "The environment variable UUID_TEMPLATE can be used to override the "
         "default value, and the `-t`/`-template` parameter can be used to "
-        "overrride the environment variable."
+        "overrride the environment variable. "
+        "To keep the same placeholders across files and runs, use a map file "
+        "(`-m`/`--map-file`, or the environment variable UUID_MAP_FILE); "
+        "it is created if it doesn't exist, and updated with any new UUIDs; "
+        "runs using the same map file wait for each other. "
+        "With `-r`/`--restore`, the UUIDs are put back instead, using the "
+        "glossary at the end of the input and/or the map file. "
+        "With `-b`/`--batch`, any number of files, directories and globs "
+        "are processed together, their outputs written next to them "
+        "(with the `--suffix` added) or into a mirror tree (`--output-dir`), "
+        "which must not be within the input directories. "
+        "Other identifiers can be replaced along with the UUIDs using `--scrub`. "
+        "The input is processed as bytes, so its line endings are kept as they are. "
+        "Compressed input (gzip, bzip2 or xz) is decompressed as it is read; "
+        "the output is compressed if its name ends with .gz, .bz2 or .xz, "
+        "or as set by `-z`/`--compress`; batch outputs are compressed like "
+        "their inputs. "
+        "With `-F`/`--follow`, the lines appended to the input file are replaced "
+        "as they come in, like `tail -F`; the glossary (and map file) is written when "
+        "interrupted or terminated. A following run holds the map file until then, "
+        "so other runs using it wait for it to end."
     )
     parser = argparse.ArgumentParser(
         description=description, formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
     parser.add_argument(
-        "input", nargs="?", type=argparse.FileType("r"), default=sys.stdin
+        "input", nargs="?", type=argparse.FileType("rb"), default=sys.stdin.buffer
+    )
+    parser.add_argument(
+        "output",
+        nargs="?",
+        type=argparse.FileType("wb", bufsize=WRITE_BUFFER_SIZE),
+        default=sys.stdout.buffer,
     )
     parser.add_argument(
-        "output", nargs="?", type=argparse.FileType("w"), default=sys.stdout
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="number of processes to use, for a regular input file",
     )
     parser.add_argument(
         "--template",
@@ -113,7 +1211,221 @@ def main():
         help="UUID replacement template",
         default=os.environ.get("UUID_TEMPLATE", UUID_REPLACEMENT_TEMPLATE),
     )
+    parser.add_argument(
+        "--map-file",
+        "-m",
+        type=str,
+        help="file of UUID numbers to use and update",
+        default=os.environ.get("UUID_MAP_FILE"),
+    )
+    parser.add_argument(
+        "--no-glossary",
+        dest="glossary",
+        action="store_false",
+        help="don't append the glossary to the output",
+    )
+
+    parser.add_argument(
+        "--batch",
+        "-b",
+        nargs="+",
+        metavar="PATH",
+        help="files, directories or globs to process, instead of input and output",
+    )
+    parser.add_argument(
+        "--output-dir",
+        "-o",
+        type=str,
+        help="directory to write the batch outputs to, as a mirror tree",
+    )
+    parser.add_argument(
+        "--suffix",
+        "-s",
+        type=str,
+        help="suffix added to the batch output file names "
+        '(default: ".scrubbed", or none with --output-dir)',
+    )
+    parser.add_argument(
+        "--scrub",
+        "-S",
+        type=_identifier_setting,
+        action="append",
+        default=[],
+        metavar="NAME[=TEMPLATE]",
+        help="also replace identifiers of this class ({}), "
+        "may be given more than once".format(", ".join(IDENTIFIER_CLASSES)),
+    )
+    parser.add_argument(
+        "--compress",
+        "-z",
+        choices=sorted(COMPRESSIONS),
+        help="compress the output in this format "
+        "(default: the one named by the output's extension, if any)",
+    )
+    parser.add_argument(
+        "--restore",
+        "-r",
+        action="store_true",
+        help="restore the UUIDs replaced in the input",
+    )
+    parser.add_argument(
+        "--follow",
+        "-F",
+        action="store_true",
+        help="keep replacing the lines appended to the input file, "
+        "following it when rotated, until interrupted or terminated",
+    )
 
     args = parser.parse_args()
 
-    uuid_replace(args.input, args.output, template=args.template)
+    if args.batch:
+        for option in ("compress", "restore", "scrub"):
+            if getattr(args, option):
+                parser.error("--{} can't be used with --batch".format(option))
+        _batch_main(parser, args)
+        return
+    if args.follow:
+        for option in ("compress", "restore"):
+            if getattr(args, option):
+                parser.error("--{} can't be used with --follow".format(option))
+        if args.input is sys.stdin.buffer:
+            parser.error("--follow needs an input file")
+        _follow_main(args)
+        return
+
+    compression = args.compress
+    if compression is None:
+        extension = os.path.splitext(getattr(args.output, "name", "") or "")[1]
+        compression = extension[1:] if extension[1:] in COMPRESSIONS else None
+    src = decompressing_reader(args.input)
+    dest = compressing_writer(args.output, compression) if compression else args.output
+    try:
+        if args.restore:
+            _restore_main(parser, args, src, dest)
+        else:
+            _replace_main(args, src, dest)
+    finally:
+        if dest is not args.output:
+            dest.close()
+        if src is not args.input:
+            src.close()
+
+
+def _restore_main(parser, args, src, dest):
+    store = UUIDMapStore(args.map_file) if args.map_file else None
+    try:
+        uuid_restore_bytes(src, dest, template=args.template, store=store)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _identifiers_for(args):
+    if not args.scrub:
+        return None
+    return dict([("uuid", IDENTIFIER_CLASSES["uuid"])] + args.scrub)
+
+
+@contextmanager
+def _sigterm_interrupts():
+    """Make SIGTERM raise ``KeyboardInterrupt`` too, while in the context."""
+
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    previous_handler = signal.signal(signal.SIGTERM, interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+
+
+def _follow_main(args):
+    args.input.close()
+    store = UUIDMapStore(args.map_file) if args.map_file else None
+    replacer = UUIDLineReplacer(
+        template=args.template, store=store, identifiers=_identifiers_for(args)
+    )
+    try:
+        with _sigterm_interrupts():
+            lines = iter_replace(follow_file(args.input.name), replacer=replacer)
+            for line in lines:
+                args.output.write(line.encode())
+                args.output.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.glossary:
+            args.output.write(GLOSSARY_SEPARATOR.encode())
+            args.output.writelines(
+                line.encode() for line in replacer.iter_uuid_mappings()
+            )
+        args.output.flush()
+        if store is not None:
+            store.save()
+            store.close()
+
+
+def _replace_main(args, src, dest):
+    identifiers = _identifiers_for(args)
+    replace = partial(
+        uuid_replace_bytes,
+        src,
+        dest,
+        template=args.template,
+        jobs=args.jobs,
+        glossary=args.glossary,
+        identifiers=identifiers,
+    )
+    if args.map_file:
+        with UUIDMapStore(args.map_file) as store:
+            replace(store=store)
+    else:
+        replace()
+
+
+def _batch_main(parser, args):
+    suffix = args.suffix
+    if suffix is None:
+        suffix = "" if args.output_dir else ".scrubbed"
+    if args.output_dir:
+        for input_dir in _input_dirs_for(args.batch):
+            if _is_within(args.output_dir, input_dir):
+                parser.error(
+                    "--output-dir {} is within the input directory {}".format(
+                        args.output_dir, input_dir
+                    )
+                )
+    files = _files_for(args.batch, skip_suffix=suffix)
+    if not files:
+        parser.error("No files found for {}".format(" ".join(args.batch)))
+    outputs = _output_paths_for(files, args.output_dir, suffix)
+    replace = partial(
+        uuid_replace_files,
+        list(zip(files, outputs)),
+        template=args.template,
+        jobs=args.jobs,
+        glossary=args.glossary,
+    )
+    started = time.perf_counter()
+    try:
+        if args.map_file:
+            with UUIDMapStore(args.map_file) as store:
+                size, replacer = replace(store=store)
+        else:
+            size, replacer = replace()
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        "{} files, {:.1f} MB, {} distinct UUIDs in {:.2f}s ({:.1f} MB/s)".format(
+            len(files),
+            size / 1e6,
+            len(replacer.uuids),
+            elapsed,
+            size / 1e6 / elapsed,
+        ),
+        file=sys.stderr,
+    )
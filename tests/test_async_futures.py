@@ -0,0 +1,101 @@
+"""Unit tests for the jgt_common.async_futures tools."""
+
+import asyncio
+import random
+
+import pytest
+from jgt_common import async_futures
+from jgt_common import ResponseInfo
+from jgt_common import ResponseList
+
+# Arbitrary re-usable iterable of inputs to test against.
+inputs = range(10)
+
+# The expected results given all the inputs to do_work.
+desired_results = {30 * x for x in inputs}
+
+
+async def do_work(x):
+    """Return any arbitrary unique value based on x, after a short sleep."""
+    await asyncio.sleep(random.random() / 100.0)
+    return 30 * x
+
+
+def run(coroutine):
+    """Run ``coroutine`` to completion in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def collect(async_iterable):
+    return [value async for value in async_iterable]
+
+
+@pytest.fixture
+def max_concurrency():
+    """Restore the default concurrency limit after the test."""
+    old_limit = async_futures._MAX_CONCURRENCY
+    yield
+    async_futures._MAX_CONCURRENCY = old_limit
+
+
+def test_primitives():
+    async def test():
+        tasks = async_futures.run_each(inputs, do_work)
+        assert set(inputs) == set(tasks.values())
+        return await collect(async_futures.as_completed_result(tasks))
+
+    assert desired_results == set(run(test()))
+
+
+def test_set_each():
+    work_items = ResponseList(ResponseInfo(input=x, expected=30 * x) for x in inputs)
+
+    async def work(item):
+        return await do_work(item.input)
+
+    run(async_futures.set_each(work_items, "result", work))
+    assert work_items.expected == work_items.result
+    run(async_futures.set_response_on_each(work_items, work, max_concurrency=2))
+    assert work_items.expected == work_items.response
+
+
+def test_result_from_each():
+    results = run(collect(async_futures.result_from_each(inputs, do_work)))
+    assert desired_results == set(results)
+
+
+def test_as_completed_item_result():
+    async def test():
+        tasks = async_futures.run_each(inputs, do_work)
+        return await collect(async_futures.as_completed_item_result(tasks))
+
+    results = dict(run(test()))
+    assert set(inputs) == results.keys()
+    assert desired_results == set(results.values())
+
+
+@pytest.mark.parametrize("per_call", [True, False])
+def test_max_concurrency(max_concurrency, per_call):
+    running = 0
+    most_running = 0
+
+    async def work(x):
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        try:
+            return await do_work(x)
+        finally:
+            running -= 1
+
+    if per_call:
+        results = async_futures.result_from_each(inputs, work, max_concurrency=3)
+    else:
+        async_futures.set_max_concurrency(3)
+        results = async_futures.result_from_each(inputs, work)
+    assert desired_results == set(run(collect(results)))
+    assert most_running == 3
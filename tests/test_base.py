@@ -1,5 +1,6 @@
 """Unit tests for the jgt_common tools."""
 
+from collections import defaultdict
 from itertools import product, cycle
 import tempfile
 from math import nan
@@ -9,9 +10,14 @@ import random
 import re
 import shutil
 import string
+import subprocess
+import sys
+import threading
+import time
 
 import pytest
 import jgt_common
+import jgt_common.http_helpers
 
 
 TEST_MESSAGE = "Test Message"
@@ -470,6 +476,81 @@ def test_filter_lines_given_str(input_, expected_output, line_filter, return_typ
     assert output == expected_output
 
 
+class FollowedLines(object):
+    """Follow a file in a thread, collecting its lines."""
+
+    def __init__(self, file_path, **kwargs):
+        self.lines = []
+        self.stop = threading.Event()
+        self.thread = threading.Thread(
+            target=lambda: self.lines.extend(
+                jgt_common.follow_file(
+                    file_path,
+                    stop=self.stop,
+                    min_poll_interval=0.01,
+                    max_poll_interval=0.05,
+                    **kwargs
+                )
+            )
+        )
+        self.thread.start()
+
+    def wait_for(self, count):
+        """Return the lines, once there are ``count`` of them (or it takes 5s)."""
+        for _ in range(500):
+            if len(self.lines) >= count:
+                return self.lines
+            time.sleep(0.01)
+        return self.lines
+
+    def close(self):
+        """Stop following the file."""
+        self.stop.set()
+        self.thread.join()
+
+
+def test_follow_file(tmpdir):
+    log = tmpdir / "service.log"
+    log.write("old line\n")
+    followed = FollowedLines(str(log), from_end=True)
+    try:
+        time.sleep(0.05)
+        with log.open("a") as log_file:
+            log_file.write("first\nsec")
+            log_file.flush()
+            time.sleep(0.05)
+            log_file.write("ond\n")
+        assert followed.wait_for(2) == ["first\n", "second\n"]
+
+        # Truncated
+        log.write("after truncation\n")
+        assert followed.wait_for(3)[2:] == ["after truncation\n"]
+
+        # Rotated, with a line written to the old file just before
+        with log.open("a") as log_file:
+            log_file.write("last old line\n")
+        log.rename(tmpdir / "service.log.1")
+        time.sleep(0.1)
+        log.write("new file\n")
+        assert followed.wait_for(5)[3:] == ["last old line\n", "new file\n"]
+    finally:
+        followed.close()
+
+
+@pytest.mark.parametrize("from_end", [False, True])
+def test_follow_file_waits_for_file_and_filters(tmpdir, from_end):
+    log = tmpdir / "service.log"
+    followed = FollowedLines(
+        str(log), line_filter=lambda line: "keep" in line, from_end=from_end
+    )
+    try:
+        time.sleep(0.05)
+        log.write("keep 1\ndrop\nkeep 2\n")
+        assert followed.wait_for(2) == ["keep 1\n", "keep 2\n"]
+    finally:
+        followed.close()
+
+
 STRING_TO_LIST_DATA = {
     "  This is a simple space separated list": {
         "kwargs": {"sep": None},
@@ -824,6 +905,129 @@ def test_ticketing_system_urls(ticket_id, system):
         assert url == ""
 
 
+def test_register_ticketing_system(monkeypatch):
+    ticket_info = defaultdict(dict)
+    for name, meta_data in jgt_common._ticket_info().items():
+        ticket_info[name].update(meta_data)
+    monkeypatch.setattr(jgt_common, "_TICKET_INFO", ticket_info)
+
+    assert jgt_common.ticketing_system_for("bug#12") == ""
+    jgt_common.register_ticketing_system(
+        "Bugzilla",
+        pattern=re.compile(r"^bug#[0-9]+$", re.IGNORECASE),
+        url_template="https://bugs.example.com/{}",
+    )
+    assert jgt_common.ticketing_system_for("BUG#12") == "Bugzilla"
+    assert jgt_common.url_if_ticket("bug#12") == "https://bugs.example.com/bug#12"
+    for ticket_id, system in TICKET_DATA:
+        assert jgt_common.ticketing_system_for(ticket_id) == system
+
+    # Back references can't be fused, so each pattern is tried in turn.
+    jgt_common.register_ticketing_system("Twins", pattern=re.compile(r"^([0-9])\1$"))
+    assert jgt_common.ticketing_system_for("77") == "Twins"
+    assert jgt_common.ticketing_system_for("78") == ""
+    assert jgt_common.ticketing_system_for("bug#12") == "Bugzilla"
+
+
+def test_global_inline_flags_stay_with_their_system(monkeypatch):
+    ticket_info = defaultdict(dict)
+    for name, meta_data in jgt_common._ticket_info().items():
+        ticket_info[name].update(meta_data)
+    monkeypatch.setattr(jgt_common, "_TICKET_INFO", ticket_info)
+    jgt_common.register_ticketing_system(
+        "Bugzilla", pattern=re.compile(r"(?i)^bug#[0-9]+$")
+    )
+
+    assert jgt_common.ticketing_system_for("BUG#12") == "Bugzilla"
+    assert jgt_common.ticketing_system_for("XY-12") == "JIRA"
+    assert jgt_common.ticketing_system_for("xy-12") == ""
+    found = jgt_common.find_tickets("Bug#12 XY-12 xy-12 chg123 CHG123")
+    assert [(system, ticket) for system, ticket, _, _ in found] == [
+        ("Bugzilla", "Bug#12"),
+        ("JIRA", "XY-12"),
+        ("SNOW", "CHG123"),
+    ]
+
+
+TICKET_TEXT = (
+    "Fixed XY-2345 and X-12, see CHG12345.\n"
+    "Not tickets: notXY-1 XY-F123 1234\n"
+    "(XYZZY-1)[AB-12-34]"
+)
+
+TICKETS_IN_TICKET_TEXT = [
+    ("JIRA", "XY-2345", 6),
+    ("VersionOne", "X-12", 18),
+    ("SNOW", "CHG12345", 28),
+    ("JIRA", "XYZZY-1", 73),
+    ("JIRA", "AB-12", 82),
+]
+
+
+def test_find_tickets():
+    found = [
+        (system, ticket, offset)
+        for system, ticket, url, offset in jgt_common.find_tickets(TICKET_TEXT)
+    ]
+    assert found == TICKETS_IN_TICKET_TEXT
+    for system, ticket, offset in found:
+        assert TICKET_TEXT[offset : offset + len(ticket)] == ticket
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_find_tickets_in_chunks(chunk_size):
+    chunks = (
+        TICKET_TEXT[i : i + chunk_size] for i in range(0, len(TICKET_TEXT), chunk_size)
+    )
+    assert list(jgt_common.find_tickets(chunks)) == list(
+        jgt_common.find_tickets(TICKET_TEXT)
+    )
+
+
+def test_find_tickets_urls(monkeypatch):
+    ticket_info = defaultdict(dict)
+    for name, meta_data in jgt_common._ticket_info().items():
+        ticket_info[name].update(meta_data)
+    monkeypatch.setattr(jgt_common, "_TICKET_INFO", ticket_info)
+    jgt_common.register_ticketing_system("JIRA", url_template="https://jira/{}")
+
+    found = list(jgt_common.find_tickets(TICKET_TEXT.splitlines(True)))
+    assert [(system, ticket, offset) for system, ticket, _, offset in found] == (
+        TICKETS_IN_TICKET_TEXT
+    )
+    for system, ticket, url, _ in found:
+        assert url == ("https://jira/" + ticket if system == "JIRA" else "")
+
+
+@pytest.mark.parametrize(
+    "source, lookahead",
+    [
+        (r"(?P<_0>[A-Z]+-[0-9]+)|(?P<_1>CHG[0-9]+)", "(?=[A-ZC])"),
+        (r"\d+|#[0-9]", r"(?=[\d\#])"),
+        (r"(?i:bug#[0-9]+)", ""),
+        (r"x?y", ""),
+        (r"[^a]b", ""),
+    ],
+)
+def test_first_char_lookahead(source, lookahead):
+    assert jgt_common._first_char_lookahead(source) == lookahead
+
+
+def test_ticketing_system_registry_cache(tmpdir, monkeypatch):
+    cache_file = tmpdir / "tag_to_url.cache"
+    monkeypatch.setenv(jgt_common.TAG_TO_URL_CACHE_ENV_VAR, str(cache_file))
+    monkeypatch.setattr(jgt_common, "_TICKET_INFO", None)
+    assert jgt_common.ticketing_system_for("XY-2345") == "JIRA"
+    assert cache_file.exists()
+
+    def no_scan():
+        raise AssertionError("cache file should have been used")
+
+    monkeypatch.setattr(jgt_common, "_TICKET_INFO", None)
+    monkeypatch.setattr(jgt_common, "_scan_tag_to_url_entry_points", no_scan)
+    assert jgt_common.ticketing_system_for("XY-2345") == "JIRA"
+
+
 UUID_BASIC_MATCHER = re.compile(jgt_common.UUID_BASIC_RE)
 
 
@@ -976,3 +1180,102 @@ def test_assert_if_values():
 
     # No values, no problem.
     assert_all_odd_values([])
+
+
+@pytest.mark.parametrize("module", [jgt_common, jgt_common.http_helpers])
+def test_deferred_classification_rst_string(module):
+    module_dict = vars(module)
+    expected = module_dict["__doc__"] + jgt_common.build_classification_rst_string(
+        module_dict, module.__name__, module_dict["_classification_categories"]
+    )
+    assert module.__doc__ == expected
+    assert ".. csv-table::" in module.__doc__
+
+
+# Generous, to allow for slow machines and for no ``.pyc`` files being available.
+IMPORT_TIME_BUDGET_MICROSECONDS = 100000
+
+MODULES_NOT_TO_IMPORT_EAGERLY = (
+    "ast",
+    "asyncio",
+    "concurrent.futures",
+    "jgt_common.async_futures",
+    "jgt_common.futures",
+    "jgt_common.http_helpers",
+    "json",
+    "pkg_resources",
+    "requests",
+    "subprocess",
+    "wrapt",
+)
+
+
+def cold_import_times(module_name):
+    """
+    Return ``{name: cumulative microseconds}`` for a cold import of ``module_name``.
+
+    Parsed from ``python -X importtime`` output, which lists each module's
+    own imports, indented, just before the module itself.
+    Only ``module_name`` and the modules it caused to be imported are returned.
+    """
+    source_root = path.dirname(path.dirname(path.abspath(jgt_common.__file__)))
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module_name],
+        cwd=source_root,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            # A new top-level import; only the last one is of interest.
+            times = {}
+        times[name.strip()] = int(cumulative)
+    if module_name not in times:
+        raise AssertionError(
+            "No import time for {} in the -X importtime output:\n{}".format(
+                module_name, stderr
+            )
+        )
+    return times
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="-X importtime needs 3.7+")
+def test_cold_import_is_cheap():
+    times = cold_import_times("jgt_common")
+    assert times["jgt_common"] < IMPORT_TIME_BUDGET_MICROSECONDS
+    assert not set(MODULES_NOT_TO_IMPORT_EAGERLY).intersection(times)
+
+
+LAZY_ACCESS_SCRIPT = """
+import jgt_common
+
+module_class = type(jgt_common)
+for name, module in sorted(jgt_common._LAZY_MODULES.items()):
+    if module.startswith("."):
+        full_name = "jgt_common" + module
+        # The way Python < 3.7 gets lazy attributes (no PEP 562).
+        assert module_class.__getattr__(jgt_common, name).__name__ == full_name
+        assert getattr(jgt_common, name).__name__ == full_name
+assert "futures" in module_class.__dir__(jgt_common)
+assert jgt_common.OBSOLETE_TICKETING_SYSTEMS is not None
+"""
+
+
+def test_lazy_submodule_access_in_fresh_interpreter():
+    source_root = path.dirname(path.dirname(path.abspath(jgt_common.__file__)))
+    subprocess.run(
+        [sys.executable, "-c", LAZY_ACCESS_SCRIPT], cwd=source_root, check=True
+    )
+
+
+def test_lazy_submodule_access():
+    assert jgt_common.futures.run_each
+    assert jgt_common.check.eq(1, 1) == ""
+    assert "futures" in dir(jgt_common)
+    with pytest.raises(AttributeError):
+        jgt_common.no_such_attribute
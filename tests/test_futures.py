@@ -2,6 +2,7 @@
 
 import concurrent
 import random
+import threading
 import time
 
 import pytest
@@ -110,3 +111,388 @@ def test_as_completed_item_result(executor):
     results = dict(futures.as_completed_item_result(fdict))
     assert set(inputs) == results.keys()
     assert desired_results == set(results.values())
+
+
+def test_run_each_max_in_flight(executor):
+    """The window never has more than max_in_flight items pulled or running."""
+    lock = threading.Lock()
+    running = 0
+    most_running = 0
+    pulled = []
+
+    def work(x):
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        try:
+            return do_work(x)
+        finally:
+            with lock:
+                running -= 1
+
+    def items():
+        for x in inputs:
+            pulled.append(x)
+            yield x
+
+    window = futures.run_each(items(), work, max_in_flight=2)
+    assert pulled == [0, 1]
+    assert len(window) == 2
+    results = set()
+    for result in futures.as_completed_result(window):
+        assert len(pulled) <= len(results) + 2
+        results.add(result)
+    assert desired_results == results
+    assert most_running <= 2
+    assert len(window) == 0
+
+
+def test_max_in_flight(executor):
+    """The harvesting functions take a window in place of an fdict."""
+    work_items = ResponseList(
+        ResponseInfo(input=x, expected=do_work(x)) for x in inputs
+    )
+    futures.set_each(work_items, "result", lambda r: do_work(r.input), 3)
+    assert work_items.expected == work_items.result
+    futures.set_response_on_each(work_items, lambda r: do_work(r.input), 3)
+    assert work_items.expected == work_items.response
+
+    assert desired_results == set(futures.result_from_each(inputs, do_work, 1))
+    window = futures.run_each(iter(inputs), do_work, max_in_flight=4)
+    results = dict(futures.as_completed_item_result(window))
+    assert set(inputs) == results.keys()
+    assert desired_results == set(results.values())
+
+    with pytest.raises(ValueError):
+        futures.run_each(inputs, do_work, max_in_flight=0)
+
+
+def do_work_on_input(item):
+    """Do the work on ``item.input``, in a way that can be sent to a process."""
+    return do_work(item.input)
+
+
+@pytest.fixture
+def process_executor():
+    """Set up the shared process pool, and shut it down after the test."""
+    futures.set_process_pool_size(2)
+    yield futures.get_executor(futures.PROCESSES)
+    futures._PROCESSPOOL_EXECUTOR.shutdown(wait=True)
+    futures._PROCESSPOOL_EXECUTOR = None
+    futures._MAX_PROCESSES = None
+
+
+def test_process_pool(process_executor):
+    assert isinstance(process_executor, concurrent.futures.ProcessPoolExecutor)
+    assert futures.get_executor(futures.PROCESSES) is process_executor
+    results = futures.result_from_each(inputs, do_work, pool=futures.PROCESSES)
+    assert desired_results == set(results)
+
+    work_items = ResponseList(
+        ResponseInfo(input=x, expected=do_work(x)) for x in inputs
+    )
+    futures.set_each(
+        work_items, "result", do_work_on_input, max_in_flight=3, pool="processes"
+    )
+    assert work_items.expected == work_items.result
+
+
+def test_get_executor_pool_names():
+    old_size = futures._MAX_PROCESSES
+    futures._MAX_PROCESSES = None
+    with pytest.raises(TypeError):
+        futures.get_executor(futures.PROCESSES)
+    futures._MAX_PROCESSES = old_size
+
+    with pytest.raises(ValueError):
+        futures.get_executor("no such pool")
+
+
+@pytest.mark.parametrize("max_in_flight", [None, 2])
+def test_run_each_batched(executor, max_in_flight):
+    fdict = futures.run_each_batched(
+        iter(inputs), do_work, chunk_size=3, max_in_flight=max_in_flight
+    )
+    results = dict(futures.as_completed_item_result_batched(fdict))
+    assert set(inputs) == results.keys()
+    assert desired_results == set(results.values())
+    assert all(result == do_work(item) for item, result in results.items())
+
+
+def test_run_each_batched_chunks(executor):
+    fdict = futures.run_each_batched(inputs, do_work, chunk_size=4)
+    assert sorted(fdict.values()) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert {30 * 8, 30 * 9} in [set(future.result()) for future in fdict]
+
+
+def test_run_each_batched_adapts(executor):
+    window = futures.run_each_batched(range(100000), abs)
+    assert isinstance(window, futures.FutureWindow)
+    assert len(window) == 2 * POOL_SIZE_FOR_TESTING
+    chunk_sizes = [len(window[future]) for future in window]
+    assert chunk_sizes[0] == 1
+    assert max(chunk_sizes) > 1000
+    assert sum(chunk_sizes) == 100000
+
+
+def test_batched_shorthands(executor):
+    assert desired_results == set(futures.result_from_each_batched(inputs, do_work))
+
+    work_items = ResponseList(
+        ResponseInfo(input=x, expected=do_work(x)) for x in inputs
+    )
+    futures.set_each_batched(work_items, "result", do_work_on_input, chunk_size=3)
+    assert work_items.expected == work_items.result
+
+
+def test_batched_process_pool(process_executor):
+    results = futures.result_from_each_batched(
+        range(1000), abs, pool=futures.PROCESSES
+    )
+    assert sorted(results) == list(range(1000))
+
+
+@pytest.mark.parametrize("window", [None, 1, 3])
+def test_map_each(executor, window):
+    pulled = []
+
+    def items():
+        for x in inputs:
+            pulled.append(x)
+            yield x
+
+    results = futures.map_each(items(), do_work, window=window)
+    expected_window = window or 2 * POOL_SIZE_FOR_TESTING
+    for index, result in enumerate(results):
+        assert result == do_work(index)
+        assert len(pulled) <= index + 1 + expected_window
+    assert pulled == list(inputs)
+
+
+def test_map_each_process_pool(process_executor):
+    results = futures.map_each(inputs, do_work, window=2, pool=futures.PROCESSES)
+    assert list(results) == list(map(do_work, inputs))
+
+    with pytest.raises(ValueError):
+        next(futures.map_each(inputs, do_work, window=0))
+
+
+def fail_on_odd(x):
+    """Like ``do_work``, but raise for odd ``x``."""
+    if x % 2:
+        raise ValueError(x)
+    return do_work(x)
+
+
+def fail_first(x):
+    """Raise for ``0``, and take a while for anything else."""
+    if not x:
+        raise ValueError(x)
+    time.sleep(0.01)
+    return x
+
+
+@pytest.mark.parametrize("max_in_flight", [None, 4])
+def test_on_error_fail_fast(executor, max_in_flight):
+    fdict = futures.run_each(range(100), fail_first, max_in_flight=max_in_flight)
+    futures_made = list(fdict._in_flight if max_in_flight else fdict)
+    with pytest.raises(ValueError):
+        list(futures.as_completed_result(fdict, on_error=futures.FAIL_FAST))
+    futures.wait(futures_made)
+    if max_in_flight:
+        assert len(fdict) <= max_in_flight
+        assert not list(fdict._items)
+    else:
+        assert any(future.cancelled() for future in fdict)
+
+
+def test_on_error_collect(executor):
+    fdict = futures.run_each(inputs, fail_on_odd, max_in_flight=3)
+    results = {}
+    with pytest.raises(futures.FailedItemsException) as e:
+        for item, result in futures.as_completed_item_result(
+            fdict, on_error=futures.COLLECT
+        ):
+            results[item] = result
+    assert results == {x: do_work(x) for x in inputs if not x % 2}
+    assert sorted(item for item, _ in e.value.errors) == [1, 3, 5, 7, 9]
+    assert all(isinstance(error, ValueError) for _, error in e.value.errors)
+
+    with pytest.raises(futures.FailedItemsException, match="5 items failed"):
+        list(futures.result_from_each(inputs, fail_on_odd, on_error=futures.COLLECT))
+    with pytest.raises(ValueError, match="no such option"):
+        futures.set_each([], "result", do_work, on_error="no such option")
+
+
+def test_timeout(executor):
+    fdict = futures.run_each([0.2] * 100, time.sleep)
+    with pytest.raises(concurrent.futures.TimeoutError):
+        list(futures.as_completed_result(fdict, timeout=0.05))
+    assert sum(future.cancelled() for future in fdict) > 90
+
+    window = futures.run_each(iter([0.2] * 10), time.sleep, max_in_flight=2)
+    with pytest.raises(concurrent.futures.TimeoutError):
+        list(futures.as_completed_result(window, timeout=0.1))
+    assert not list(window._items)
+
+
+def test_map_each_errors(executor):
+    with pytest.raises(futures.FailedItemsException) as e:
+        results = []
+        for result in futures.map_each(inputs, fail_on_odd, on_error=futures.COLLECT):
+            results.append(result)
+    assert results == [do_work(x) for x in inputs if not x % 2]
+    assert [item for item, _ in e.value.errors] == [1, 3, 5, 7, 9]
+
+    results = futures.map_each(range(100), fail_first, window=5, on_error="fail_fast")
+    with pytest.raises(ValueError):
+        next(results)
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        list(futures.map_each([0, 0.2], time.sleep, timeout=0.05))
+
+
+def test_stopping_early_cancels(executor):
+    fdict = futures.run_each([0.05] * 100, time.sleep)
+    results = futures.as_completed_result(fdict)
+    next(results)
+    results.close()
+    futures.wait(list(fdict))
+    assert sum(future.cancelled() for future in fdict) > 80
+
+    window = futures.run_each(iter([0.05] * 100), time.sleep, max_in_flight=4)
+    for _ in futures.as_completed_result(window):
+        break
+    assert not list(window._items)
+
+    started = []
+
+    def sleep(seconds):
+        started.append(seconds)
+        time.sleep(seconds)
+
+    results = futures.map_each([0.05] * 100, sleep, window=20)
+    next(results)
+    results.close()
+    time.sleep(0.2)
+    assert len(started) <= 2 * POOL_SIZE_FOR_TESTING
+
+
+@pytest.fixture
+def restore_pool_size(executor):
+    """Put the shared thread pool back to its testing size after the test."""
+    yield
+    futures.set_thread_pool_size(POOL_SIZE_FOR_TESTING)
+
+
+def test_resize_thread_pool(restore_pool_size):
+    old_executor = futures.get_executor()
+    fdict = futures.run_each([0.05] * 10, time.sleep)
+    futures.set_thread_pool_size(POOL_SIZE_FOR_TESTING + 2)
+    assert futures.get_pool_size() == POOL_SIZE_FOR_TESTING + 2
+    new_executor = futures.get_executor()
+    assert new_executor is not old_executor
+    assert new_executor._max_workers == POOL_SIZE_FOR_TESTING + 2
+    # Work submitted before the resize still completes.
+    assert list(futures.as_completed_result(fdict)) == [None] * 10
+
+    futures.set_thread_pool_size(POOL_SIZE_FOR_TESTING + 2)
+    assert futures.get_executor() is new_executor
+
+
+def test_resize_during_window(restore_pool_size):
+    results = []
+    for result in futures.result_from_each(inputs, do_work, max_in_flight=2):
+        results.append(result)
+        futures.set_thread_pool_size(len(results) % 3 + 1)
+    assert desired_results == set(results)
+
+
+def test_recreate_after_shutdown(executor):
+    futures.shutdown_executor()
+    assert desired_results == set(futures.result_from_each(inputs, do_work))
+    assert futures.get_executor() is not executor
+
+
+def test_resize_while_submitting(restore_pool_size):
+    """Submitting from another thread is not broken by the pool being replaced."""
+    results = []
+    submitter = threading.Thread(
+        target=lambda: results.extend(futures.result_from_each(range(2000), abs))
+    )
+    submitter.start()
+    while submitter.is_alive():
+        futures.set_thread_pool_size(random.randint(1, 4))
+        time.sleep(0.001)
+    submitter.join()
+    assert sorted(results) == list(range(2000))
+
+
+def test_queued_work_goes_on_in_the_running_threads(restore_pool_size, monkeypatch):
+    """A thread done with an item runs the next queued one, errors or not."""
+    started = threading.Event()
+    submitted = []
+
+    def work(x):
+        started.wait()
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    futures.set_thread_pool_size(2)
+    submit = futures.get_executor().submit
+    monkeypatch.setattr(
+        futures.get_executor(),
+        "submit",
+        lambda *args: submitted.append(args) or submit(*args),
+    )
+    fdict = futures.run_each(range(100), work)
+    started.set()
+    with pytest.raises(futures.FailedItemsException) as raised:
+        list(futures.as_completed_result(fdict, on_error=futures.COLLECT))
+    assert len(raised.value.errors) == 50
+    assert len(submitted) == 2
+    assert futures.pool_stats().running == 0
+
+
+def test_shrinking_pool_limits_queued_work(restore_pool_size):
+    """Items queued before the pool shrinks run within the new size."""
+    lock = threading.Lock()
+    running = []
+    most_running_after_shrink = 0
+    shrunk = threading.Event()
+
+    def work(x):
+        nonlocal most_running_after_shrink
+        with lock:
+            running.append(x)
+            if shrunk.is_set():
+                most_running_after_shrink = max(
+                    most_running_after_shrink, len(running)
+                )
+        time.sleep(0.05)
+        with lock:
+            running.remove(x)
+        return x
+
+    futures.set_thread_pool_size(8)
+    fdict = futures.run_each(range(12), work)
+    time.sleep(0.01)
+    stats = futures.pool_stats()
+    assert (stats.size, stats.running, stats.queued) == (8, 8, 4)
+    futures.set_thread_pool_size(1)
+    shrunk.set()
+    assert sorted(futures.as_completed_result(fdict)) == list(range(12))
+    assert most_running_after_shrink == 1
+    assert futures.pool_stats().running == 0
+
+
+def test_pool_stats(executor):
+    assert desired_results == set(futures.result_from_each(inputs, do_work))
+    stats = futures.pool_stats()
+    assert (stats.size, stats.running, stats.queued) == (POOL_SIZE_FOR_TESTING, 0, 0)
+    assert stats.run_seconds > 0
+    assert stats.wait_seconds >= 0
+    with pytest.raises(ValueError):
+        futures.pool_stats("no such pool")
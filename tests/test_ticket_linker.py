@@ -0,0 +1,73 @@
+"""Unit tests for the jgt_common.ticket_linker."""
+from collections import defaultdict
+import io
+import sys
+
+import pytest
+
+import jgt_common
+from jgt_common.ticket_linker import TICKET_LINK_TEMPLATES, main, ticket_link
+
+INPUT_TEXT = "Fixed XY-12 and CHG123.\nNo tickets here.\n[XY-34]\n"
+
+EXPECTED_OUTPUT = {
+    "html": (
+        'Fixed <a href="https://jira/XY-12">XY-12</a> and CHG123.\n'
+        "No tickets here.\n"
+        '[<a href="https://jira/XY-34">XY-34</a>]\n'
+    ),
+    "markdown": (
+        "Fixed [XY-12](https://jira/XY-12) and CHG123.\n"
+        "No tickets here.\n"
+        "[[XY-34](https://jira/XY-34)]\n"
+    ),
+    "rst": (
+        "Fixed `XY-12 <https://jira/XY-12>`__ and CHG123.\n"
+        "No tickets here.\n"
+        "[`XY-34 <https://jira/XY-34>`__]\n"
+    ),
+}
+
+
+@pytest.fixture
+def jira_url_template(monkeypatch):
+    """Give JIRA, and only JIRA, a URL template for the duration of a test."""
+    ticket_info = defaultdict(dict)
+    for name, meta_data in jgt_common._ticket_info().items():
+        ticket_info[name].update(meta_data)
+    monkeypatch.setattr(jgt_common, "_TICKET_INFO", ticket_info)
+    jgt_common.register_ticketing_system("JIRA", url_template="https://jira/{}")
+
+
+@pytest.mark.parametrize("link_format", sorted(TICKET_LINK_TEMPLATES))
+def test_ticket_link(jira_url_template, link_format):
+    dest = io.StringIO()
+    links_made = ticket_link(
+        io.StringIO(INPUT_TEXT), dest, template=TICKET_LINK_TEMPLATES[link_format]
+    )
+    assert links_made == 2
+    assert dest.getvalue() == EXPECTED_OUTPUT[link_format]
+
+
+def test_ticket_link_without_url_templates():
+    dest = io.StringIO()
+    assert ticket_link(io.StringIO(INPUT_TEXT), dest) == 0
+    assert dest.getvalue() == INPUT_TEXT
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 16, 1024])
+def test_ticket_link_in_chunks(jira_url_template, chunk_size):
+    src = io.StringIO(INPUT_TEXT.replace("\n", " ") * 3)
+    dest = io.StringIO()
+    assert ticket_link(src, dest, chunk_size=chunk_size) == 6
+    assert dest.getvalue() == EXPECTED_OUTPUT["markdown"].replace("\n", " ") * 3
+
+
+def test_main_passes_invalid_bytes_through(jira_url_template, monkeypatch, tmpdir):
+    src, dest = tmpdir / "input.log", tmpdir / "output.log"
+    src.write_binary(b"Fixed XY-12 \xff\xfe in caf\xe9\n")
+    monkeypatch.setattr(sys, "argv", ["ticket-linker", str(src), str(dest)])
+    main()
+    assert dest.read_binary() == (
+        b"Fixed [XY-12](https://jira/XY-12) \xff\xfe in caf\xe9\n"
+    )
@@ -0,0 +1,59 @@
+"""Unit tests for the jgt_common.uuid_index."""
+from uuid import UUID, uuid4
+
+import pytest
+
+from jgt_common.uuid_index import UUIDIndex, build_uuid_index, line_at
+
+
+@pytest.fixture
+def logs(tmpdir):
+    uuids = [str(uuid4()) for _ in range(3)]
+    (tmpdir / "logs" / "a.log").write(
+        "start {0}\n{1} then {0}\nx{2}\n".format(*uuids), ensure=True
+    )
+    (tmpdir / "logs" / "more" / "b.log").write(
+        "{1}\ny{2}\n".format(*uuids), ensure=True
+    )
+    (tmpdir / "logs" / "empty.log").write("")
+    return (
+        uuids,
+        str(tmpdir / "logs" / "a.log"),
+        str(tmpdir / "logs" / "more" / "b.log"),
+    )
+
+
+@pytest.mark.parametrize("jobs, range_size", [(1, 1 << 20), (1, 7), (2, 20)])
+def test_uuid_index(tmpdir, logs, jobs, range_size):
+    (first, second, third), a_log, b_log = logs
+    index_path = str(tmpdir / "uuids.index")
+    assert (
+        build_uuid_index(
+            [str(tmpdir / "logs")], index_path, jobs=jobs, range_size=range_size
+        )
+        == 4
+    )
+
+    with UUIDIndex(index_path) as index:
+        assert len(index) == 2
+        assert sorted(index) == sorted(UUID(uuid).int for uuid in [first, second])
+        assert index.occurrences(first) == [(a_log, 6), (a_log, 85)]
+        assert index.occurrences(second.upper()) == [(a_log, 43), (b_log, 0)]
+        assert third not in index
+        assert index.occurrences(third) == []
+        assert index.stale_files() == []
+
+        (tmpdir / "logs" / "more" / "b.log").write("changed\n")
+        assert index.stale_files() == [b_log]
+
+
+def test_line_at(logs):
+    (first, second, _), a_log, _ = logs
+    assert line_at(a_log, 85) == "{} then {}".format(second, first).encode()
+    assert line_at(a_log, 0) == "start {}".format(first).encode()
+
+
+def test_not_an_index(tmpdir):
+    (tmpdir / "not.index").write("not an index, but long enough to have a header")
+    with pytest.raises(ValueError):
+        UUIDIndex(str(tmpdir / "not.index"))
@@ -0,0 +1,134 @@
+"""Unit tests for the jgt_common.uuid_map_store."""
+import io
+import os
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+from jgt_common.uuid_map_store import UUIDMapStore, UUIDTable, uuid_to_int
+from jgt_common.uuid_replacer import uuid_replace
+
+
+@pytest.fixture
+def map_path(tmpdir):
+    return str(tmpdir / "uuids.map")
+
+
+def test_uuid_to_int():
+    uuid = uuid4()
+    assert uuid_to_int(str(uuid)) == uuid.int
+    assert uuid_to_int(str(uuid).upper()) == uuid.int
+
+
+def test_uuid_table():
+    uuids = [uuid4().int for _ in range(1000)]
+    table = UUIDTable()
+    assert [table.position_for(uuid) for uuid in uuids] == list(range(1, 1001))
+    assert table.position_for(uuids[10]) == 11
+    assert len(table) == len(uuids)
+    assert list(table) == uuids
+    assert [table.position_of(uuid) for uuid in uuids] == list(range(1, 1001))
+    assert table.position_of(uuid4().int) is None
+    assert table.uuid_at(10) == uuids[9]
+    with pytest.raises(IndexError):
+        table.uuid_at(1001)
+
+
+def test_store_in_memory():
+    uuid = uuid4().int
+    with UUIDMapStore() as store:
+        assert store.index_for(uuid) == 1
+        assert store.uuid_at(1) == uuid
+        with pytest.raises(ValueError):
+            store.save()
+
+
+def test_store_round_trip(map_path):
+    uuids = [uuid4().int for _ in range(1000)]
+    with UUIDMapStore(map_path) as store:
+        assert [store.index_for(uuid) for uuid in uuids] == list(range(1, 1001))
+        assert store.index_for(uuids[10]) == 11
+
+    store = UUIDMapStore(map_path)
+    assert len(store) == len(uuids)
+    assert [store.index_of(uuid) for uuid in uuids] == list(range(1, 1001))
+    assert [store.uuid_at(index) for index in range(1, 1001)] == uuids
+    assert store.index_of(uuid4().int) is None
+
+    # New UUIDs continue the numbering, and survive another save.
+    new_uuid = uuid4().int
+    assert store.index_for(new_uuid) == 1001
+    assert store.uuid_at(1001) == new_uuid
+    store.save()
+    store.close()
+    assert UUIDMapStore(map_path).index_of(new_uuid) == 1001
+
+
+@pytest.mark.parametrize("content", [b"Not a UUID map file, at all.", b"JGTUUIDM"])
+def test_store_rejects_other_files(map_path, content):
+    with open(map_path, "wb") as not_a_map:
+        not_a_map.write(content)
+    with pytest.raises(ValueError):
+        UUIDMapStore(map_path)
+    # The failed store released its lock.
+    os.remove(map_path)
+    with UUIDMapStore(map_path) as store:
+        assert store.index_for(uuid4().int) == 1
+
+
+def test_store_saves_as_the_table_grows(map_path):
+    uuids = [uuid4().int for _ in range(100)]
+    for start in range(0, 100, 7):
+        with UUIDMapStore(map_path) as store:
+            for uuid in uuids[start : start + 7]:
+                store.index_for(uuid)
+    with UUIDMapStore(map_path) as store:
+        assert [store.index_of(uuid) for uuid in uuids] == list(range(1, 101))
+
+
+def test_store_is_used_by_one_run_at_a_time(map_path):
+    first, second = uuid4().int, uuid4().int
+    numbers = []
+
+    def other_run():
+        with UUIDMapStore(map_path) as store:
+            numbers.append(store.index_for(second))
+
+    with UUIDMapStore(map_path) as store:
+        assert store.index_for(first) == 1
+        other = threading.Thread(target=other_run)
+        other.start()
+        time.sleep(0.1)
+        assert other.is_alive()
+    other.join()
+    assert numbers == [2]
+
+
+def test_store_does_not_overwrite_changed_map(map_path):
+    with UUIDMapStore(map_path) as store:
+        store.index_for(uuid4().int)
+    store = UUIDMapStore(map_path)
+    store.index_for(uuid4().int)
+    with open(map_path, "rb") as map_file:
+        content = map_file.read()
+    with open(map_path + ".new", "wb") as new_map_file:
+        new_map_file.write(content)
+    os.replace(map_path + ".new", map_path)
+    with pytest.raises(RuntimeError):
+        store.save()
+    store.close()
+    assert len(UUIDMapStore(map_path)) == 1
+
+
+def test_uuid_replace_with_store(map_path):
+    shared, first_only, second_only = (str(uuid4()) for _ in range(3))
+    outputs = []
+    for text in [first_only + " " + shared, shared + " " + second_only]:
+        output = io.StringIO()
+        with UUIDMapStore(map_path) as store:
+            uuid_replace(io.StringIO(text), output, store=store, glossary=False)
+        outputs.append(output.getvalue())
+
+    assert outputs == [",,UUID-001,, ,,UUID-002,,", ",,UUID-002,, ,,UUID-003,,"]
@@ -1,8 +1,37 @@
 """Unit tests for the jgt_common.uuid_replacer."""
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
 import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from uuid import uuid4
+
+import pytest
 
 from jgt_common import get_file_contents
-from jgt_common.uuid_replacer import uuid_replace
+from jgt_common.uuid_replacer import (
+    COMPRESSIONS,
+    IDENTIFIER_CLASSES,
+    UUID_LENGTH,
+    UUIDLineReplacer,
+    UUIDScrubbingFilter,
+    UUIDScrubbingFormatter,
+    _files_for,
+    _output_paths_for,
+    compressing_writer,
+    decompressing_reader,
+    iter_replace,
+    main,
+    uuid_replace,
+    uuid_replace_files,
+    uuid_replace_bytes,
+    uuid_restore_bytes,
+)
+from jgt_common.uuid_map_store import UUIDMapStore, uuid_to_int
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 INPUT_FILE = os.path.join(HERE, "uuid-only-lines.input")
@@ -19,3 +48,485 @@ def test_uuid_replacer(tmpdir):
     assert get_file_contents(EXPECTED_OUTPUT_FILE) == get_file_contents(
         str(testoutput_filename)
     )
+
+
+def test_uuid_line_replacer_numbers_in_order_of_appearance():
+    first, second = str(uuid4()), str(uuid4())
+    replacer = UUIDLineReplacer()
+    line = "{} then {} then {} again\n".format(second, first, second)
+    assert replacer(line) == ",,UUID-001,, then ,,UUID-002,, then ,,UUID-001,, again\n"
+    assert replacer("only-three-dashes-here") == "only-three-dashes-here"
+    assert replacer.uuid_mappings() == [
+        "# ,,UUID-001,, -> {}\n".format(second),
+        "# ,,UUID-002,, -> {}\n".format(first),
+    ]
+
+
+def test_uuid_line_replacer_glossary_in_numeric_order():
+    uuids = [str(uuid4()) for _ in range(1001)]
+    replacer = UUIDLineReplacer()
+    for uuid in uuids:
+        replacer(uuid)
+    mappings = replacer.uuid_mappings()
+    assert mappings[998] == "# ,,UUID-999,, -> {}\n".format(uuids[998])
+    assert mappings[999] == "# ,,UUID-1000,, -> {}\n".format(uuids[999])
+    assert replacer.uuid_map[uuids[1000]] == ",,UUID-1001,,"
+
+
+def test_uuid_line_replacer_ignores_case():
+    uuid = str(uuid4())
+    replacer = UUIDLineReplacer()
+    assert replacer(uuid.upper()) == replacer(uuid) == ",,UUID-001,,"
+    assert replacer.uuid_mappings() == ["# ,,UUID-001,, -> {}\n".format(uuid)]
+
+
+def test_uuid_replacer_bytes_memory_mapped(tmpdir):
+    testoutput_filename = tmpdir / "test.output"
+    with testoutput_filename.open("wb") as testoutput, open(
+        INPUT_FILE, "rb"
+    ) as testinput:
+        uuid_replace_bytes(testinput, testoutput)
+
+    assert get_file_contents(EXPECTED_OUTPUT_FILE) == get_file_contents(
+        str(testoutput_filename)
+    )
+
+
+# Sizes around the length of a UUID are the most likely to split one.
+@pytest.mark.parametrize("chunk_size", [1, 7, 35, 36, 37, 100, 4096])
+def test_uuid_replacer_bytes_in_chunks(chunk_size):
+    with open(INPUT_FILE, "rb") as testinput:
+        testinput = io.BytesIO(testinput.read())
+    testoutput = io.BytesIO()
+    uuid_replace_bytes(testinput, testoutput, chunk_size=chunk_size)
+
+    with open(EXPECTED_OUTPUT_FILE, "rb") as expected_output:
+        assert expected_output.read() == testoutput.getvalue()
+
+
+def test_uuid_replacer_bytes_isolation_across_chunks():
+    uuid = str(uuid4()).encode()
+    data = b"x" + uuid + b" " + uuid + b"y " + uuid
+    testoutput = io.BytesIO()
+    uuid_replace_bytes(io.BytesIO(data), testoutput, chunk_size=UUID_LENGTH)
+    assert testoutput.getvalue().startswith(
+        b"x" + uuid + b" " + uuid + b"y ,,UUID-001,,\n"
+    )
+
+
+@pytest.mark.parametrize("identifiers", [None, ["uuid", "hex32"]])
+def test_uuid_replacer_bytes_isolation_like_text(identifiers):
+    uuid = str(uuid4())
+    hex32 = uuid.replace("-", "")
+    line = "café{0} {0}é ({0}) x_{0} {1}é ({1})\n".format(uuid, hex32)
+    testoutput = io.BytesIO()
+    uuid_replace_bytes(
+        io.BytesIO(line.encode()), testoutput, identifiers=identifiers, glossary=False
+    )
+    replacer = UUIDLineReplacer(identifiers=identifiers)
+    assert testoutput.getvalue() == replacer(line).encode()
+    assert testoutput.getvalue().count(b",,") == (4 if identifiers else 2)
+
+
+@pytest.mark.parametrize("chunk_size", [37, 100, 4096])
+def test_uuid_replacer_bytes_in_parallel(tmpdir, chunk_size):
+    testoutput_filename = tmpdir / "test.output"
+    with testoutput_filename.open("wb") as testoutput, open(
+        INPUT_FILE, "rb"
+    ) as testinput:
+        uuid_replace_bytes(testinput, testoutput, chunk_size=chunk_size, jobs=3)
+
+    assert get_file_contents(EXPECTED_OUTPUT_FILE) == get_file_contents(
+        str(testoutput_filename)
+    )
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_uuid_restore_bytes_from_glossary(tmpdir, seekable):
+    replaced = tmpdir / "replaced"
+    with replaced.open("wb") as testoutput, open(INPUT_FILE, "rb") as testinput:
+        uuid_replace_bytes(testinput, testoutput)
+
+    with replaced.open("rb") as testinput:
+        if not seekable:
+            testinput = io.BytesIO(testinput.read())
+        testoutput = io.BytesIO()
+        uuid_restore_bytes(testinput, testoutput)
+
+    with open(INPUT_FILE, "rb") as original:
+        assert original.read() == testoutput.getvalue()
+
+
+def test_uuid_restore_bytes_from_map(tmpdir):
+    uuid = str(uuid4())
+    with UUIDMapStore(str(tmpdir / "uuids.map")) as store:
+        testoutput = io.BytesIO()
+        uuid_replace_bytes(
+            io.BytesIO("a {} b\n".format(uuid).encode()),
+            testoutput,
+            store=store,
+            glossary=False,
+        )
+    assert testoutput.getvalue() == b"a ,,UUID-001,, b\n"
+
+    restored = io.BytesIO()
+    with UUIDMapStore(str(tmpdir / "uuids.map")) as store:
+        uuid_restore_bytes(
+            io.BytesIO(testoutput.getvalue() + b",,UUID-002,, ,,UUID-01,,\n"),
+            restored,
+            store=store,
+        )
+    assert restored.getvalue() == "a {} b\n,,UUID-002,, ,,UUID-01,,\n".format(
+        uuid
+    ).encode()
+
+
+def test_uuid_restore_bytes_without_glossary_keeps_separator_lines(tmpdir):
+    uuid = str(uuid4())
+    text = "a {}\n##########\nb {}\nthe end\n".format(uuid, uuid).encode()
+    with UUIDMapStore(str(tmpdir / "uuids.map")) as store:
+        replaced = io.BytesIO()
+        uuid_replace_bytes(io.BytesIO(text), replaced, store=store, glossary=False)
+        restored = io.BytesIO()
+        uuid_restore_bytes(io.BytesIO(replaced.getvalue()), restored, store=store)
+    assert restored.getvalue() == text
+
+
+def test_uuid_restore_bytes_needs_a_glossary_or_map():
+    with pytest.raises(ValueError):
+        uuid_restore_bytes(io.BytesIO(b"a ,,UUID-001,, b\n"), io.BytesIO())
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_uuid_replace_files_shares_replacements(tmpdir, jobs):
+    first, second = str(uuid4()), str(uuid4())
+    (tmpdir / "logs" / "a.log").write("{} {}\n".format(first, second), ensure=True)
+    (tmpdir / "logs" / "more" / "b.log").write("{}\n".format(second), ensure=True)
+    files = _files_for([str(tmpdir / "logs")])
+    outputs = _output_paths_for(files, str(tmpdir / "out"))
+
+    size, replacer = uuid_replace_files(list(zip(files, outputs)), jobs=jobs)
+    assert size == 3 * len(first) + 3
+    assert len(replacer.uuids) == 2
+    assert (tmpdir / "out" / "a.log").read() == (
+        ",,UUID-001,, ,,UUID-002,,\n\n##########\n"
+        "# ,,UUID-001,, -> {}\n# ,,UUID-002,, -> {}\n".format(first, second)
+    )
+    assert (tmpdir / "out" / "more" / "b.log").read() == (
+        ",,UUID-002,,\n\n##########\n# ,,UUID-002,, -> {}\n".format(second)
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_uuid_replace_files_compressed(tmpdir, jobs):
+    first, second = str(uuid4()), str(uuid4())
+    (tmpdir / "a.log").write("{}\n".format(first))
+    file_pairs = [(str(tmpdir / "a.log"), str(tmpdir / "a.log.scrubbed"))]
+    for compression, (_, open_compressed) in sorted(COMPRESSIONS.items()):
+        path = str(tmpdir / "b.log.") + compression
+        with open_compressed(path, "wt") as compressed:
+            compressed.write("{} {}\n".format(second, first))
+        file_pairs.append((path, path + ".scrubbed"))
+
+    size, replacer = uuid_replace_files(file_pairs, jobs=jobs)
+    assert size == 7 * (len(first) + 1)
+    assert len(replacer.uuids) == 2
+    for path, dest_path in file_pairs[1:]:
+        with open(dest_path, "rb") as dest, decompressing_reader(dest) as reader:
+            assert reader.read().decode() == (
+                ",,UUID-002,, ,,UUID-001,,\n\n##########\n"
+                "# ,,UUID-001,, -> {}\n# ,,UUID-002,, -> {}\n".format(first, second)
+            )
+
+
+def test_files_for_globs_skips_outputs(tmpdir):
+    for name in ["a.log", "b.log", "a.log.scrubbed", "c.txt"]:
+        (tmpdir / name).write("")
+    files = _files_for([str(tmpdir / "*.log*")], skip_suffix=".scrubbed")
+    assert files == [str(tmpdir / "a.log"), str(tmpdir / "b.log")]
+    assert _output_paths_for(files, suffix=".scrubbed") == [
+        str(tmpdir / "a.log.scrubbed"),
+        str(tmpdir / "b.log.scrubbed"),
+    ]
+
+
+def test_uuid_replace_files_refuses_to_overwrite_inputs(tmpdir):
+    (tmpdir / "a.log").write("a\n")
+    (tmpdir / "b.log").write("b\n")
+    os.link(str(tmpdir / "a.log"), str(tmpdir / "a.link"))
+    a_log, b_log = str(tmpdir / "a.log"), str(tmpdir / "b.log")
+    for file_pairs in (
+        [(a_log, a_log)],
+        [(a_log, str(tmpdir / "a.link"))],
+        [(a_log, str(tmpdir / "a.out")), (b_log, os.path.join(str(tmpdir), "a.log"))],
+    ):
+        with pytest.raises(ValueError, match="would overwrite"):
+            uuid_replace_files(file_pairs)
+    assert (tmpdir / "a.log").read() == "a\n"
+    assert (tmpdir / "b.log").read() == "b\n"
+    assert not (tmpdir / "a.out").exists()
+
+
+def run_main(monkeypatch, *args):
+    """Run ``uuid-replacer`` with ``args``."""
+    monkeypatch.setattr("sys.argv", ["uuid-replacer"] + list(args))
+    main()
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["-s", ""],
+        ["-o", "{logs}"],
+        ["-o", "{logs}/out"],
+        ["-o", "{logs}/out", "-s", ".x"],
+    ],
+)
+def test_batch_main_refuses_outputs_in_inputs(tmpdir, monkeypatch, capsys, args):
+    log = tmpdir / "logs" / "a.log"
+    log.write("{}\n".format(uuid4()), ensure=True)
+    args = [arg.format(logs=tmpdir / "logs") for arg in args]
+    with pytest.raises(SystemExit):
+        run_main(monkeypatch, "-b", str(tmpdir / "logs"), *args)
+    assert "uuid-replacer: error:" in capsys.readouterr().err
+    assert tmpdir.join("logs").listdir() == [log]
+
+
+def test_main_keeps_line_endings(tmpdir, monkeypatch):
+    uuid = str(uuid4())
+    (tmpdir / "in.log").write_binary("{0}\r\nid {0}\r\n".format(uuid).encode())
+    run_main(monkeypatch, str(tmpdir / "in.log"), str(tmpdir / "out.log"))
+    assert (tmpdir / "out.log").read_binary().startswith(
+        b",,UUID-001,,\r\nid ,,UUID-001,,\r\n"
+    )
+
+
+def test_batch_main_suffix_with_output_dir(tmpdir, monkeypatch):
+    (tmpdir / "logs" / "a.log").write("{}\n".format(uuid4()), ensure=True)
+    run_main(monkeypatch, "-b", str(tmpdir / "logs"), "-o", str(tmpdir / "out"))
+    run_main(
+        monkeypatch, "-b", str(tmpdir / "logs"), "-o", str(tmpdir / "x"), "-s", ".s"
+    )
+    run_main(monkeypatch, "-b", str(tmpdir / "logs" / "*.log"))
+    assert (tmpdir / "out" / "a.log").exists()
+    assert (tmpdir / "x" / "a.log.s").exists()
+    assert (tmpdir / "logs" / "a.log.scrubbed").exists()
+
+
+IDENTIFIERS_LINE = (
+    "Bearer abc.DEF-123== from 10.0.0.12 id 01ARZ3NDEKTSV4RRFFQ69G5FAV "
+    "req 0123456789abcdef0123456789abcdef uuid {uuid} again 10.0.0.12\n"
+)
+
+
+def test_uuid_line_replacer_identifiers():
+    uuid = str(uuid4())
+    replacer = UUIDLineReplacer(identifiers=list(IDENTIFIER_CLASSES))
+    assert replacer(IDENTIFIERS_LINE.format(uuid=uuid)) == (
+        "Bearer ,,TOKEN-001,, from ,,IP-001,, id ,,ULID-001,, "
+        "req ,,HEX-001,, uuid ,,UUID-001,, again ,,IP-001,,\n"
+    )
+    assert replacer.uuid_mappings() == [
+        "# ,,UUID-001,, -> {}\n".format(uuid),
+        "# ,,TOKEN-001,, -> abc.DEF-123==\n",
+        "# ,,ULID-001,, -> 01ARZ3NDEKTSV4RRFFQ69G5FAV\n",
+        "# ,,HEX-001,, -> 0123456789abcdef0123456789abcdef\n",
+        "# ,,IP-001,, -> 10.0.0.12\n",
+    ]
+
+
+def test_uuid_replace_bytes_identifiers():
+    uuid = str(uuid4())
+    line = IDENTIFIERS_LINE.format(uuid=uuid)
+    identifiers = {"ip": IDENTIFIER_CLASSES["ip"]._replace(template="<IP{}>")}
+    testoutput = io.BytesIO()
+    uuid_replace_bytes(
+        io.BytesIO(line.encode()), testoutput, identifiers=identifiers, glossary=False
+    )
+    assert testoutput.getvalue() == line.replace("10.0.0.12", "<IP1>").encode()
+
+
+def test_uuid_line_replacer_unknown_identifiers():
+    with pytest.raises(ValueError):
+        UUIDLineReplacer(identifiers=["uuid", "phone"])
+
+
+@pytest.mark.parametrize("compression", sorted(COMPRESSIONS))
+def test_uuid_replace_bytes_compressed(compression):
+    compressed_input = io.BytesIO()
+    with compressing_writer(compressed_input, compression) as writer, open(
+        INPUT_FILE, "rb"
+    ) as testinput:
+        writer.write(testinput.read())
+    compressed_input.seek(0)
+
+    compressed_output = io.BytesIO()
+    with decompressing_reader(compressed_input) as src, compressing_writer(
+        compressed_output, compression
+    ) as dest:
+        uuid_replace_bytes(src, dest, chunk_size=100)
+    compressed_output.seek(0)
+
+    with open(EXPECTED_OUTPUT_FILE, "rb") as expected_output, decompressing_reader(
+        compressed_output
+    ) as testoutput:
+        assert expected_output.read() == testoutput.read()
+
+
+def test_decompressing_reader_keeps_raising_after_an_error():
+    corrupt = io.BytesIO()
+    with compressing_writer(corrupt, "gz") as writer:
+        writer.write(b"x" * 1000)
+    corrupt = io.BytesIO(corrupt.getvalue()[:20] + b"\0" * 20)
+    errors = []
+
+    def read_twice():
+        for _ in range(2):
+            try:
+                reader.read()
+            except Exception as e:
+                errors.append(e)
+
+    reader = decompressing_reader(corrupt)
+    # In a thread, so a read waiting for data that will never come can't hang.
+    reading = threading.Thread(target=read_twice, daemon=True)
+    reading.start()
+    reading.join(5)
+    assert len(errors) == 2
+    reader.close()
+
+
+def test_uuid_replace_compressed_text(tmpdir):
+    compressed_input = tmpdir / "input.gz"
+    with compressed_input.open("wb") as raw, compressing_writer(
+        raw, "gz"
+    ) as writer, open(INPUT_FILE, "rb") as testinput:
+        writer.write(testinput.read())
+
+    testoutput = io.StringIO()
+    with compressed_input.open("r") as testinput:
+        uuid_replace(testinput, testoutput)
+    assert get_file_contents(EXPECTED_OUTPUT_FILE) == testoutput.getvalue()
+
+
+def test_decompressing_reader_leaves_uncompressed_input():
+    src = io.BytesIO(b"not compressed")
+    assert decompressing_reader(src) is src
+    assert src.read() == b"not compressed"
+
+
+def test_iter_replace_is_lazy():
+    uuid = str(uuid4())
+    replacer = UUIDLineReplacer()
+    replaced = iter_replace(iter([uuid, "no uuid", uuid]), replacer=replacer)
+    assert replacer.uuid_mappings() == []
+    assert next(replaced) == ",,UUID-001,,"
+    assert list(replaced) == ["no uuid", ",,UUID-001,,"]
+    assert list(iter_replace([uuid], template="<{}>")) == ["<1>"]
+
+
+def test_uuid_line_replacer_shared_between_threads():
+    uuids = [str(uuid4()) for _ in range(200)]
+    replacer = UUIDLineReplacer()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        replaced = list(executor.map(replacer, uuids * 8))
+    assert sorted(set(replaced)) == sorted(
+        ",,UUID-{:03d},,".format(number) for number in range(1, 201)
+    )
+    assert replaced[:200] * 8 == replaced
+    assert len(replacer.uuid_mappings()) == 200
+
+
+@pytest.fixture
+def scrubbed_logger():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    logger = logging.getLogger("test_uuid_scrubbing")
+    logger.addHandler(handler)
+    logger.propagate = False
+    yield logger, handler, stream
+    logger.removeHandler(handler)
+    logger.filters.clear()
+
+
+def test_uuid_scrubbing_filter(scrubbed_logger):
+    logger, _, stream = scrubbed_logger
+    replacer = UUIDLineReplacer()
+    logger.addFilter(UUIDScrubbingFilter(replacer=replacer))
+    uuid = str(uuid4())
+    logger.warning("user %s logged in, %d times", uuid, 2)
+    logger.warning("user %s logged out", uuid)
+    assert stream.getvalue() == (
+        "user ,,UUID-001,, logged in, 2 times\nuser ,,UUID-001,, logged out\n"
+    )
+    assert replacer.uuid_mappings() == ["# ,,UUID-001,, -> {}\n".format(uuid)]
+
+
+def test_uuid_scrubbing_filter_leaves_bad_messages_to_handler():
+    uuid = str(uuid4())
+    record = logging.LogRecord(
+        "test", logging.WARNING, __file__, 1, "%s value %d", (uuid, "x"), None
+    )
+    assert UUIDScrubbingFilter().filter(record)
+    assert (record.msg, record.args) == ("%s value %d", (uuid, "x"))
+    with pytest.raises(TypeError):
+        logging.StreamHandler(io.StringIO()).format(record)
+
+
+def test_uuid_scrubbing_formatter(scrubbed_logger):
+    logger, handler, stream = scrubbed_logger
+    handler.setFormatter(UUIDScrubbingFormatter("%(levelname)s %(message)s"))
+    uuid = str(uuid4())
+    try:
+        raise ValueError(uuid)
+    except ValueError:
+        logger.exception("failed for %s", uuid)
+    assert stream.getvalue().startswith("ERROR failed for ,,UUID-001,,\n")
+    assert stream.getvalue().endswith("ValueError: ,,UUID-001,,\n")
+    assert uuid not in stream.getvalue()
+
+
+FOLLOW_SCRIPT = """
+import sys
+from jgt_common.uuid_replacer import main
+
+sys.argv[1:] = ["--follow", "--map-file", sys.argv[3], sys.argv[1], sys.argv[2]]
+main()
+"""
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGTERM"), reason="no SIGTERM")
+def test_follow_saves_when_terminated_and_holds_the_map(tmpdir):
+    uuid = str(uuid4())
+    log, output, map_file = (str(tmpdir / name) for name in ("log", "out", "map"))
+    with open(log, "w") as log_file:
+        log_file.write("{}\n".format(uuid))
+    open(output, "w").close()
+    source_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    follower = subprocess.Popen(
+        [sys.executable, "-c", FOLLOW_SCRIPT, log, output, map_file],
+        cwd=source_root,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while "UUID-001" not in get_file_contents(output):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+        # Other runs using the map wait for the follower to end.
+        def index_in_map():
+            with UUIDMapStore(map_file) as store:
+                return store.index_of(uuid_to_int(uuid))
+
+        with ThreadPoolExecutor(1) as executor:
+            index = executor.submit(index_in_map)
+            time.sleep(0.2)
+            assert not index.done()
+            follower.terminate()
+            assert follower.wait(10) == 0
+            assert index.result(10) == 1
+    finally:
+        follower.kill()
+    assert get_file_contents(output).endswith(
+        "##########\n# ,,UUID-001,, -> {}\n".format(uuid)
+    )